@@ -1,13 +1,369 @@
+import atexit
 import os
 import json
+import queue
+import threading
+import time
 from datetime import datetime
+from typing import Any, Dict, Optional
 
 LOG_FILE = "logs/alerts.jsonl"
+EXPLANATION_LOG_FILE = "logs/explanations.jsonl"  # deferred explanations by request_id
+EXPLANATION_PENDING = "Explanation pending."  # alert text until it is logged there
+
+# Alerts are also rolled into day-partitioned Parquet segments here (see
+# alert_store), for time-range queries; None keeps the JSONL log only
+ALERT_STORE_DIR: Optional[str] = "logs/alert_store"
+STORE_BATCH_SIZE = 10_000  # alerts per segment at most ...
+STORE_FLUSH_INTERVAL = 60.0  # ... or a segment this often (s); compaction merges
+
+# Per-minute/hour/day alert counts are maintained here (see alert_rollups),
+# so summaries need not scan the log; None disables them
+ROLLUP_DIR: Optional[str] = "logs/rollups"
+
+# ─── Background writer configuration ──────────────────────────────────────────
+QUEUE_SIZE = 10_000  # alerts buffered before the drop/backpressure policy applies
+BATCH_SIZE = 256  # write + flush once this many lines are buffered
+FLUSH_INTERVAL = 0.05  # ... or once the oldest buffered line is this old (s)
+OVERFLOW_POLICY = "drop_newest"  # "drop_newest" | "drop_oldest" | "block"
+BLOCK_TIMEOUT = 1.0  # max wait (s) under "block" before the alert is dropped
+
+_POLICIES = ("drop_newest", "drop_oldest", "block")
+_STOP = object()
+
+
+class AlertWriter:
+    """
+    Appends JSON lines to a file from a dedicated background thread.
+
+    Callers only enqueue; the writer thread batches lines, keeps the file
+    handle open, and writes + flushes on size or interval. The file is
+    reopened if it is rotated or removed underneath us. When the queue is
+    full the overflow policy decides:
+      - drop_newest: reject the new record (never blocks the caller)
+      - drop_oldest: discard the oldest queued record to make room
+      - block:       wait up to `block_timeout` for room, then drop
+    Counters: queued (accepted), written, dropped.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_queue: int = QUEUE_SIZE,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        policy: str = OVERFLOW_POLICY,
+        block_timeout: float = BLOCK_TIMEOUT,
+    ):
+        if policy not in _POLICIES:
+            raise ValueError(f"policy must be one of {_POLICIES}, got {policy!r}")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._closed = False
+
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+
+    # ── producer side ─────────────────────────────────────────────────────
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """
+        Enqueue one record; returns False if it was dropped.
+        """
+        if self._closed:
+            self.dropped += 1
+            return False
+        self._ensure_started()
+
+        if self.policy == "block":
+            try:
+                self._queue.put(record, timeout=self.block_timeout)
+            except queue.Full:
+                self.dropped += 1
+                return False
+        else:
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                if self.policy == "drop_newest":
+                    self.dropped += 1
+                    return False
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+                try:
+                    self._queue.put_nowait(record)
+                except queue.Full:
+                    self.dropped += 1
+                    return False
+        self.queued += 1
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Block until everything queued so far is on disk (or timeout).
+        """
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Flush outstanding records and stop the writer thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+        }
+
+    # ── writer thread ─────────────────────────────────────────────────────
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                thread = threading.Thread(
+                    target=self._run, name="alert-writer", daemon=True
+                )
+                thread.start()
+                self._thread = thread
+
+    def _run(self) -> None:
+        buffer = []
+        deadline = None
+        while True:
+            timeout = (
+                None if deadline is None else max(0.0, deadline - time.monotonic())
+            )
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._write(buffer)
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+            if isinstance(item, threading.Event):
+                self._write(buffer)
+                buffer, deadline = [], None
+                item.set()
+                continue
+            if item is not None:
+                buffer.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if len(buffer) >= self.batch_size or (
+                deadline is not None and time.monotonic() >= deadline
+            ):
+                self._write(buffer)
+                buffer, deadline = [], None
+
+    def _write(self, records) -> None:
+        if not records:
+            return
+        try:
+            f = self._open()
+            f.write("\n".join(json.dumps(r) for r in records) + "\n")
+            f.flush()
+            self.written += len(records)
+        except (OSError, TypeError, ValueError) as err:
+            print("❌ Alert writer error:", err)
+            self.dropped += len(records)
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open(self):
+        # Reopen when the path was rotated, truncated away or deleted
+        if self._file is not None:
+            try:
+                same = os.stat(self.path).st_ino == os.fstat(self._file.fileno()).st_ino
+            except OSError:
+                same = False
+            if same:
+                return self._file
+            self._file.close()
+            self._file = None
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a")
+        return self._file
+
+
+class StoreWriter(AlertWriter):
+    """
+    AlertWriter that writes each batch as Parquet segments of an
+    alert_store.AlertStore instead of appending JSON lines. Batches are
+    larger and less frequent by default, since every batch is a file.
+    """
+
+    def __init__(
+        self,
+        store,
+        batch_size: int = STORE_BATCH_SIZE,
+        flush_interval: float = STORE_FLUSH_INTERVAL,
+        **options,
+    ):
+        super().__init__(
+            store.root, batch_size=batch_size, flush_interval=flush_interval, **options
+        )
+        self.store = store
+
+    def _write(self, records) -> None:
+        if not records:
+            return
+        try:
+            self.store.append(records)
+            self.written += len(records)
+        except Exception as err:
+            print("❌ Alert store error:", err)
+            self.dropped += len(records)
+
+
+class RollupWriter(AlertWriter):
+    """
+    AlertWriter that counts each batch into an alert_rollups.Rollups
+    instead of writing it out. The rollups persist their own deltas, on
+    their interval and when the writer is closed.
+    """
+
+    def __init__(self, rollups, **options):
+        super().__init__(rollups.root, **options)
+        self.rollups = rollups
+
+    def close(self, timeout: float = 5.0) -> None:
+        super().close(timeout)
+        self.rollups.persist()
+
+    def _write(self, records) -> None:
+        if not records:
+            return
+        try:
+            self.rollups.add(records)
+            self.written += len(records)
+        except Exception as err:
+            print("❌ Alert rollup error:", err)
+            self.dropped += len(records)
+            return
+        try:
+            self.rollups.maybe_persist()
+        except Exception as err:
+            # The batch itself was counted
+            print("❌ Alert rollup persist error:", err)
+
+
+_writers: Dict[str, AlertWriter] = {}
+_writer_lock = threading.Lock()
+
+
+def get_writer(path: Optional[str] = None) -> AlertWriter:
+    """
+    Process-wide writer for `path` (default LOG_FILE), created on first use.
+    """
+    path = path or LOG_FILE
+    writer = _writers.get(path)
+    if writer is None:
+        with _writer_lock:
+            writer = _writers.get(path)
+            if writer is None:
+                writer = _writers[path] = AlertWriter(path)
+    return writer
+
+
+def get_store_writer(root: Optional[str] = None) -> StoreWriter:
+    """
+    Process-wide StoreWriter for the store at `root` (default
+    ALERT_STORE_DIR), created on first use.
+    """
+    root = root or ALERT_STORE_DIR
+    writer = _writers.get(root)
+    if writer is None:
+        from alert_store import AlertStore  # pyarrow: only when the store is used
+
+        with _writer_lock:
+            writer = _writers.get(root)
+            if writer is None:
+                writer = _writers[root] = StoreWriter(AlertStore(root))
+    return writer
+
+
+def get_rollup_writer(root: Optional[str] = None) -> RollupWriter:
+    """
+    Process-wide RollupWriter for the rollups at `root` (default
+    ROLLUP_DIR), created on first use.
+    """
+    root = root or ROLLUP_DIR
+    writer = _writers.get(root)
+    if writer is None:
+        from alert_rollups import Rollups
+
+        with _writer_lock:
+            writer = _writers.get(root)
+            if writer is None:
+                writer = _writers[root] = RollupWriter(Rollups(root))
+    return writer
+
+
+def start() -> None:
+    """
+    Create the configured writers now. Their backends (pyarrow for the
+    alert store) are imported here rather than on the first alert, which is
+    logged from a request on the event loop; the app calls this at startup.
+    """
+    get_writer()
+    if ALERT_STORE_DIR:
+        get_store_writer()
+    if ROLLUP_DIR:
+        get_rollup_writer()
+
+
+def shutdown() -> None:
+    """
+    Flush and stop the background writers (registered with atexit).
+    """
+    for writer in list(_writers.values()):
+        writer.close()
+
+
+atexit.register(shutdown)
 
 
 def log_alert(request, detection_result, explanation, severity, client_ip, user_agent):
     """
-    Appends one JSON line per alert. Supports both regex and ML fields.
+    Queues one JSON line per alert. Supports both regex and ML fields.
     """
     # Ensure attack_type is never null by falling back to label
     attack_type = detection_result.get("attack_type") or detection_result.get("label")
@@ -26,13 +382,38 @@ def log_alert(request, detection_result, explanation, severity, client_ip, user_
         "severity": severity,  # Low/Medium/High
         "source": detection_result.get(
             "detection_source"
-        ),  # "regex","ml","allowlist","error"
+        ),  # "regex","ml","ml_shadow","allowlist","error"
         "confidence": detection_result.get("confidence"),  # float or None
     }
 
-    # Ensure logs directory exists
-    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+    # Serialised and appended by the background writer threads
+    get_writer().submit(alert)
+    if ALERT_STORE_DIR:
+        get_store_writer().submit(alert)
+    if ROLLUP_DIR:
+        get_rollup_writer().submit(alert)
+
+
+def log_explanation(request_id, explanation, status):
+    """
+    Queues one deferred explanation, linked to its alert by request_id.
+    status: "ok", "timeout", "error" or "dropped" (explanation is None unless ok)
+    """
+    get_writer(EXPLANATION_LOG_FILE).submit(
+        {
+            "timestamp": datetime.utcnow().isoformat(),
+            "request_id": request_id,
+            "status": status,
+            "explanation": explanation,
+        }
+    )
+
 
-    # Append as a JSON line
-    with open(LOG_FILE, "a") as f:
-        f.write(json.dumps(alert) + "\n")
+def explanation_text(record):
+    """
+    The alert text for one record of the explanation log: the explanation,
+    or why there is none.
+    """
+    if record.get("status") == "ok" and record.get("explanation"):
+        return record["explanation"]
+    return f"Explanation unavailable ({record.get('status') or 'unknown'})."
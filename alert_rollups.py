@@ -0,0 +1,359 @@
+# alert_rollups.py
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from file_locks import flock
+
+logger = logging.getLogger(__name__)
+
+# ─── Resolutions and retention ────────────────────────────────────────────────
+# A bucket is a prefix of the ISO timestamp logged by alert_logger
+RESOLUTIONS = {"minute": 16, "hour": 13, "day": 10}  # "2026-10-17T12:34"[:n]
+RETENTION = {"minute": timedelta(days=2), "hour": timedelta(days=35), "day": None}
+IP_RESOLUTIONS = ("hour", "day")  # client IPs are only rolled up this coarsely
+TOP_IPS = 100  # client IPs kept per bucket when deltas are compacted
+PERSIST_INTERVAL = 10.0  # seconds between delta files while alerts arrive
+COMPACT_MIN_DELTAS = 16  # delta files before they are merged into the base
+
+_BASE = "rollups.json"
+_DELTA = "delta-"
+_READ_LOCK = ".read.lock"
+_COMPACT_LOCK = ".compact.lock"
+
+
+class Rollups:
+    """
+    Alert counts per minute, hour and day, keyed by attack type, severity
+    and source, plus client IP counts per hour and day. They are maintained
+    as alerts are logged, so summaries never scan the raw log.
+
+    add() only updates in-memory counters. persist() (due every
+    `persist_interval` seconds, and at shutdown) writes what was added since
+    the last persist as a new delta file under `root`. Every worker writes
+    its own delta files, and counts are additive, so any number of
+    processes can share a directory. compact() merges the delta files into
+    rollups.json and drops buckets past their RETENTION. It uses the same
+    two flock files as alert_store: .compact.lock for compactors and
+    .read.lock for the swap.
+
+    Reads see rollups.json, every delta file and the counts not persisted
+    yet. The files are merged once and kept, per resolution: later reads
+    only parse new delta files (all files again after a compaction).
+    Alert counts are exact. Client IPs are approximate: delta files and
+    compactions keep only the TOP_IPS busiest IPs of each bucket, so an
+    IP's count misses what it had in the deltas where it was cut. Counts
+    not yet persisted are lost if the process is killed; the raw log stays
+    the reference.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        persist_interval: float = PERSIST_INTERVAL,
+        compact_min_deltas: int = COMPACT_MIN_DELTAS,
+        top_ips: int = TOP_IPS,
+    ):
+        self.root = root
+        self.persist_interval = persist_interval
+        self.compact_min_deltas = compact_min_deltas
+        self.top_ips = top_ips
+        self._pending = _Tables()  # added, not persisted yet
+        self._lock = threading.Lock()
+        self._next_persist = time.monotonic() + persist_interval
+        self._merged = _Tables()  # persisted files read so far ...
+        self._merged_files: Dict[str, tuple] = {}  # ... path -> (inode, mtime)
+        self._read_lock = threading.RLock()
+        self.deltas_written = 0
+        self.compactions = 0
+
+    # ── writes ────────────────────────────────────────────────────────────
+    def add(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Count alerts (as built by alert_logger.log_alert)."""
+        with self._lock:
+            counts, ips = self._pending.counts, self._pending.ips
+            for r in records:
+                timestamp = r.get("timestamp")
+                if not isinstance(timestamp, str) or len(timestamp) < 16:
+                    continue
+                dims = (
+                    r.get("attack_type") or "unknown",
+                    r.get("severity") or "unknown",
+                    r.get("source") or "unknown",
+                )
+                for resolution, n in RESOLUTIONS.items():
+                    counts[resolution][(timestamp[:n],) + dims] += 1
+                ip = r.get("client_ip") or "unknown"
+                for resolution in IP_RESOLUTIONS:
+                    ips[resolution][(timestamp[: RESOLUTIONS[resolution]], ip)] += 1
+
+    def maybe_persist(self) -> None:
+        """persist() if the persist interval has passed."""
+        if time.monotonic() >= self._next_persist:
+            self.persist()
+
+    def persist(self) -> bool:
+        """
+        Write the counts added since the last persist as a delta file, then
+        compact if enough delta files piled up. Returns False on failure
+        (the counts are kept for the next attempt).
+        """
+        self._next_persist = time.monotonic() + self.persist_interval
+        with self._lock:
+            pending, self._pending = self._pending, _Tables()
+        if not pending:
+            return True
+        pending.prune(self.top_ips)
+        stamp = f"{time.time_ns() // 1_000_000}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        name = f"{_DELTA}{stamp}.json"
+        try:
+            # Written under a hidden name and renamed: readers never see a part
+            tmp = os.path.join(self.root, "." + name)
+            _write_json(tmp, pending.encode())
+            os.rename(tmp, os.path.join(self.root, name))
+        except OSError as err:
+            print("❌ Rollup persist error:", err)
+            with self._lock:
+                self._pending.update(pending)
+            return False
+        self.deltas_written += 1
+        if len(self._deltas()) >= self.compact_min_deltas:
+            try:
+                self.compact()
+            except (OSError, ValueError):
+                logger.exception("Rollup compaction failed")
+        return True
+
+    def compact(self, now: Optional[datetime] = None) -> bool:
+        """
+        Merge the delta files into rollups.json and apply retention and
+        TOP_IPS; returns False if another process is compacting.
+        """
+        with flock(
+            os.path.join(self.root, _COMPACT_LOCK), fcntl.LOCK_EX | fcntl.LOCK_NB
+        ) as locked:
+            if not locked:
+                return False
+            deltas = self._deltas()
+            tables = _Tables()
+            for path in [self._base()] + deltas:
+                data = _read_json(path)
+                if data is not None:
+                    tables.merge(data)
+            tables.prune(self.top_ips, now or datetime.utcnow())
+            tmp = os.path.join(self.root, f".{_BASE}-{uuid.uuid4().hex}")
+            _write_json(tmp, tables.encode())
+            with flock(os.path.join(self.root, _READ_LOCK), fcntl.LOCK_EX):
+                os.rename(tmp, self._base())
+                for path in deltas:
+                    os.remove(path)
+            self.compactions += 1
+            logger.info("Compacted %d rollup deltas in %s", len(deltas), self.root)
+            return True
+
+    # ── reads ─────────────────────────────────────────────────────────────
+    def counts(
+        self,
+        resolution: str = "day",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Counter:
+        """
+        {(bucket, attack_type, severity, source): count} for the buckets
+        overlapping [start, end) (either bound optional).
+        """
+        return self._filtered("counts", resolution, start, end)
+
+    def top_client_ips(
+        self,
+        resolution: str = "day",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        n: int = 10,
+    ) -> List[Tuple[str, int]]:
+        """[(client_ip, count)] for the n busiest IPs in [start, end)."""
+        if resolution not in IP_RESOLUTIONS:
+            raise ValueError(f"client IPs are rolled up per {IP_RESOLUTIONS}")
+        out: Counter = Counter()
+        for (_, ip), count in self._filtered("ips", resolution, start, end).items():
+            out[ip] += count
+        return sorted(out.items(), key=lambda kv: (-kv[1], kv[0]))[:n]
+
+    def summary(
+        self,
+        resolution: str = "day",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        Aggregates for the dashboard and the report: total, by_attack_type,
+        by_severity, by_source, severity_by_type ({(severity, type): n}),
+        per_bucket ({bucket: n}, sorted) and top_client_ips.
+        """
+        by_type: Counter = Counter()
+        by_severity: Counter = Counter()
+        by_source: Counter = Counter()
+        severity_by_type: Counter = Counter()
+        per_bucket: Counter = Counter()
+        for (bucket, attack_type, severity, source), n in self.counts(
+            resolution, start, end
+        ).items():
+            by_type[attack_type] += n
+            by_severity[severity] += n
+            by_source[source] += n
+            severity_by_type[(severity, attack_type)] += n
+            per_bucket[bucket] += n
+        ip_resolution = resolution if resolution in IP_RESOLUTIONS else "hour"
+        return {
+            "total": sum(per_bucket.values()),
+            "by_attack_type": by_type,
+            "by_severity": by_severity,
+            "by_source": by_source,
+            "severity_by_type": severity_by_type,
+            "per_bucket": dict(sorted(per_bucket.items())),
+            "top_client_ips": self.top_client_ips(ip_resolution, start, end),
+        }
+
+    # ── internals ─────────────────────────────────────────────────────────
+    def _base(self) -> str:
+        return os.path.join(self.root, _BASE)
+
+    def _deltas(self) -> List[str]:
+        try:
+            names = sorted(os.listdir(self.root))
+        except OSError:
+            return []
+        return [os.path.join(self.root, n) for n in names if n.startswith(_DELTA)]
+
+    def _filtered(self, kind: str, resolution: str, start, end) -> Counter:
+        # Rows of one table whose bucket overlaps [start, end), persisted
+        # and pending
+        keep = _bucket_filter(resolution, start, end)
+        with self._read_lock:
+            table = getattr(self._refresh(), kind)[resolution]
+            out = Counter({key: n for key, n in table.items() if keep(key[0])})
+        with self._lock:
+            for key, n in getattr(self._pending, kind)[resolution].items():
+                if keep(key[0]):
+                    out[key] += n
+        return out
+
+    def _refresh(self) -> "_Tables":
+        # Brings the merged view up to date with the files; consistent with
+        # respect to compaction thanks to the shared read lock
+        with self._read_lock:
+            if not os.path.isdir(self.root):
+                return self._merged
+            with flock(os.path.join(self.root, _READ_LOCK), fcntl.LOCK_SH):
+                files = {}
+                for path in [self._base()] + self._deltas():
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue  # no base yet
+                    files[path] = (st.st_ino, st.st_mtime_ns)
+                known = self._merged_files
+                if any(files.get(path) != known[path] for path in known):
+                    # Compacted (new base, deltas gone): start over
+                    self._merged, known = _Tables(), {}
+                for path, identity in files.items():
+                    if path not in known:
+                        data = _read_json(path)
+                        if data is not None:
+                            self._merged.merge(data)
+                self._merged_files = files
+            return self._merged
+
+
+class _Tables:
+    """
+    Rollup counters by resolution: counts[resolution] maps (bucket,
+    attack_type, severity, source) to a count, ips[resolution] maps
+    (bucket, client_ip) to a count. Serialised as lists of rows.
+    """
+
+    def __init__(self):
+        self.counts = {res: Counter() for res in RESOLUTIONS}
+        self.ips = {res: Counter() for res in IP_RESOLUTIONS}
+
+    def __bool__(self) -> bool:
+        return any(self.counts.values()) or any(self.ips.values())
+
+    def update(self, other: "_Tables") -> None:
+        for res, table in other.counts.items():
+            self.counts[res].update(table)
+        for res, table in other.ips.items():
+            self.ips[res].update(table)
+
+    def merge(self, data: Dict[str, Dict[str, list]]) -> None:
+        for kind in ("counts", "ips"):
+            tables = getattr(self, kind)
+            for res, rows in data.get(kind, {}).items():
+                table = tables[res]
+                for *key, n in rows:
+                    table[tuple(key)] += n
+
+    def encode(self) -> Dict[str, Dict[str, list]]:
+        return {
+            kind: {
+                res: [[*key, n] for key, n in table.items()]
+                for res, table in getattr(self, kind).items()
+                if table
+            }
+            for kind in ("counts", "ips")
+        }
+
+    def prune(self, top_ips: int, now: Optional[datetime] = None) -> None:
+        """
+        Keep the top_ips IPs of each bucket and, given `now`, drop buckets
+        past their RETENTION.
+        """
+        for res, keep in RETENTION.items():
+            if keep is None or now is None:
+                continue
+            oldest = (now - keep).isoformat()[: RESOLUTIONS[res]]
+            for table in (self.counts[res], self.ips.get(res, {})):
+                for key in [k for k in table if k[0] < oldest]:
+                    del table[key]
+        for res, table in self.ips.items():
+            per_bucket: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+            for (bucket, ip), n in table.items():
+                per_bucket[bucket].append((ip, n))
+            self.ips[res] = Counter(
+                {
+                    (bucket, ip): n
+                    for bucket, entries in per_bucket.items()
+                    for ip, n in sorted(entries, key=lambda e: (-e[1], e[0]))[:top_ips]
+                }
+            )
+
+
+def _bucket_filter(resolution: str, start, end):
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {tuple(RESOLUTIONS)}")
+    n = RESOLUTIONS[resolution]
+    first = start.isoformat()[:n] if start is not None else None
+    last = (end - timedelta(microseconds=1)).isoformat()[:n] if end else None
+    return lambda b: (first is None or b >= first) and (last is None or b <= last)
+
+
+def _read_json(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_json(path: str, data) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
@@ -0,0 +1,339 @@
+# alert_store.py
+
+import fcntl
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from file_locks import flock
+
+logger = logging.getLogger(__name__)
+
+# ─── Layout and compaction ─────────────────────────────────────────────────────
+COMPACT_INTERVAL = 300.0  # seconds between background compaction passes
+COMPACT_MIN_SEGMENTS = 4  # small segments in a partition before they are merged
+COMPACT_TARGET_ROWS = 250_000  # segments below this are "small"
+ROW_GROUP_ROWS = 64_000  # rows per Parquet row group (the pruning granularity)
+SCAN_BATCH_ROWS = 16_384  # rows per record batch yielded by scan()
+
+_DICT = pa.dictionary(pa.int32(), pa.string())
+SCHEMA = pa.schema(
+    [
+        ("timestamp", pa.timestamp("us")),  # UTC, as written by alert_logger
+        ("request_id", pa.string()),
+        ("path", pa.string()),
+        ("method", _DICT),
+        ("client_ip", _DICT),
+        ("user_agent", pa.string()),
+        ("attack_type", _DICT),
+        ("pattern", pa.string()),
+        ("explanation", pa.string()),
+        ("severity", _DICT),
+        ("source", _DICT),
+        ("confidence", pa.float64()),
+    ]
+)
+_PARTITION = "date="
+_READ_LOCK = ".read.lock"
+_COMPACT_LOCK = ".compact.lock"
+
+
+class AlertStore:
+    """
+    Alerts as day-partitioned Parquet segments under `root`:
+
+      root/date=2026-10-17/seg-<ms>-<pid>-<id>.parquet
+
+    append() writes one segment per day in each batch. Segments are written
+    under a hidden name and renamed into place, so readers never see a
+    partial file. Columns are typed, and attack_type, severity, source,
+    method and client_ip are dictionary-encoded.
+
+    compact() merges the small segments of a partition into one, sorted by
+    time. Each partition has two flock files: compactors take
+    .compact.lock exclusively, so merges never overlap across processes.
+    The swap (rename the merged file in, delete its inputs) holds
+    .read.lock exclusively, while query() holds it shared, so a reader
+    never sees both.
+
+    query() and scan() prune partitions by date. Time and column filters
+    are pushed down to the Parquet row-group statistics.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        compact_interval: float = COMPACT_INTERVAL,
+        compact_min_segments: int = COMPACT_MIN_SEGMENTS,
+        compact_target_rows: int = COMPACT_TARGET_ROWS,
+    ):
+        self.root = root
+        self.compact_interval = compact_interval
+        self.compact_min_segments = compact_min_segments
+        self.compact_target_rows = compact_target_rows
+        self._next_compaction = time.monotonic() + compact_interval
+        self._compacting = False
+        self.segments_written = 0
+        self.compactions = 0
+        self.failed_compactions = 0
+
+    # ── writes ────────────────────────────────────────────────────────────
+    def append(self, records: Sequence[Dict[str, Any]]) -> int:
+        """
+        Write alerts as new segments (one per day present); returns the rows
+        written. May start a background compaction pass.
+        """
+        if not records:
+            return 0
+        table = to_table(records)
+        days = pc.strftime(table["timestamp"], format="%Y-%m-%d").fill_null("unknown")
+        for day in pc.unique(days).to_pylist():
+            part = table.filter(pc.equal(days, day))
+            self._write_segment(self._partition(day), part, "seg")
+        self.maybe_compact()
+        return table.num_rows
+
+    def maybe_compact(self) -> None:
+        """Start a background compaction pass if one is due."""
+        if self.compact_interval < 0 or self._compacting:
+            return
+        if time.monotonic() < self._next_compaction:
+            return
+        self._next_compaction = time.monotonic() + self.compact_interval
+        self._compacting = True
+        threading.Thread(
+            target=self._background_compact, name="alert-compact", daemon=True
+        ).start()
+
+    def compact(self) -> int:
+        """
+        Merge the small segments of every partition; returns the number of
+        partitions compacted.
+        """
+        merged = 0
+        for day in self.days():
+            merged += self._compact_partition(self._partition(day))
+        return merged
+
+    # ── reads ─────────────────────────────────────────────────────────────
+    def days(self) -> List[str]:
+        """Partition dates present, oldest first ("YYYY-MM-DD")."""
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        return sorted(n[len(_PARTITION) :] for n in names if n.startswith(_PARTITION))
+
+    def query(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> pa.Table:
+        """
+        Alerts with start <= timestamp < end (either bound optional), as an
+        Arrow table. `filters` maps a column to a value or to a list of
+        accepted values. Only the partitions in the date range are opened;
+        row groups are skipped using their min/max statistics.
+        """
+        expr = _expression(start, end, filters)
+        tables = []
+        for day in self._days_between(start, end):
+            with self._reading(day) as dataset:
+                if dataset is not None:
+                    tables.append(dataset.to_table(columns=columns, filter=expr))
+        if not tables:
+            schema = (
+                SCHEMA
+                if columns is None
+                else pa.schema([SCHEMA.field(c) for c in columns])
+            )
+            return schema.empty_table()
+        return pa.concat_tables(tables)
+
+    def scan(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: Optional[Sequence[str]] = None,
+        batch_size: int = SCAN_BATCH_ROWS,
+    ) -> Iterator[pa.RecordBatch]:
+        """
+        Like query(), but yields record batches of at most `batch_size`
+        rows, partition by partition, so memory stays bounded whatever the
+        time range.
+        """
+        expr = _expression(start, end, filters)
+        for day in self._days_between(start, end):
+            with self._reading(day) as dataset:
+                if dataset is None:
+                    continue
+                for batch in dataset.to_batches(
+                    columns=columns, filter=expr, batch_size=batch_size
+                ):
+                    if batch.num_rows:
+                        yield batch
+
+    # ── internals ─────────────────────────────────────────────────────────
+    def _partition(self, day: str) -> str:
+        return os.path.join(self.root, _PARTITION + day)
+
+    @contextmanager
+    def _reading(self, day: str):
+        # The partition as a dataset (None if empty), safe from compaction
+        partition = self._partition(day)
+        with flock(os.path.join(partition, _READ_LOCK), fcntl.LOCK_SH):
+            files = self._segments(partition)
+            yield ds.dataset(files, schema=SCHEMA, format="parquet") if files else None
+
+    def _days_between(self, start, end) -> Iterable[str]:
+        # Partitions are whole days: keep those that can overlap [start, end)
+        first = start.date().isoformat() if start is not None else None
+        last = (end - timedelta(microseconds=1)).date().isoformat() if end else None
+        for day in self.days():
+            if day == "unknown":
+                if start is None and end is None:
+                    yield day
+                continue
+            if (first is None or day >= first) and (last is None or day <= last):
+                yield day
+
+    @staticmethod
+    def _segments(partition: str) -> List[str]:
+        try:
+            names = sorted(os.listdir(partition))
+        except OSError:
+            return []
+        return [
+            os.path.join(partition, n)
+            for n in names
+            if n.endswith(".parquet") and not n.startswith(".")
+        ]
+
+    def _write_segment(self, partition: str, table: pa.Table, kind: str) -> str:
+        os.makedirs(partition, exist_ok=True)
+        name = _segment_name(kind)
+        tmp = os.path.join(partition, "." + name)
+        pq.write_table(table, tmp, row_group_size=ROW_GROUP_ROWS)
+        path = os.path.join(partition, name)
+        os.rename(tmp, path)
+        self.segments_written += 1
+        return path
+
+    def _compact_partition(self, partition: str) -> int:
+        with flock(
+            os.path.join(partition, _COMPACT_LOCK), fcntl.LOCK_EX | fcntl.LOCK_NB
+        ) as locked:
+            if not locked:
+                return 0  # another process is compacting it
+            small = [
+                f
+                for f in self._segments(partition)
+                if pq.ParquetFile(f).metadata.num_rows < self.compact_target_rows
+            ]
+            if len(small) < self.compact_min_segments:
+                return 0
+            table = ds.dataset(small, schema=SCHEMA, format="parquet").to_table()
+            table = table.sort_by("timestamp")
+            tmp = os.path.join(partition, f".cmp-{uuid.uuid4().hex}.parquet")
+            pq.write_table(table, tmp, row_group_size=ROW_GROUP_ROWS)
+            name = _segment_name("cmp")
+            with flock(os.path.join(partition, _READ_LOCK), fcntl.LOCK_EX):
+                os.rename(tmp, os.path.join(partition, name))
+                for f in small:
+                    os.remove(f)
+            self.compactions += 1
+            logger.info(
+                "Compacted %d segments (%d rows) in %s",
+                len(small),
+                table.num_rows,
+                partition,
+            )
+            return 1
+
+    def _background_compact(self) -> None:
+        try:
+            self.compact()
+        except Exception:
+            self.failed_compactions += 1
+            logger.exception("Alert store compaction failed")
+        finally:
+            self._compacting = False
+
+
+def to_table(records: Sequence[Dict[str, Any]]) -> pa.Table:
+    """Alert dicts (as built by alert_logger.log_alert) as a SCHEMA table."""
+    columns = {}
+    for field in SCHEMA:
+        values = [r.get(field.name) for r in records]
+        if field.name == "timestamp":
+            columns[field.name] = _timestamps(values)
+        elif field.name == "confidence":
+            columns[field.name] = pa.array(
+                [v if isinstance(v, (int, float)) else None for v in values],
+                pa.float64(),
+            )
+        else:
+            strings = pa.array(
+                [None if v is None else str(v) for v in values], pa.string()
+            )
+            columns[field.name] = (
+                strings.dictionary_encode() if field.type == _DICT else strings
+            )
+    return pa.table(columns, schema=SCHEMA)
+
+
+def _segment_name(kind: str) -> str:
+    """Unique, time-ordered file name for a new segment of `kind`."""
+    stamp = f"{time.time_ns() // 1_000_000}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    return f"{kind}-{stamp}.parquet"
+
+
+def _timestamps(values: List[Any]) -> pa.Array:
+    strings = pa.array([None if v is None else str(v) for v in values], pa.string())
+    try:
+        return strings.cast(SCHEMA.field("timestamp").type)
+    except pa.ArrowInvalid:
+        parsed = []
+        for v in strings.to_pylist():
+            try:
+                parsed.append(datetime.fromisoformat(v) if v else None)
+            except ValueError:
+                parsed.append(None)
+        return pa.array(parsed, SCHEMA.field("timestamp").type)
+
+
+def _expression(start, end, filters):
+    expr = None
+    if start is not None:
+        expr = _and(expr, pc.field("timestamp") >= pa.scalar(start, SCHEMA[0].type))
+    if end is not None:
+        expr = _and(expr, pc.field("timestamp") < pa.scalar(end, SCHEMA[0].type))
+    for column, value in (filters or {}).items():
+        if isinstance(value, (list, tuple, set, frozenset)):
+            expr = _and(expr, pc.field(column).isin(list(value)))
+        else:
+            expr = _and(expr, pc.field(column) == value)
+    return expr
+
+
+def _and(expr, condition):
+    return condition if expr is None else expr & condition
+
+
+def day_bounds(day: date):
+    """[start, end) datetimes of one UTC day, for query()."""
+    start = datetime(day.year, day.month, day.day)
+    return start, start + timedelta(days=1)
@@ -1,31 +1,83 @@
 # app_demo.py
 
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from fastapi import FastAPI, Request
-from waf_middleware import WAFMiddleware
+from starlette.responses import PlainTextResponse
+
+import alert_logger
+from metrics import CONTENT_TYPE, REGISTRY
+from model_registry import get_model
+from payload_extraction import parsed_body
+from waf_asgi import WAFASGIMiddleware
+from waf_middleware import WAFMiddleware, client_host, ml_settings
+
+# Which WAF implementation wraps the app:
+#   "asgi": pure-ASGI middleware with chunked, size-limited body reads
+#   "base": Starlette BaseHTTPMiddleware
+WAF_MIDDLEWARE = "asgi"
 
-app = FastAPI()
-app.add_middleware(WAFMiddleware)
+# metrics.REGISTRY (WAF stage latencies, decisions, ML batching) in the
+# Prometheus text format at this path, for local scrapers only; None removes
+# the route. Each worker process serves its own metrics.
+METRICS_PATH: Optional[str] = "/metrics"
+METRICS_CLIENTS = ("127.0.0.1", "::1")  # client addresses allowed; None = any
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the model and the alert writers' backends before serving rather
+    # than on the first request
+    alert_logger.start()
+    if ml_settings.mode != "off":
+        get_model()
+    yield
+    # Flush queued alerts before the worker exits
+    alert_logger.shutdown()
 
 
-@app.get("/")
 async def root():
     return {"message": "Welcome to WAF-XAI"}
 
 
-@app.post("/submit")
 async def submit(request: Request):
     """
     Business endpoint for benign requests.
     The WAFMiddleware will block malicious payloads (returning 403)
     before this handler is invoked.
     """
-    # 1) Parse JSON body or fallback to raw bytes
-    try:
-        body = await request.json()
-        received = body.get("input", "")
-    except Exception:
-        raw = await request.body()
-        received = raw.decode("utf-8", "ignore")
+    # 1) The body as already parsed by the WAF (JSON or raw text)
+    body = await parsed_body(request)
+    if isinstance(body.json, dict):
+        received = body.json.get("input", "")
+    else:
+        received = body.raw.decode("utf-8", "ignore")
 
     # 2) Return only application data—no WAF internals
     return {"received": received}
+
+
+async def metrics(request: Request):
+    allowed = METRICS_CLIENTS is None or client_host(request.scope) in METRICS_CLIENTS
+    if not allowed:
+        return PlainTextResponse("Not Found", status_code=404)
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+def create_app(waf_middleware: str = WAF_MIDDLEWARE) -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+    if waf_middleware == "asgi":
+        app.add_middleware(WAFASGIMiddleware)
+    elif waf_middleware == "base":
+        app.add_middleware(WAFMiddleware)
+    else:
+        raise ValueError(f"Unknown WAF middleware {waf_middleware!r}")
+    app.get("/")(root)
+    app.post("/submit")(submit)
+    if METRICS_PATH:
+        app.get(METRICS_PATH, include_in_schema=False)(metrics)
+    return app
+
+
+app = create_app()
@@ -0,0 +1,170 @@
+# cascade.py
+
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import MaxAbsScaler
+
+BENIGN_LABEL = "benign"
+
+# Accuracy loss (vs the forest alone, on the calibration set) that the calibrated
+# band may cost by default; 0.0 = keep the forest's accuracy
+CASCADE_TOLERANCE = 0.0
+# Thresholds considered by calibrate_band() on each side of 0.5
+BAND_GRID = np.round(np.linspace(0.0, 0.5, 51), 2)
+
+
+class CascadePipeline:
+    """
+    Two-stage attack classifier over one shared feature extraction.
+
+    A logistic regression scores every payload first. Its probability of
+    "malicious" (1 - P(benign)) decides alone when it is outside the
+    uncertainty band, i.e. <= low or >= high; only payloads strictly inside
+    (low, high) are sent to the RandomForest. The band is calibrated at
+    training time (see calibrate_band) and can be overridden per call.
+
+    Works like the wrapped pipeline for callers: classes_, predict_proba and
+    predict. `pipeline` is either the sklearn Pipeline (features + clf) or
+    a model_artifact.FastPipeline.
+    """
+
+    def __init__(
+        self,
+        pipeline,
+        linear,
+        low: float,
+        high: float,
+        calibration: Optional[Dict[str, Any]] = None,
+    ):
+        self.pipeline = pipeline
+        self.linear = linear
+        self.low = low
+        self.high = high
+        self.calibration = calibration or {}
+        self.classes_ = pipeline.classes_
+        self._benign = [str(c) for c in self.classes_].index(BENIGN_LABEL)
+        self._lock = threading.Lock()
+        self.linear_decided = 0
+        self.forest_scored = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self.linear_decided = self.forest_scored = 0
+
+    def transform_features(self, X):
+        if hasattr(self.pipeline, "transform_features"):
+            return self.pipeline.transform_features(X)
+        return self.pipeline.named_steps["features"].transform(X)
+
+    def forest_proba(self, features) -> np.ndarray:
+        if hasattr(self.pipeline, "predict_proba_features"):
+            return self.pipeline.predict_proba_features(features)
+        return self.pipeline.named_steps["clf"].predict_proba(features)
+
+    def predict_proba_routed(
+        self, X, band: Optional[Tuple[float, float]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Probabilities plus a boolean mask of the rows the forest scored.
+        """
+        low, high = band if band is not None else (self.low, self.high)
+        features = self.transform_features(list(X))
+        proba = self.linear.predict_proba(features)
+        p_mal = 1.0 - proba[:, self._benign]
+        uncertain = (p_mal > low) & (p_mal < high)
+        if uncertain.any():
+            proba[uncertain] = self.forest_proba(features[np.flatnonzero(uncertain)])
+
+        n_forest = int(uncertain.sum())
+        with self._lock:
+            self.forest_scored += n_forest
+            self.linear_decided += len(uncertain) - n_forest
+        return proba, uncertain
+
+    def predict_proba(self, X, band: Optional[Tuple[float, float]] = None):
+        return self.predict_proba_routed(X, band)[0]
+
+    def predict(self, X, band: Optional[Tuple[float, float]] = None):
+        return self.classes_.take(np.argmax(self.predict_proba(X, band), axis=1))
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.linear_decided + self.forest_scored
+        return {
+            "band": [self.low, self.high],
+            "linear_decided": self.linear_decided,
+            "forest_scored": self.forest_scored,
+            "forest_fraction": self.forest_scored / total if total else 0.0,
+        }
+
+
+def fit_linear_stage(features, y, random_state: int = 42) -> LogisticRegression:
+    """
+    Fit the cheap first stage on the pipeline's (sparse) features.
+    Columns are max-abs scaled for the fit (the side-channel counts are not
+    in TF-IDF range) and the scaling is folded back into the coefficients,
+    so the returned model takes the raw features.
+    """
+    scaler = MaxAbsScaler().fit(features)
+    linear = LogisticRegression(
+        max_iter=2000, class_weight="balanced", random_state=random_state
+    )
+    linear.fit(scaler.transform(features), y)
+    linear.coef_ = linear.coef_ / scaler.scale_
+    return linear
+
+
+def calibrate_band(
+    linear_proba: np.ndarray,
+    forest_proba: np.ndarray,
+    y: Sequence[str],
+    classes: Sequence[str],
+    tolerance: float = CASCADE_TOLERANCE,
+) -> Dict[str, Any]:
+    """
+    Pick the narrowest (low, high) band whose cascade accuracy on `y` is at
+    most `tolerance` below the forest's; ties go to the more accurate band.
+    Returns the band plus the accuracies and forest fraction it yields.
+    """
+    classes = [str(c) for c in classes]
+    y = np.asarray(y).astype(str)
+    p_mal = 1.0 - linear_proba[:, classes.index(BENIGN_LABEL)]
+    linear_ok = np.asarray(classes)[np.argmax(linear_proba, axis=1)] == y
+    forest_ok = np.asarray(classes)[np.argmax(forest_proba, axis=1)] == y
+    forest_acc = float(forest_ok.mean())
+
+    best = None
+    for low in BAND_GRID:
+        for high in np.round(1.0 - BAND_GRID, 2):
+            uncertain = (p_mal > low) & (p_mal < high)
+            acc = float(np.where(uncertain, forest_ok, linear_ok).mean())
+            if acc < forest_acc - tolerance:
+                continue
+            candidate = (float(uncertain.mean()), -acc, float(low), float(high))
+            if best is None or candidate < best:
+                best = candidate
+
+    if best is None:
+        # Not even the widest band qualifies: route (nearly) everything
+        uncertain = (p_mal > 0.0) & (p_mal < 1.0)
+        acc = float(np.where(uncertain, forest_ok, linear_ok).mean())
+        best = (float(uncertain.mean()), -acc, 0.0, 1.0)
+
+    fraction, neg_acc, low, high = best
+    return {
+        "low": low,
+        "high": high,
+        "tolerance": tolerance,
+        "accuracy": -neg_acc,
+        "forest_accuracy": forest_acc,
+        "linear_accuracy": float(linear_ok.mean()),
+        "forest_fraction": fraction,
+    }
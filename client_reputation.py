@@ -0,0 +1,100 @@
+# client_reputation.py
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict
+
+
+class _Client:
+    __slots__ = ("blocks", "banned_until")
+
+    def __init__(self, threshold: int):
+        self.blocks: deque = deque(maxlen=threshold)  # recent block times
+        self.banned_until = 0.0
+
+
+class ClientReputation:
+    """
+    Per-client sliding-window count of recent WAF blocks.
+
+    A client with `threshold` blocks inside the last `window_seconds` is
+    banned for `cooldown_seconds`: the middleware rejects its requests
+    before reading or parsing the body. Each client keeps only its last
+    `threshold` block times, so the window is exact and bounded. At most
+    `max_clients` are tracked; the least recently seen is evicted first.
+    """
+
+    def __init__(
+        self,
+        threshold: int = 20,
+        window_seconds: float = 60.0,
+        cooldown_seconds: float = 300.0,
+        max_clients: int = 100_000,
+    ):
+        if threshold < 1 or max_clients < 1:
+            raise ValueError("threshold and max_clients must be >= 1")
+        self.threshold = threshold
+        self.window = window_seconds
+        self.cooldown = cooldown_seconds
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[str, _Client]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.short_circuited = 0  # requests rejected while banned
+        self.bans = 0
+        self.evictions = 0
+
+    def is_banned(self, client: str) -> bool:
+        """
+        True if `client` is cooling down; counts the request as
+        short-circuited.
+        """
+        entry = self._clients.get(client)
+        if entry is None or entry.banned_until <= time.monotonic():
+            return False
+        with self._lock:
+            self.short_circuited += 1
+            if client in self._clients:
+                self._clients.move_to_end(client)
+        return True
+
+    def record_block(self, client: str) -> bool:
+        """
+        Count one blocked request from `client`; returns True if it starts
+        a ban.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._clients.get(client)
+            if entry is None:
+                entry = self._clients[client] = _Client(self.threshold)
+                if len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._clients.move_to_end(client)
+
+            entry.blocks.append(now)
+            if (
+                len(entry.blocks) == self.threshold
+                and entry.blocks[0] > now - self.window
+                and entry.banned_until <= now
+            ):
+                entry.banned_until = now + self.cooldown
+                entry.blocks.clear()
+                self.bans += 1
+                return True
+            return False
+
+    def stats(self) -> Dict[str, int]:
+        now = time.monotonic()
+        with self._lock:
+            banned = sum(1 for c in self._clients.values() if c.banned_until > now)
+            return {
+                "clients": len(self._clients),
+                "banned": banned,
+                "bans": self.bans,
+                "short_circuited": self.short_circuited,
+                "evictions": self.evictions,
+            }
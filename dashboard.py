@@ -1,111 +1,156 @@
 # dashboard.py
 
-import os
-import json
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
-import streamlit as st
 import pandas as pd
 import plotly.express as px
+import streamlit as st
+
+from alert_logger import ALERT_STORE_DIR, LOG_FILE, ROLLUP_DIR
+from alert_rollups import Rollups
+from alert_store import AlertStore, day_bounds
+from log_ingest import AlertFrame, AlertLog
 
-LOG_FILE = "logs/alerts.json"
+TABLE_ROWS = 1000  # most recent alerts shown in the table
+TREND_HOURS = 48  # hours shown in the hourly rollup chart
+STORE_REFRESH_SECONDS = 60  # how long a date range loaded from the store is reused
+# Alert source selected by default when the Parquet store has data. The JSONL
+# log has every alert; the store only those logged since it was enabled.
+DEFAULT_SOURCE = "jsonl"  # "jsonl" | "store"
+SOURCE_NAMES = {"jsonl": "JSONL log (all alerts)", "store": "Parquet store"}
 
 st.set_page_config(page_title="WAF-XAI Dashboard", layout="wide")
 st.title("🛡️ WAF-XAI Threat Dashboard")
 st.markdown("Real-time visualization of regex & ML detections")
 
-# ─── Load and parse logs ───────────────────────────────────────────────────────
-if not os.path.exists(LOG_FILE):
-    st.warning("No alerts found. Trigger some malicious and benign requests first.")
-    st.stop()
 
-with open(LOG_FILE, "r") as f:
-    lines = [line.strip() for line in f if line.strip()]
+# ─── Load and parse logs ───────────────────────────────────────────────────────
+@st.cache_resource
+def alert_log(path: str) -> AlertLog:
+    # One incrementally refreshed log per server, shared by every session
+    return AlertLog(path)
+
+
+@st.cache_resource(ttl=STORE_REFRESH_SECONDS)
+def stored_alerts(root: str, first: date, last: date) -> AlertFrame:
+    # Only the partitions of the selected days are read
+    start, end = day_bounds(first)[0], day_bounds(last)[1]
+    return AlertFrame(AlertStore(root).query(start, end).to_pandas())
+
+
+@st.cache_resource
+def alert_rollups(root: str) -> Rollups:
+    # Shared so that each rollup file is parsed once per server
+    return Rollups(root)
+
+
+store_days = []
+if ALERT_STORE_DIR:
+    for day in AlertStore(ALERT_STORE_DIR).days():
+        try:
+            store_days.append(date.fromisoformat(day))
+        except ValueError:
+            pass
+
+source = "jsonl"
+if store_days:
+    source = st.sidebar.radio(
+        "Alert source",
+        tuple(SOURCE_NAMES),
+        index=tuple(SOURCE_NAMES).index(DEFAULT_SOURCE),
+        format_func=SOURCE_NAMES.get,
+    )
 
-if not lines:
-    st.info("Log file is empty.")
+if source == "store":
+    # Parquet alert store: load the selected days only
+    selected = st.sidebar.date_input(
+        "Days",
+        value=(store_days[-1], store_days[-1]),
+        min_value=store_days[0],
+        max_value=store_days[-1],
+    )
+    selected = tuple(selected) or (store_days[-1],)  # (start,) while picking
+    first, last = selected[0], selected[-1]
+    log = stored_alerts(ALERT_STORE_DIR, first, last)
+else:
+    log = alert_log(LOG_FILE)
+    log.refresh()  # only parses lines appended since the last rerun
+df = log.frame
+
+if df.empty:
+    st.warning("No alerts found. Trigger some malicious and benign requests first.")
     st.stop()
 
-records = [json.loads(line) for line in lines]
-df = pd.DataFrame(records)
-
-# Ensure required columns exist
-for col in (
-    "timestamp",
-    "attack_type",
-    "source",
-    "severity",
-    "confidence",
-    "client_ip",
-    "explanation",
-):
-    if col not in df.columns:
-        df[col] = None
-
-# Convert timestamp & derive date
-df["timestamp"] = pd.to_datetime(df["timestamp"])
-df["date"] = df["timestamp"].dt.date
-
 # ─── Sidebar filters ──────────────────────────────────────────────────────────
 st.sidebar.header("🔍 Filters")
 
 attack_types = st.sidebar.multiselect(
     "Attack Type",
-    options=sorted(df["attack_type"].fillna("benign").unique()),
-    default=sorted(df["attack_type"].fillna("benign").unique()),
+    options=log.options("attack_type"),
+    default=log.options("attack_type"),
 )
 
 sources = st.sidebar.multiselect(
     "Detection Source",
-    options=sorted(df["source"].fillna("unknown").unique()),
-    default=sorted(df["source"].fillna("unknown").unique()),
+    options=log.options("source"),
+    default=log.options("source"),
 )
 
 severities = st.sidebar.multiselect(
     "Severity",
-    options=sorted(df["severity"].fillna("unknown").unique()),
-    default=sorted(df["severity"].fillna("unknown").unique()),
+    options=log.options("severity"),
+    default=log.options("severity"),
 )
 
 conf_min, conf_max = st.sidebar.slider(
     "Confidence Range", min_value=0.0, max_value=1.0, value=(0.0, 1.0), step=0.01
 )
 
-# Apply filters
-filtered = df[
-    df["attack_type"].fillna("benign").isin(attack_types)
-    & df["source"].fillna("unknown").isin(sources)
-    & df["severity"].fillna("unknown").isin(severities)
-    & df["confidence"].between(conf_min, conf_max)
-]
+# Apply filters (memoized per log version and filter selection)
+filters = (attack_types, sources, severities, (conf_min, conf_max))
+filtered = log.filtered(*filters)
+summary = log.summary(*filters)
+by_type = dict(
+    zip(summary["by_attack_type"]["attack_type"], summary["by_attack_type"]["count"])
+)
 
 # ─── Top‐line metrics ─────────────────────────────────────────────────────────
 col1, col2, col3, col4 = st.columns(4)
-col1.metric("Total Alerts", len(filtered))
-col2.metric("SQLi", int((filtered["attack_type"] == "SQLi").sum()))
-col3.metric("XSS", int((filtered["attack_type"] == "XSS").sum()))
-col4.metric("Benign", int((filtered["attack_type"] == "benign").sum()))
+col1.metric("Total Alerts", summary["total"])
+col2.metric("SQLi", int(by_type.get("SQLi", 0)))
+col3.metric("XSS", int(by_type.get("XSS", 0)))
+col4.metric("Benign", int(by_type.get("benign", 0)))
 
 st.markdown("---")
 
-# ─── Charts: distribution & breakdown ─────────────────────────────────────────
+# ─── Charts: distribution & breakdown (plotted from the aggregates) ──────────
 c1, c2, c3 = st.columns(3)
 
 with c1:
     fig = px.pie(
-        filtered, names="attack_type", title="Attack Type Distribution", hole=0.3
+        summary["by_attack_type"],
+        names="attack_type",
+        values="count",
+        title="Attack Type Distribution",
+        hole=0.3,
     )
     st.plotly_chart(fig, use_container_width=True)
 
 with c2:
-    fig = px.pie(filtered, names="source", title="Detection Source", hole=0.3)
+    fig = px.pie(
+        summary["by_source"],
+        names="source",
+        values="count",
+        title="Detection Source",
+        hole=0.3,
+    )
     st.plotly_chart(fig, use_container_width=True)
 
 with c3:
-    fig = px.histogram(
-        filtered,
+    fig = px.bar(
+        summary["confidence_hist"],
         x="confidence",
-        nbins=20,
+        y="count",
         title="Confidence Scores",
         labels={"confidence": "ML Confidence"},
     )
@@ -113,9 +158,10 @@ with c3:
 
 # ─── Severity breakdown ───────────────────────────────────────────────────────
 st.markdown("### 🔥 Severity Breakdown by Attack Type")
-fig_sev = px.histogram(
-    filtered,
+fig_sev = px.bar(
+    summary["severity_by_type"],
     x="severity",
+    y="count",
     color="attack_type",
     barmode="group",
     title="Severity × Attack Type",
@@ -124,21 +170,62 @@ st.plotly_chart(fig_sev, use_container_width=True)
 
 # ─── Timeline ─────────────────────────────────────────────────────────────────
 st.markdown("### 📈 Alerts Over Time")
-time_series = filtered.groupby("date").size().reset_index(name="count")
 fig_time = px.line(
-    time_series, x="date", y="count", markers=True, title="Number of Alerts per Day"
+    summary["per_day"],
+    x="date",
+    y="count",
+    markers=True,
+    title="Number of Alerts per Day",
 )
 st.plotly_chart(fig_time, use_container_width=True)
 
+# ─── Long-term trend (pre-aggregated rollups, no log scan) ─────────────────────
+rollups = alert_rollups(ROLLUP_DIR) if ROLLUP_DIR else None
+daily = rollups.counts("day") if rollups else {}
+if daily:
+    st.markdown("### 🗓️ Long-Term Trend")
+    t1, t2 = st.columns(2)
+    trend = (
+        pd.DataFrame(
+            [(day, attack_type, n) for (day, attack_type, _, _), n in daily.items()],
+            columns=["date", "attack_type", "count"],
+        )
+        .groupby(["date", "attack_type"], as_index=False)["count"]
+        .sum()
+    )
+    with t1:
+        fig = px.bar(
+            trend,
+            x="date",
+            y="count",
+            color="attack_type",
+            title="Alerts per Day (all retained days)",
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    since = datetime.utcnow() - timedelta(hours=TREND_HOURS)
+    recent = rollups.summary("hour", since)["per_bucket"]
+    with t2:
+        fig = px.line(
+            pd.DataFrame({"hour": list(recent), "count": list(recent.values())}),
+            x="hour",
+            y="count",
+            markers=True,
+            title=f"Alerts per Hour (last {TREND_HOURS} h, UTC)",
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
 # ─── Data export & table ─────────────────────────────────────────────────────
 st.markdown("### 📋 Alert Log Details")
-st.download_button(
-    label="📥 Download Filtered Data as CSV",
-    data=filtered.to_csv(index=False).encode("utf-8"),
-    file_name="waf_xai_alerts.csv",
-    mime="text/csv",
-)
+# Building a CSV of a large log takes a while: only on request
+if st.button("📥 Prepare Filtered Data as CSV"):
+    st.download_button(
+        label="📥 Download Filtered Data as CSV",
+        data=filtered.to_csv(index=False).encode("utf-8"),
+        file_name="waf_xai_alerts.csv",
+        mime="text/csv",
+    )
 
+st.caption(f"Latest {min(TABLE_ROWS, len(filtered)):,} of {len(filtered):,} alerts")
 st.dataframe(
     filtered[
         [
@@ -150,6 +237,6 @@ st.dataframe(
             "confidence",
             "explanation",
         ]
-    ].sort_values("timestamp", ascending=False),
+    ].nlargest(TABLE_ROWS, "timestamp"),
     use_container_width=True,
 )
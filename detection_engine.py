@@ -1,46 +1,619 @@
 # detection_engine.py
 
+import hashlib
+import json
+import logging
+import os
 import re
-from typing import Dict, Any
+import time
+from typing import Dict, Any, FrozenSet, Iterable, List, Optional, Pattern, Tuple
 
-# ─── Regex patterns for XSS and SQLi ──────────────────────────────────────────
+try:  # Python ≥ 3.11
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover - Python 3.10
+    import sre_parse
 
-# Order matters: specific onerror rule must come before the generic on* handler
-XSS_PATTERNS = [
-    r"<script.*?>.*?</script>",
-    r"<img.*?src=.*?onerror=.*?>",
-    r"<.*?on\w+\s*=.*?>",
-    r"javascript:",
-]
+logger = logging.getLogger(__name__)
 
-SQLI_PATTERNS = [
-    r"(\%27)|(\')|(\-\-)|(\%23)|(#)",  # quotes/comments
-    r"(?i)\b(or)\b.*=.*",  # tautology
-    r"(?i)union select",  # UNION SELECT
-    r"(?i)insert\s+into\b",  # INSERT INTO
-    r"(?i)drop table",  # DROP TABLE
-]
+# ─── Rule bundle ───────────────────────────────────────────────────────────────
+# The XSS/SQLi rules, their severities and explanations live in one JSON file
+# (see load_rule_bundle); rule_registry hot-reloads it.
+RULES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "rules", "waf_rules.json"
+)
+SEVERITIES = ("Low", "Medium", "High")
 
+# Linear-time forms of the bundled rules that backtrack polynomially on crafted
+# input. Each one matches a string exactly when its original does (only
+# whether a rule matches matters for priority) but never retries a stage:
+#   - `.` stops at newlines, so a match lies on one line (the handler rule's
+#     `\s*` may also cross into the line holding "=" and ">");
+#   - the earliest occurrence of each stage on a line is always the best
+#     one, so the form is anchored at line starts and every stage jumps to
+#     the first occurrence of its literal ((?:(?!X)[^\n])*X) instead of
+#     trying each one.
+# The original pattern stays the rule's identity (reported pattern,
+# explanations, prefilter literals). On short texts the originals are faster
+# and their worst case is small (~1 ms at 256 characters), so the safe forms
+# are only used above SAFE_FORM_MIN_CHARS. Forms are looked up by the exact
+# pattern; SAFE_FORM_RULES names the bundled rule each was written for, and
+# load_rule_bundle warns when that rule's pattern changes.
+_HANDLER = r"\b(?=\w*on\w)\w+[^\S\n]*="  # on\w+\s*= within one line
+_HANDLER_CROSS = r"\b(?=\w*on\w)\w+[^\S\n]*\n\s*="  # ... across a newline
+SAFE_FORMS = {
+    r"<script.*?>.*?</script>": (
+        r"(?<![^\n])(?:(?!<script)[^\n])*<script[^>\n]*>[^\n]*?</script>"
+    ),
+    r"<img.*?src=.*?onerror=.*?>": (
+        r"(?<![^\n])(?:(?!<img)[^\n])*<img(?:(?!src=)[^\n])*src="
+        r"(?:(?!onerror=)[^\n])*onerror=[^>\n]*>"
+    ),
+    # Only the last word of a line can reach "=" across a newline
+    r"<.*?on\w+\s*=.*?>": (
+        rf"(?<![^\n])[^<\n]*<(?:(?:(?!{_HANDLER})[^\n])*{_HANDLER}[^>\n]*>"
+        rf"|[^\n]*?{_HANDLER_CROSS}[^>\n]*>)"
+    ),
+    r"(?i)\b(or)\b.*=.*": r"(?<![^\n])(?:(?!\bor\b)[^\n])*\bor\b[^=\n]*=",
+}
+SAFE_FORM_RULES = {
+    "xss-script-tag": r"<script.*?>.*?</script>",
+    "xss-img-onerror": r"<img.*?src=.*?onerror=.*?>",
+    "xss-event-handler": r"<.*?on\w+\s*=.*?>",
+    "sqli-tautology": r"(?i)\b(or)\b.*=.*",
+}
+SAFE_FORM_MIN_CHARS = 256
 
-def detect_attack(user_input: Dict[str, Any]) -> Dict[str, Any]:
+# ─── Bounded scanning ──────────────────────────────────────────────────────────
+# Payloads longer than SCAN_WINDOW are searched window by window, and the
+# scan budget is checked between windows. Consecutive windows share
+# SCAN_OVERLAP characters: a match longer than that can be missed where it
+# straddles a window boundary.
+SCAN_WINDOW = 64 * 1024  # characters per regex call
+SCAN_OVERLAP = 4 * 1024
+SCAN_MAX_CHARS = 1024 * 1024  # characters inspected per payload
+SCAN_BUDGET = 0.1  # seconds of regex scanning per payload (checked per window)
+# A payload that is not fully inspected (too long, or out of budget) and has
+# no match in the inspected part is either blocked or let through:
+OVERRUN_POLICY = "block"  # "block" | "allow"
+OVERRUN_LABEL = "ScanOverrun"
+
+_GLOBAL_IGNORECASE = "(?i)"
+
+# Upper bound on cached per-candidate-subset combined patterns
+_MAX_COMBINED_CACHE = 256
+
+# A clause is satisfied when any of its literals occurs in the payload; a
+# rule can only match when all of its clauses are satisfied.
+Clause = FrozenSet[str]
+
+
+class LiteralPrefilter:
+    """
+    One-pass literal scanner placed in front of the regex rules.
+
+    Required literals are extracted from each rule's parse tree. A payload is
+    lower-cased and scanned once, left to right, by a single alternation of
+    all literals (longest first). Only rules whose literal clauses are all
+    satisfied are handed to the regex engine. Non-ASCII payloads bypass the
+    prefilter because IGNORECASE matching treats some non-ASCII characters
+    as equal to ASCII letters.
+    """
+
+    def __init__(self, rule_clauses: List[List[Clause]]):
+        self.rule_clauses: Tuple[Tuple[Clause, ...], ...] = tuple(
+            tuple(clauses) for clauses in rule_clauses
+        )
+        literals = sorted(
+            {lit for clauses in rule_clauses for c in clauses for lit in c},
+            key=lambda s: (-len(s), s),
+        )
+
+        # Every clause gets one bit; a rule's mask is the OR of its clauses
+        clause_bits: Dict[Clause, int] = {}
+        self._rule_masks: List[int] = []
+        for clauses in self.rule_clauses:
+            mask = 0
+            for c in clauses:
+                mask |= clause_bits.setdefault(c, 1 << len(clause_bits))
+            self._rule_masks.append(mask)
+
+        # The scanner reports non-overlapping matches only, so a hit on one
+        # literal also vouches for the literals it contains and, to stay
+        # conservative, for those that could start inside it and be skipped.
+        # Indexed by literal and by proper prefix, so building this is linear
+        # in the number of literals rather than literals × clauses.
+        by_literal: Dict[str, int] = {}
+        for c, bit in clause_bits.items():
+            for other in c:
+                by_literal[other] = by_literal.get(other, 0) | bit
+        by_prefix: Dict[str, int] = {}
+        for other, bits in by_literal.items():
+            for j in range(1, len(other)):
+                by_prefix[other[:j]] = by_prefix.get(other[:j], 0) | bits
+
+        self._literal_masks: Dict[str, int] = {}
+        for lit in literals:
+            mask = 0
+            for i in range(len(lit)):
+                for j in range(i + 1, len(lit) + 1):  # literals inside it
+                    mask |= by_literal.get(lit[i:j], 0)
+                if i:  # literals a proper suffix of it starts
+                    mask |= by_prefix.get(lit[i:], 0)
+            self._literal_masks[lit] = mask
+
+        self._scanner: Optional[Pattern] = (
+            re.compile("|".join(re.escape(lit) for lit in literals))
+            if literals
+            else None
+        )
+        self._by_mask: Dict[int, Tuple[int, ...]] = {}
+
+    def candidates(self, text: str) -> Optional[Tuple[int, ...]]:
+        """
+        Indices of rules that may match ``text``; None when the prefilter
+        cannot decide (every rule must then be tried).
+        """
+        if self._scanner is None or not text.isascii():
+            return None
+
+        present = 0
+        for lit in set(self._scanner.findall(text.lower())):
+            present |= self._literal_masks[lit]
+
+        found = self._by_mask.get(present)
+        if found is None:
+            found = self._by_mask[present] = tuple(
+                i for i, mask in enumerate(self._rule_masks) if mask & present == mask
+            )
+        return found
+
+
+class RuleSet:
+    """
+    Compiled set of detection rules. The rules and scan settings are fixed
+    once built; only the statistics counters change as payloads are scanned.
+
+    All patterns are merged into a single alternation of named groups so a
+    payload is scanned once. Rule order is the match priority: the first rule
+    (in list order) that matches anywhere in the input wins, exactly like
+    testing each pattern with ``re.search`` one by one. A LiteralPrefilter
+    narrows the rules handed to the regex engine, and skips it entirely for
+    payloads containing none of the required literals.
+
+    Rules listed in SAFE_FORMS are matched with their linear-time form on
+    texts longer than SAFE_FORM_MIN_CHARS. Scans are bounded: at most
+    `max_chars` characters are inspected, in windows of `window` characters,
+    until `budget` seconds have been spent (see scan()).
+    """
+
+    def __init__(
+        self,
+        rules: List[Tuple[str, str]],
+        flags: int = re.IGNORECASE,
+        window: int = SCAN_WINDOW,
+        overlap: int = SCAN_OVERLAP,
+        max_chars: int = SCAN_MAX_CHARS,
+        budget: float = SCAN_BUDGET,
+        details: Optional[List[Dict[str, str]]] = None,
+    ):
+        if not 0 <= overlap < window:
+            raise ValueError("overlap must be smaller than window")
+        # rules: [(label, pattern), ...] in priority order
+        self.rules: Tuple[Tuple[str, str], ...] = tuple(rules)
+        # details: per rule {"id", "severity", "explanation"}, if known
+        self.details: Tuple[Dict[str, str], ...] = tuple(
+            details or ({} for _ in self.rules)
+        )
+        if len(self.details) != len(self.rules):
+            raise ValueError("details must have one entry per rule")
+        self.flags = flags
+        self.window = window
+        self.overlap = overlap
+        self.max_chars = max_chars
+        self.budget = budget
+        # Content hash: identical rules, details and flags → identical version
+        self.version = hashlib.sha256(
+            repr(
+                (self.rules, [sorted(d.items()) for d in self.details], int(flags))
+            ).encode("utf-8")
+        ).hexdigest()[:16]
+        self._index = {rule: i for i, rule in reversed(list(enumerate(self.rules)))}
+        # Indexed by `safe`: original patterns, then SAFE_FORMS
+        self._compiled: Tuple[Tuple[Pattern, ...], ...] = tuple(
+            tuple(re.compile(self._form(i, safe), flags) for i in range(len(rules)))
+            for safe in (False, True)
+        )
+        self._all = tuple(range(len(self.rules)))
+        self._combined: Dict[Tuple[bool, Tuple[int, ...]], Pattern] = {}
+        if self.rules:
+            for safe in (False, True):
+                self._combined[safe, self._all] = self._build_combined(self._all, safe)
+        self.prefilter = LiteralPrefilter(
+            [required_literals(pat) for _, pat in self.rules]
+        )
+
+        # Prefilter statistics (approximate under concurrency)
+        self.scanned = 0
+        self.skipped = 0
+        self.rule_hits = [0] * len(self.rules)
+        self.overruns = 0
+
+    @classmethod
+    def from_patterns(
+        cls, xss_patterns: List[str], sqli_patterns: List[str]
+    ) -> "RuleSet":
+        rules = [("XSS", pat) for pat in xss_patterns]
+        rules += [("SQLi", pat) for pat in sqli_patterns]
+        return cls(rules)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def describe(self, rule: Tuple[str, str]) -> Dict[str, Optional[str]]:
+        """
+        Bundle metadata of a matched (label, pattern) rule, as the
+        rule_id / rule_severity / rule_explanation fields of a detection.
+        """
+        i = self._index.get(tuple(rule))
+        info = self.details[i] if i is not None else {}
+        return {
+            "rule_id": info.get("id"),
+            "rule_severity": info.get("severity"),
+            "rule_explanation": info.get("explanation"),
+        }
+
+    def explanation(self, pattern: Optional[str]) -> Optional[str]:
+        """Explanation text of the first rule with this pattern, if any."""
+        for (_, pat), info in zip(self.rules, self.details):
+            if pat == pattern:
+                return info.get("explanation")
+        return None
+
+    def match(self, text: str) -> Optional[Tuple[str, str]]:
+        """
+        Return (label, pattern) of the highest-priority matching rule, or None.
+        """
+        return self.scan(text)[0]
+
+    def scan(self, text: str) -> Tuple[Optional[Tuple[str, str]], bool]:
+        """
+        Bounded match(): returns (rule or None, complete). `complete` is
+        False when part of the text was not inspected, because it is longer
+        than max_chars or the budget ran out; the rule is then the best
+        match in the inspected part.
+        """
+        self.scanned += 1
+        complete = len(text) <= self.max_chars
+        if not complete:
+            text = text[: self.max_chars]
+        candidates = self.prefilter.candidates(text)
+        if candidates is None:
+            candidates = self._all
+        if not candidates:
+            self.skipped += 1
+            if not complete:
+                self.overruns += 1
+            return None, complete
+        for i in candidates:
+            self.rule_hits[i] += 1
+
+        if len(text) <= self.window:
+            hit = self._search(candidates, text)
+            return (None if hit is None else self.rules[hit]), complete
+
+        deadline = time.monotonic() + self.budget
+        best = None
+        start = 0
+        while True:
+            hit = self._search(candidates, text[start : start + self.window])
+            if hit is not None:
+                best = hit
+                # Later windows can only matter for higher-priority rules
+                candidates = tuple(i for i in candidates if i < hit)
+            end = start + self.window
+            if not candidates or end >= len(text):
+                break
+            if time.monotonic() > deadline:
+                complete = False
+                break
+            start = end - self.overlap
+        if not complete:
+            self.overruns += 1
+        return (None if best is None else self.rules[best]), complete
+
+    def _search(self, candidates: Tuple[int, ...], text: str) -> Optional[int]:
+        # Index of the highest-priority candidate matching `text`, or None
+        safe = len(text) > SAFE_FORM_MIN_CHARS
+        m = self._combined_for(candidates, safe).search(text)
+        if m is None:
+            return None
+
+        # The leftmost hit is some rule i; only candidates ranked above i can
+        # still take priority, so re-check just those.
+        hit = int(m.lastgroup[1:])
+        for i in candidates:
+            if i >= hit:
+                break
+            if self._compiled[safe][i].search(text):
+                return i
+        return hit
+
+    def prefilter_stats(self) -> Dict[str, Any]:
+        """
+        Per-rule prefilter hit ratio: the share of scanned payloads for which
+        the rule's literals were present and its regex had to run.
+        """
+        scanned = self.scanned or 1
+        return {
+            "scanned": self.scanned,
+            "skipped": self.skipped,
+            "skip_ratio": self.skipped / scanned,
+            "rules": [
+                {
+                    "label": label,
+                    "pattern": pat,
+                    "hits": hits,
+                    "hit_ratio": hits / scanned,
+                }
+                for (label, pat), hits in zip(self.rules, self.rule_hits)
+            ],
+        }
+
+    def reset_stats(self) -> None:
+        self.scanned = 0
+        self.skipped = 0
+        self.rule_hits = [0] * len(self.rules)
+        self.overruns = 0
+
+    def _combined_for(self, indices: Tuple[int, ...], safe: bool) -> Pattern:
+        combined = self._combined.get((safe, indices))
+        if combined is None:
+            if len(self._combined) >= _MAX_COMBINED_CACHE:
+                self._combined = {
+                    key: self._combined[key]
+                    for key in ((False, self._all), (True, self._all))
+                }
+            combined = self._build_combined(indices, safe)
+            self._combined[safe, indices] = combined
+        return combined
+
+    def _build_combined(self, indices: Tuple[int, ...], safe: bool) -> Pattern:
+        return re.compile(
+            _alternation((i, self._form(i, safe)) for i in indices), self.flags
+        )
+
+    def _form(self, i: int, safe: bool) -> str:
+        # The safe forms rely on `.` stopping at newlines
+        pattern = self.rules[i][1]
+        if not safe or self.flags & re.DOTALL:
+            return pattern
+        return SAFE_FORMS.get(pattern, pattern)
+
+
+def _alternation(patterns: Iterable[Tuple[int, str]]) -> str:
+    # One named group per rule: match.lastgroup is "r<rule index>"
+    return "|".join(f"(?P<r{i}>{_strip_global_flags(pat)})" for i, pat in patterns)
+
+
+def _strip_global_flags(pattern: str) -> str:
+    # Inline global flags are only legal at the very start of an expression;
+    # IGNORECASE is already applied to the combined pattern as a whole.
+    if pattern.startswith(_GLOBAL_IGNORECASE):
+        return pattern[len(_GLOBAL_IGNORECASE) :]
+    return pattern
+
+
+def required_literals(pattern: str) -> List[Clause]:
+    """
+    Extract the literals a pattern cannot match without, as a list of
+    clauses (lower-cased). An empty list means nothing is required.
+    """
+    return _clauses(sre_parse.parse(pattern))
+
+
+def _clauses(seq) -> List[Clause]:
+    clauses: List[Clause] = []
+    run: List[str] = []
+
+    def flush():
+        lit = "".join(run).lower()
+        if lit and lit.isascii():
+            clauses.append(frozenset([lit]))
+        run.clear()
+
+    for op, av in seq:
+        name = str(op)
+        if name == "LITERAL":
+            run.append(chr(av))
+            continue
+        flush()
+        if name == "SUBPATTERN":
+            clauses.extend(_clauses(av[-1]))
+        elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            low, _, sub = av
+            if low >= 1:
+                clauses.extend(_clauses(sub))
+        elif name == "BRANCH":
+            # One alternative must match: OR together the most selective
+            # clause of every branch (a branch without one voids the clause)
+            union = set()
+            for branch in av[1]:
+                sub = _clauses(branch)
+                if not sub:
+                    union = None
+                    break
+                union |= max(sub, key=lambda c: min(len(s) for s in c))
+            if union:
+                clauses.append(frozenset(union))
+    flush()
+    return clauses
+
+
+class RuleBundleError(ValueError):
+    """A rule bundle that cannot be loaded; the file and rule are named."""
+
+
+_RULE_FIELDS = ("id", "label", "severity", "pattern", "explanation")
+_RESERVED_GROUP = re.compile(r"r\d+")
+
+
+def _combining_error(pattern: str, rule: str, groups: Dict[str, str]) -> Optional[str]:
     """
-    Inspect combined request data for XSS or SQLi patterns.
+    Why a (compilable) pattern cannot be merged into RuleSet's alternation,
+    or None. `groups` maps group names used by earlier rules to their rule
+    ids; the names of an accepted pattern are added to it.
+    """
+    tree = sre_parse.parse(pattern)
+    for group in tree.state.groupdict:
+        if _RESERVED_GROUP.fullmatch(group):
+            return f"group name {group!r} is reserved (r<N> names the rules)"
+        if group in groups:
+            return f"group name {group!r} is also used by rule {groups[group]}"
+    try:
+        # An extra group in front shifts every group number by one, as the
+        # groups of earlier rules do in the alternation. A reference by name
+        # follows the shift; one by number keeps pointing at the old number.
+        shifted = sre_parse.parse(f"()(?:{_strip_global_flags(pattern)})")
+        if _group_refs(shifted) != [g + 1 for g in _group_refs(tree)]:
+            return "pattern uses numbered group references; use (?P=name)"
+        sre_parse.parse(_alternation([(0, pattern)]))
+    except re.error as err:
+        # e.g. inline global flags other than a leading (?i)
+        return f"pattern cannot be combined with other rules ({err.msg})"
+    groups.update(dict.fromkeys(tree.state.groupdict, rule))
+    return None
+
+
+def _group_refs(tree) -> List[int]:
+    # Group numbers referenced by backreferences and (?(group)...) conditions
+    refs: List[int] = []
+    for op, av in tree:
+        name = str(op)
+        if name == "GROUPREF":
+            refs.append(av)
+        elif name == "GROUPREF_EXISTS":
+            refs.append(av[0])
+        for sub in _subpatterns(av):
+            refs.extend(_group_refs(sub))
+    return refs
+
+
+def _subpatterns(av):
+    if isinstance(av, sre_parse.SubPattern):
+        yield av
+    elif isinstance(av, (tuple, list)):
+        for item in av:
+            yield from _subpatterns(item)
+
+
+def load_rule_bundle(path: str = RULES_PATH, **options) -> RuleSet:
+    """
+    Compile a rule bundle into a RuleSet (options go to RuleSet). The file
+    is JSON: {"rules": [{"id", "label", "severity", "pattern",
+    "explanation"}, ...]}, in priority order. Every rule is validated (all
+    fields present, unique ids, severity in SEVERITIES, pattern compiles on
+    its own and inside the combined alternation) before anything is built,
+    so a broken file never yields a partial set.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            bundle = json.load(f)
+        entries = bundle["rules"]
+    except (OSError, ValueError, KeyError, TypeError) as err:
+        raise RuleBundleError(f"{path}: unreadable rule bundle ({err})") from err
+
+    seen = set()
+    groups: Dict[str, str] = {}
+    for n, entry in enumerate(entries):
+        name = entry.get("id", f"#{n}") if isinstance(entry, dict) else f"#{n}"
+        if not isinstance(entry, dict) or not all(
+            isinstance(entry.get(k), str) for k in _RULE_FIELDS
+        ):
+            raise RuleBundleError(
+                f"{path}: rule {name} needs string fields {', '.join(_RULE_FIELDS)}"
+            )
+        if name in seen:
+            raise RuleBundleError(f"{path}: duplicate rule id {name}")
+        seen.add(name)
+        if entry["severity"] not in SEVERITIES:
+            raise RuleBundleError(
+                f"{path}: rule {name} severity must be one of {SEVERITIES}"
+            )
+        try:
+            re.compile(entry["pattern"])
+        except re.error as err:
+            raise RuleBundleError(f"{path}: rule {name} pattern: {err}") from err
+        problem = _combining_error(entry["pattern"], name, groups)
+        if problem:
+            raise RuleBundleError(f"{path}: rule {name} {problem}")
+        if (
+            name in SAFE_FORM_RULES
+            and entry["pattern"] != SAFE_FORM_RULES[name]
+            and entry["pattern"] not in SAFE_FORMS
+        ):
+            logger.warning(
+                "%s: rule %s no longer has the pattern its linear-time form in "
+                "SAFE_FORMS was written for; it is matched with its own pattern",
+                path,
+                name,
+            )
+
+    patterns = [e["pattern"] for e in entries]
+    try:
+        re.compile(_alternation(enumerate(patterns)))
+    except re.error as err:  # pragma: no cover - the checks above should catch it
+        raise RuleBundleError(f"{path}: rules cannot be combined ({err})") from err
+
+    return RuleSet(
+        [(e["label"], e["pattern"]) for e in entries],
+        details=[
+            {"id": e["id"], "severity": e["severity"], "explanation": e["explanation"]}
+            for e in entries
+        ],
+        **options,
+    )
+
+
+# The bundled rules, compiled once at import. Running services get theirs from
+# rule_registry, which hot-reloads the file.
+RULESET = load_rule_bundle(RULES_PATH)
+XSS_PATTERNS = [pat for label, pat in RULESET.rules if label == "XSS"]
+SQLI_PATTERNS = [pat for label, pat in RULESET.rules if label == "SQLi"]
+
+
+def detect_attack(
+    user_input: Dict[str, Any], rules: Optional[RuleSet] = None
+) -> Dict[str, Any]:
+    """
+    Inspect combined request data with `rules` (default: RULESET).
     Returns:
       - is_malicious: bool
-      - label:        "XSS", "SQLi", or "benign"
+      - label:        "XSS", "SQLi", "benign", or OVERRUN_LABEL when the
+                      payload could not be fully inspected and
+                      OVERRUN_POLICY is "block"
       - pattern:      the regex that matched (or None)
+    and, on a rule match, rule_id / rule_severity / rule_explanation from
+    the rule bundle. When part of the payload was not inspected (see
+    RuleSet.scan) the result also has scan_complete=False: it depends on
+    timing and must not be reused for the same payload.
     """
+    rules = RULESET if rules is None else rules
     combined = " ".join(str(v) for v in user_input.values())
 
-    # 1) XSS checks
-    for pat in XSS_PATTERNS:
-        if re.search(pat, combined, re.IGNORECASE):
-            return {"is_malicious": True, "label": "XSS", "pattern": pat}
-
-    # 2) SQLi checks
-    for pat in SQLI_PATTERNS:
-        if re.search(pat, combined, re.IGNORECASE):
-            return {"is_malicious": True, "label": "SQLi", "pattern": pat}
-
-    # 3) No match → benign
-    return {"is_malicious": False, "label": "benign", "pattern": None}
+    hit, complete = rules.scan(combined)
+    if hit is not None:
+        label, pat = hit
+        result = {
+            "is_malicious": True,
+            "label": label,
+            "pattern": pat,
+            **rules.describe(hit),
+        }
+    elif not complete and OVERRUN_POLICY == "block":
+        result = {"is_malicious": True, "label": OVERRUN_LABEL, "pattern": None}
+    else:
+        # No match → benign
+        result = {"is_malicious": False, "label": "benign", "pattern": None}
+    if not complete:
+        result["scan_complete"] = False
+    return result
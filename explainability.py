@@ -5,62 +5,94 @@ explainability.py
 Provides:
   1. Rule-based regex explanations.
   2. Plain-English, token-level SHAP explanations via PartitionExplainer.
+  3. A bounded worker pool that builds explanations off the response path.
 """
 
-import joblib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
+
 import numpy as np
-import shap
-from typing import Dict, Any, List
+
+from alert_logger import log_explanation
+from detection_engine import OVERRUN_LABEL
+from ml_inference import predict_one
+from model_registry import ModelHandle, get_model
+from rule_registry import get_rules
+
+# ─── Deferred explanation configuration ───────────────────────────────────────
+EXPLAIN_QUEUE_SIZE = 64  # queued + running jobs; beyond this jobs are dropped
+EXPLAIN_WORKERS = 1  # explanation worker threads
+EXPLAIN_TIME_BUDGET = 10.0  # seconds a single job may spend computing
+
+
+class ExplanationTimeout(Exception):
+    """Raised inside a job once its time budget is spent."""
+
 
 # ─── 1) Rule-based explanations ────────────────────────────────────────────────
-REGEX_EXPLANATIONS: Dict[str, Dict[str, str]] = {
-    "XSS": {
-        r"<script.*?>.*?</script>": "Detected <script>…</script>, a common XSS vector.",
-        r"<.*?on\w+\s*=.*?>": "Detected inline event handler (on*), often used in XSS.",
-        r"<img.*?src=.*?onerror=.*?>": "Detected <img> with onerror, a known XSS technique.",
-        r"javascript:": "Detected 'javascript:' URI, frequently used in XSS.",
-    },
-    "SQLi": {
-        r"(\%27)|(\')|(\-\-)|(\%23)|(#)": "Detected SQL comment or quote characters.",
-        r"(?i)\b(or)\b.*=.*": "Detected tautology injection (e.g. OR 1=1).",
-        r"(?i)\bunion\b\s+\bselect\b": "Detected UNION SELECT, used for data exfiltration.",
-        r"(?i)\bselect\b.*\bfrom\b": "Detected SELECT…FROM pattern, possible SQLi.",
-        r"(?i)\binsert\b\s+\binto\b": "Detected INSERT INTO, possible SQL manipulation.",
-        r"(?i)\bdrop\b\s+\btable\b": "Detected DROP TABLE, destructive SQL command.",
-    },
-}
+# The text comes from the rule bundle (rules/waf_rules.json), next to the
+# pattern it explains.
+DEFAULT_RULE_EXPLANATION = "Suspicious pattern detected."
 
 
 def explain_regex(label: str, pattern: str) -> str:
-    return REGEX_EXPLANATIONS.get(label, {}).get(
-        pattern, "Suspicious pattern detected."
-    )
+    """Explanation of a rule match, from the active rule bundle."""
+    if label == OVERRUN_LABEL:
+        return "Payload could not be fully inspected within the scan limits."
+    return get_rules().explanation(pattern) or DEFAULT_RULE_EXPLANATION
+
 
+# ─── 2) SHAP Explainer, built lazily per model version ────────────────────────
+# Per-thread deadline checked before every model call SHAP makes
+_budget = threading.local()
 
-# ─── 2) Load pipeline & build SHAP Explainer ──────────────────────────────────
-MODEL_PATH = "models/attack_classifier_pipeline.pkl"
-pipeline = joblib.load(MODEL_PATH)
 
+def _build_explainer(handle: ModelHandle):
+    import shap  # heavy import, deferred until the first ML explanation
 
-def predict_proba(texts: List[str]) -> np.ndarray:
-    return pipeline.predict_proba(texts)
+    pipeline = handle.pipeline
 
+    def predict_proba(texts: List[str]) -> np.ndarray:
+        deadline = getattr(_budget, "deadline", None)
+        if deadline is not None and time.monotonic() > deadline:
+            raise ExplanationTimeout()
+        return pipeline.predict_proba(texts)
 
-# Empty-string background for text masker
-masker = shap.maskers.Text()
-explainer = shap.Explainer(predict_proba, masker, output_names=list(pipeline.classes_))
+    # Empty-string background for text masker
+    masker = shap.maskers.Text()
+    return shap.Explainer(predict_proba, masker, output_names=list(handle.classes))
 
 
-def explain_ml(payload: str, top_n: int = 5) -> str:
+def explain_ml(
+    payload: str,
+    top_n: int = 5,
+    prediction: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None,
+) -> str:
     """
     Return a plain-English summary of the top_n SHAP tokens
     driving the model’s prediction for this payload.
+
+    `prediction` is the ml_inference result already computed for the
+    payload; it is reused when it came from the active model version,
+    otherwise the model is run once here. `deadline` is a time.monotonic()
+    value after which ExplanationTimeout is raised.
     """
-    shap_vals = explainer([payload])[0]
-    probs = pipeline.predict_proba([payload])[0]
-    idx = int(np.argmax(probs))
-    label = pipeline.classes_[idx]
-    confidence = probs[idx]
+    handle = get_model()
+    if prediction is None or prediction.get("model_version") != handle.version:
+        prediction = predict_one(handle.pipeline, payload)
+    explainer = handle.attachment("shap_explainer", _build_explainer)
+
+    _budget.deadline = deadline
+    try:
+        shap_vals = explainer([payload])[0]
+    finally:
+        _budget.deadline = None
+    label = prediction["label"]
+    idx = [str(c) for c in handle.classes].index(label)
+    confidence = prediction["probabilities"][label]
 
     tokens = shap_vals.data
     values = shap_vals.values[:, idx]
@@ -75,7 +107,10 @@ def explain_ml(payload: str, top_n: int = 5) -> str:
 
 
 def explain_detection(
-    detection_result: Dict[str, Any], payload: str, top_n: int = 5
+    detection_result: Dict[str, Any],
+    payload: str,
+    top_n: int = 5,
+    deadline: Optional[float] = None,
 ) -> str:
     """
     Unified API for regex and ML explanations.
@@ -85,12 +120,102 @@ def explain_detection(
     pattern = detection_result.get("pattern", "")
 
     if src == "regex":
-        return explain_regex(label, pattern)
+        # Carried by the detection itself: the rule set that matched it
+        return detection_result.get("rule_explanation") or explain_regex(label, pattern)
     if src == "ml":
-        return explain_ml(payload, top_n)
+        prediction = detection_result if "probabilities" in detection_result else None
+        return explain_ml(payload, top_n, prediction, deadline)
     return "No explanation available."
 
 
+class ExplanationWorker:
+    """
+    Builds explanations on a worker pool, off the request path.
+
+    Each job explains one blocked request and hands the outcome to `sink`
+    (default: alert_logger.log_explanation), keyed by the alert's
+    request_id. At most `max_queue` jobs are queued or running; further
+    jobs are dropped and reported with status "dropped". A job that runs
+    longer than `time_budget` seconds is aborted at the next model call
+    SHAP makes and reported with status "timeout".
+    """
+
+    def __init__(
+        self,
+        max_queue: int = EXPLAIN_QUEUE_SIZE,
+        workers: int = EXPLAIN_WORKERS,
+        time_budget: float = EXPLAIN_TIME_BUDGET,
+        sink: Callable[[str, Optional[str], str], None] = log_explanation,
+    ):
+        self.time_budget = time_budget
+        self.sink = sink
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="waf-explain"
+        )
+
+        self.submitted = 0
+        self.completed = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(
+        self,
+        request_id: str,
+        payload: str,
+        detection_result: Dict[str, Any],
+        on_done: Optional[Callable[[str], None]] = None,
+    ) -> bool:
+        """
+        Queue one explanation job; returns False if the queue is full.
+        `on_done` receives the explanation text when the job succeeds.
+        """
+        if not self._slots.acquire(blocking=False):
+            self.dropped += 1
+            self.sink(request_id, None, "dropped")
+            return False
+        self.submitted += 1
+        self._executor.submit(self._run, request_id, payload, detection_result, on_done)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "timed_out": self.timed_out,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+    def close(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, request_id, payload, detection_result, on_done) -> None:
+        explanation = None
+        try:
+            # The budget starts when the job starts, not when it was queued
+            deadline = time.monotonic() + self.time_budget
+            explanation = explain_detection(
+                detection_result, payload, deadline=deadline
+            )
+            status = "ok"
+            self.completed += 1
+        except ExplanationTimeout:
+            status = "timeout"
+            self.timed_out += 1
+        except Exception as err:
+            print("❌ Explanation job failed:", err)
+            status = "error"
+            self.failed += 1
+        finally:
+            self._slots.release()
+
+        self.sink(request_id, explanation, status)
+        if explanation is not None and on_done is not None:
+            on_done(explanation)
+
+
 # ─── 3) Standalone test harness ───────────────────────────────────────────────
 if __name__ == "__main__":
     examples = {
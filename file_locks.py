@@ -0,0 +1,21 @@
+# file_locks.py
+
+import fcntl
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def flock(path: str, operation: int):
+    """flock() a lock file; yields False if LOCK_NB was given and it is held."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, operation)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        os.close(fd)  # releases the lock
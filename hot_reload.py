@@ -0,0 +1,110 @@
+# hot_reload.py
+
+import abc
+import logging
+import os
+import threading
+import time
+from typing import Generic, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+Stamp = Optional[Tuple[int, int]]  # (mtime_ns, size) of the watched file
+T = TypeVar("T")
+
+
+class HotReloadRegistry(abc.ABC, Generic[T]):
+    """
+    Process-wide owner of one object built from a file, swapped in whole
+    when the file changes.
+
+    The object is loaded on first use (or `initial` is served if given).
+    Afterwards the file is checked at most every `check_interval` seconds
+    (never if negative); when it changed, the new version is loaded on a
+    background thread and swapped in with a single reference assignment
+    once it is fully built. Callers keep being served the previous object
+    until then, and a failed load keeps it.
+
+    Subclasses implement `_path()` (the file to watch) and `_load()`, and
+    set `kind` for thread names and log messages.
+    """
+
+    kind = "object"
+
+    def __init__(
+        self, check_interval: float, initial: Optional[T] = None, stamp: Stamp = None
+    ):
+        self.check_interval = check_interval
+        self._current: Optional[T] = initial
+        self._stamp: Stamp = stamp
+        self._next_check = time.monotonic() + check_interval if initial else 0.0
+        self._load_lock = threading.Lock()
+        self._reloading = False
+        self.reloads = 0
+        self.failed_reloads = 0
+
+    def current(self) -> T:
+        """
+        The active object, loading it synchronously the first time.
+        """
+        current = self._current
+        if current is None:
+            with self._load_lock:
+                if self._current is None:
+                    self._swap(*self._load())
+                return self._current
+
+        if self.check_interval >= 0 and time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.check_interval
+            if self._stat() != self._stamp and not self._reloading:
+                self._reloading = True
+                threading.Thread(
+                    target=self._background_reload,
+                    name=f"{self.kind}-reload",
+                    daemon=True,
+                ).start()
+        return current
+
+    def reload(self) -> T:
+        """
+        Load the file now and swap it in; the current object stays active if
+        loading fails (the error is re-raised).
+        """
+        with self._load_lock:
+            self._swap(*self._load())
+            self.reloads += 1
+            return self._current
+
+    # ── for subclasses ────────────────────────────────────────────────────
+    @abc.abstractmethod
+    def _path(self) -> str:
+        """The file to watch."""
+
+    @abc.abstractmethod
+    def _load(self) -> Tuple[T, Stamp]:
+        """Build the object; returns it with the stamp of the file it read."""
+
+    # ── internals ─────────────────────────────────────────────────────────
+    def _stat(self) -> Stamp:
+        try:
+            st = os.stat(self._path())
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _swap(self, value: T, stamp: Stamp) -> None:
+        self._stamp = stamp
+        self._current = value  # atomic reference swap
+
+    def _background_reload(self) -> None:
+        try:
+            self.reload()
+        except Exception:
+            self.failed_reloads += 1
+            # Remember the broken file so it is not retried until it changes
+            self._stamp = self._stat()
+            logger.exception(
+                "%s reload failed; keeping the current one", self.kind.capitalize()
+            )
+        finally:
+            self._reloading = False
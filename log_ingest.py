@@ -0,0 +1,376 @@
+# log_ingest.py
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from alert_logger import (
+    EXPLANATION_LOG_FILE,
+    EXPLANATION_PENDING,
+    LOG_FILE,
+    explanation_text,
+)
+from payload_extraction import json_loads
+
+READ_BLOCK_BYTES = 32 * 1024 * 1024  # log bytes parsed per step
+MEMO_SIZE = 32  # memoized filter / summary results per log generation
+CONFIDENCE_BINS = 20
+
+# Columns kept from each alert
+COLUMNS = (
+    "timestamp",
+    "request_id",
+    "client_ip",
+    "method",
+    "path",
+    "attack_type",
+    "source",
+    "severity",
+    "confidence",
+    "pattern",
+    "explanation",
+)
+# Filter columns and the value shown for a missing field
+FILTER_COLUMNS = {"attack_type": "benign", "source": "unknown", "severity": "unknown"}
+# Stored as categoricals: few distinct values, and cheap to append to
+CATEGORICAL = tuple(FILTER_COLUMNS) + (
+    "method",
+    "path",
+    "pattern",
+    "explanation",
+)
+
+
+class AlertFrame:
+    """
+    A typed DataFrame of alerts with memoized dashboard queries.
+
+    Repetitive string columns are categoricals. The filter columns have
+    their missing values filled the way the dashboard shows them.
+    filtered() and summary() results are memoized per (generation,
+    filters); generation changes whenever the frame does. Safe to share
+    between Streamlit sessions.
+    """
+
+    def __init__(
+        self, frame: Optional[pd.DataFrame] = None, memo_size: int = MEMO_SIZE
+    ):
+        self.memo_size = memo_size
+        self.frame = _empty_frame() if frame is None else _typed(frame)
+        self.generation = 0
+        self._memo: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def filtered(
+        self,
+        attack_types: Iterable[str],
+        sources: Iterable[str],
+        severities: Iterable[str],
+        confidence: Tuple[float, float] = (0.0, 1.0),
+    ) -> pd.DataFrame:
+        """Rows matching the dashboard filters (memoized)."""
+        key = _filter_key(attack_types, sources, severities, confidence)
+        return self._memoized(("filtered",) + key, lambda: self._filter(*key))
+
+    def summary(self, *filters) -> Dict[str, Any]:
+        """
+        Aggregates of filtered(*filters) for the dashboard charts (memoized):
+        total, by_attack_type, by_source, severity_by_type, per_day and
+        confidence_hist.
+        """
+        key = _filter_key(*filters)
+        return self._memoized(
+            ("summary",) + key, lambda: _summarize(self._filter(*key))
+        )
+
+    def options(self, column: str):
+        """Sorted distinct values of a filter column."""
+        with self._lock:
+            values = self.frame[column]
+            return sorted(values.cat.categories[np.unique(values.cat.codes)])
+
+    # ── internals ─────────────────────────────────────────────────────────
+    def _changed(self) -> None:
+        self.generation += 1
+        self._memo.clear()
+
+    def _memoized(self, key: tuple, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            key = (self.generation,) + key
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+            value = self._memo[key] = compute()
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+            return value
+
+    def _filter(self, attack_types, sources, severities, confidence):
+        df = self.frame
+        mask = (
+            df["attack_type"].isin(attack_types)
+            & df["source"].isin(sources)
+            & df["severity"].isin(severities)
+            & df["confidence"].between(*confidence)
+        )
+        return df[mask.to_numpy()]
+
+
+class _LogTail:
+    """
+    Whole lines appended to a file since the last read().
+
+    A partly written last line waits for the next read. If the file is
+    replaced (rotation), shrinks (truncation) or disappears, the next read
+    starts over from the beginning of the current file.
+    """
+
+    def __init__(self, path: str, read_bytes: int = READ_BLOCK_BYTES):
+        self.path = path
+        self.read_bytes = read_bytes
+        self.offset = 0  # bytes of the current file already read
+        self._identity: Optional[Tuple[int, int]] = None  # (st_dev, st_ino)
+
+    def read(self) -> Tuple[bool, List[bytes]]:
+        """
+        (restarted, blocks): restarted is True if the file is not the one
+        (or no longer as long as) the last call read; blocks end on a line
+        boundary.
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            restarted = self._identity is not None
+            self.rewind(None)
+            return restarted, []
+        identity = (st.st_dev, st.st_ino)
+        restarted = identity != self._identity or st.st_size < self.offset
+        if restarted:
+            self.rewind(identity)
+        if st.st_size == self.offset:
+            return restarted, []
+
+        blocks = []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            while True:
+                block = f.read(self.read_bytes)
+                end = block.rfind(b"\n") + 1
+                if end == 0:
+                    break  # no complete line left
+                blocks.append(block[:end])
+                self.offset += end
+                f.seek(self.offset)
+        return restarted, blocks
+
+    def rewind(self, identity: Optional[Tuple[int, int]] = None) -> None:
+        """Read the file from the start again on the next call."""
+        self._identity = identity
+        self.offset = 0
+
+
+class AlertLog(AlertFrame):
+    """
+    The alert log file as an AlertFrame, kept up to date incrementally.
+
+    refresh() parses only the bytes appended since the last call (whole
+    lines only; a partly written last line waits for the next refresh) and
+    appends them to the frame. If the file is replaced
+    (rotation) or shrinks (truncation), it is reloaded from the start, so
+    the frame always mirrors the current file. Unparsable lines are skipped
+    and counted.
+
+    ML alerts are logged with EXPLANATION_PENDING; their explanation is
+    written later to `explanations_path`, under the alert's request_id.
+    That file is tailed too, and each explanation replaces the pending text
+    of its alert, whichever of the two lines is read first.
+    """
+
+    def __init__(
+        self,
+        path: str = LOG_FILE,
+        read_bytes: int = READ_BLOCK_BYTES,
+        memo_size: int = MEMO_SIZE,
+        explanations_path: Optional[str] = EXPLANATION_LOG_FILE,
+    ):
+        super().__init__(memo_size=memo_size)
+        self.path = path
+        self.bad_lines = 0
+        self._tail = _LogTail(path, read_bytes)
+        self._explanations = (
+            _LogTail(explanations_path, read_bytes) if explanations_path else None
+        )
+        self._awaiting: Dict[str, int] = {}  # request_id → row still pending
+        self._unmatched: Dict[str, str] = {}  # request_id → text, row not read yet
+
+    @property
+    def offset(self) -> int:
+        """Bytes of the current alert log already ingested."""
+        return self._tail.offset
+
+    def refresh(self) -> int:
+        """
+        Ingest what was appended since the last call; returns the number of
+        new rows (0 if the file is unchanged or missing).
+        """
+        with self._lock:
+            restarted, blocks = self._tail.read()
+            if restarted:
+                self._reset()
+            chunks = [self._parse(block) for block in blocks]
+
+            new = sum(len(c) for c in chunks)
+            start = len(self.frame)
+            if new:
+                self.frame = _concat([self.frame] + chunks)
+            if self._join_explanations(start) or new:
+                self._changed()
+            return new
+
+    # ── internals ─────────────────────────────────────────────────────────
+    def _parse(self, data: bytes) -> pd.DataFrame:
+        records, bad = _json_records(data)
+        self.bad_lines += bad
+        return _typed(pd.DataFrame.from_records(records, columns=list(COLUMNS)))
+
+    def _join_explanations(self, start: int) -> bool:
+        """
+        Fill in the explanations of rows from `start` on and of rows still
+        waiting for one; returns True if any row changed.
+        """
+        if self._explanations is None:
+            return False
+        found: Dict[int, str] = {}
+        rows = self.frame.iloc[start:]
+        waiting = rows[(rows["explanation"] == EXPLANATION_PENDING).to_numpy()]
+        for position, request_id in zip(waiting.index, waiting["request_id"]):
+            if not isinstance(request_id, str):
+                continue
+            text = self._unmatched.pop(request_id, None)
+            if text is None:
+                self._awaiting[request_id] = position
+            else:
+                found[position] = text
+
+        _, blocks = self._explanations.read()
+        for block in blocks:
+            for record in _json_records(block)[0]:
+                request_id = record.get("request_id")
+                position = self._awaiting.pop(request_id, None)
+                if position is None:
+                    self._unmatched[request_id] = explanation_text(record)
+                else:
+                    found[position] = explanation_text(record)
+        if not found:
+            return False
+
+        column = self.frame["explanation"]
+        texts = pd.Index(found.values())
+        column = column.cat.add_categories(
+            texts.unique().difference(column.cat.categories)
+        )
+        column.iloc[list(found)] = texts
+        self.frame = self.frame.assign(explanation=column)
+        return True
+
+    def _reset(self) -> None:
+        self.frame = _empty_frame()
+        self._changed()
+        # The reloaded rows need their explanations again
+        self._awaiting.clear()
+        self._unmatched.clear()
+        if self._explanations is not None:
+            self._explanations.rewind()
+
+
+def _json_records(data: bytes) -> Tuple[List[Dict[str, Any]], int]:
+    """The JSON objects in `data`, one per line, and the count of bad lines."""
+    records, bad = [], 0
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json_loads(line)
+        except ValueError:
+            record = None
+        if isinstance(record, dict):
+            records.append(record)
+        else:
+            bad += 1
+    return records, bad
+
+
+def _filter_key(attack_types, sources, severities, confidence=(0.0, 1.0)):
+    return (
+        tuple(sorted(attack_types)),
+        tuple(sorted(sources)),
+        tuple(sorted(severities)),
+        (float(confidence[0]), float(confidence[1])),
+    )
+
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.reindex(columns=list(COLUMNS))
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce", format="ISO8601")
+    df["confidence"] = pd.to_numeric(df["confidence"], errors="coerce")
+    for column, missing in FILTER_COLUMNS.items():
+        df[column] = df[column].astype(object).fillna(missing).astype(str)
+    for column in CATEGORICAL:
+        df[column] = df[column].astype("category")
+    return df
+
+
+def _empty_frame() -> pd.DataFrame:
+    return _typed(pd.DataFrame(columns=list(COLUMNS)))
+
+
+def _concat(frames) -> pd.DataFrame:
+    # Categoricals only stay categorical if every part has the same
+    # categories: new ones are appended, so existing codes stay valid
+    frames = [f for f in frames if len(f)] or frames[:1]
+    for column in CATEGORICAL:
+        first = frames[0][column]
+        categories = first.cat.categories
+        for f in frames[1:]:
+            extra = f[column].cat.categories.difference(categories)
+            if len(extra):
+                categories = categories.append(extra)
+        if len(categories) > len(first.cat.categories):
+            frames[0][column] = first.cat.add_categories(
+                categories[len(first.cat.categories) :]
+            )
+        for f in frames[1:]:
+            f[column] = f[column].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _summarize(df: pd.DataFrame) -> Dict[str, Any]:
+    def counts(column):
+        c = df[column].value_counts(sort=False)
+        return c[c > 0].rename_axis(column).reset_index(name="count")
+
+    severity_by_type = (
+        df.groupby(["severity", "attack_type"], observed=True)
+        .size()
+        .reset_index(name="count")
+    )
+    per_day = (
+        df["timestamp"].dt.normalize().value_counts().sort_index().rename_axis("date")
+    ).reset_index(name="count")
+    hist, edges = np.histogram(
+        df["confidence"].dropna(), bins=CONFIDENCE_BINS, range=(0.0, 1.0)
+    )
+    return {
+        "total": len(df),
+        "by_attack_type": counts("attack_type"),
+        "by_source": counts("source"),
+        "severity_by_type": severity_by_type,
+        "per_day": per_day,
+        "confidence_hist": pd.DataFrame(
+            {"confidence": (edges[:-1] + edges[1:]) / 2, "count": hist}
+        ),
+    }
@@ -0,0 +1,170 @@
+# metrics.py
+
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+# Content type of render() (Prometheus text exposition format)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Default latency buckets in seconds (Prometheus-style upper bounds)
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.002,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with cumulative counts on snapshot.
+
+    Meant to be updated from a single thread (the event loop); reads from
+    other threads may be slightly stale but never raise.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Sequence[float],
+        labels: Optional[Dict[str, str]] = None,
+    ):
+        self.name = name
+        self.help = help_text
+        self.labels = dict(labels or {})
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative, running = {}, 0
+        for bound, n in zip(self.buckets + (float("inf"),), self._counts):
+            running += n
+            cumulative[bound] = running
+        return {"count": self.count, "sum": self.sum, "buckets": cumulative}
+
+    def samples(self) -> List[str]:
+        snapshot = self.snapshot()
+        lines = [
+            f"{self.name}_bucket{_labels(self.labels, le=_number(bound))} {n}"
+            for bound, n in snapshot["buckets"].items()
+        ]
+        lines.append(f"{self.name}_sum{_labels(self.labels)} {_number(self.sum)}")
+        lines.append(f"{self.name}_count{_labels(self.labels)} {self.count}")
+        return lines
+
+
+class Counter:
+    """
+    Monotonic counts, one per combination of label values
+    (inc("regex", "XSS") for labelnames ("source", "label")). Same
+    threading notes as Histogram.
+    """
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        return dict(self._values)
+
+    def samples(self) -> List[str]:
+        if not self.labelnames:
+            return [f"{self.name} {_number(self.value())}"]
+        return [
+            f"{self.name}{_labels(dict(zip(self.labelnames, values)))} {_number(n)}"
+            for values, n in list(self._values.items())
+        ]
+
+
+Metric = Union[Histogram, Counter]
+
+
+class Registry:
+    """
+    Process-wide collection of named metrics.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> Histogram:
+        # Same name (and labels) → same instance, so several owners can
+        # share a metric
+        key = name + _labels(labels or {})
+        if key not in self._metrics:
+            self._metrics[key] = Histogram(name, help_text, buckets, labels)
+        return self._metrics[key]
+
+    def counter(
+        self, name: str, help_text: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        if name not in self._metrics:
+            self._metrics[name] = Counter(name, help_text, labelnames)
+        return self._metrics[name]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {key: m.snapshot() for key, m in self._metrics.items()}
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        families: Dict[str, List[Metric]] = {}
+        for metric in list(self._metrics.values()):
+            families.setdefault(metric.name, []).append(metric)
+        lines = []
+        for name, metrics in families.items():
+            kind = "histogram" if isinstance(metrics[0], Histogram) else "counter"
+            lines.append(f"# HELP {name} {_escape(metrics[0].help, False)}")
+            lines.append(f"# TYPE {name} {kind}")
+            for metric in metrics:
+                lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Dict[str, str], **extra: str) -> str:
+    pairs = list(labels.items()) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + "}"
+
+
+def _escape(text: str, quotes: bool = True) -> str:
+    text = text.replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quotes else text
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
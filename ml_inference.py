@@ -0,0 +1,162 @@
+# ml_inference.py
+
+import asyncio
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from metrics import REGISTRY
+
+# Histogram buckets for the number of payloads scored per batch
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def predict_batch(
+    pipeline,
+    payloads: Sequence[str],
+    cascade_band: Optional[Tuple[float, float]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run feature extraction and the classifier once for a batch of payloads.
+    Returns one dict per payload:
+      - label:         predicted class (argmax of the probabilities)
+      - confidence:    probability of that class, rounded to 3 places
+      - probabilities: {class: probability} for every class
+      - stage:         "linear" or "forest" (cascade models only)
+    `cascade_band` overrides a cascade model's calibrated (low, high) band.
+    """
+    stages = None
+    if hasattr(pipeline, "predict_proba_routed"):
+        probs, routed = pipeline.predict_proba_routed(list(payloads), cascade_band)
+        stages = ["forest" if r else "linear" for r in routed]
+    else:
+        probs = pipeline.predict_proba(list(payloads))
+    classes = [str(c) for c in pipeline.classes_]
+
+    results = []
+    for i, row in enumerate(probs):
+        idx = int(np.argmax(row))
+        result = {
+            "label": classes[idx],
+            "confidence": float(round(row[idx], 3)),
+            "probabilities": dict(zip(classes, map(float, row))),
+        }
+        if stages is not None:
+            result["stage"] = stages[i]
+        results.append(result)
+    return results
+
+
+def predict_one(pipeline, payload: str, **kwargs) -> Dict[str, Any]:
+    """
+    Single-payload convenience wrapper around predict_batch.
+    """
+    return predict_batch(pipeline, [payload], **kwargs)[0]
+
+
+class BatchScheduler:
+    """
+    Micro-batching front end for ML inference.
+
+    Payloads submitted by concurrent requests are collected for up to
+    `window_ms` or until `max_batch` are pending, then scored together by
+    `predict_fn` (a callable taking a list of payloads and returning one
+    result per payload) on a worker pool, off the event loop. Each caller
+    awaits only its own result.
+
+    Exposes two histograms through metrics.REGISTRY:
+      - waf_ml_batch_size:         payloads per executed batch
+      - waf_ml_queue_wait_seconds: submit → batch start on the pool
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[List[str]], List[Dict[str, Any]]],
+        window_ms: float = 2.0,
+        max_batch: int = 32,
+        pool_size: int = 1,
+        executor: Optional[Executor] = None,
+    ):
+        if max_batch < 1:
+            raise ValueError("max_batch must be >= 1")
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        # Any executor works; a ProcessPoolExecutor needs a picklable predict_fn
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="waf-ml"
+        )
+        self._pending: List[tuple] = []  # (payload, future, enqueued_at)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.batch_sizes = REGISTRY.histogram(
+            "waf_ml_batch_size", "Payloads per ML inference batch", BATCH_SIZE_BUCKETS
+        )
+        self.queue_wait = REGISTRY.histogram(
+            "waf_ml_queue_wait_seconds", "Time from submit to ML batch start"
+        )
+
+    async def submit(self, payload: str) -> Dict[str, Any]:
+        """
+        Queue one payload and wait for its prediction.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Futures and timers belong to one loop; start fresh on a new one
+            self._loop, self._pending, self._timer = loop, [], None
+
+        fut = loop.create_future()
+        self._pending.append((payload, fut, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        payloads = [payload for payload, _, _ in batch]
+        job = self._loop.run_in_executor(self._executor, self._run, payloads)
+        job.add_done_callback(partial(self._resolve, batch))
+
+    def _run(self, payloads: List[str]):
+        started = time.perf_counter()
+        return started, self.predict_fn(payloads)
+
+    def _resolve(self, batch: List[tuple], job: asyncio.Future) -> None:
+        if job.cancelled():
+            for _, fut, _ in batch:
+                fut.cancel()
+            return
+        err = job.exception()
+        if err is not None:
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(err)
+            return
+
+        started, results = job.result()
+        self.batch_sizes.observe(len(batch))
+        for (_, fut, enqueued), result in zip(batch, results):
+            self.queue_wait.observe(started - enqueued)
+            if not fut.done():  # the request may have been cancelled
+                fut.set_result(result)
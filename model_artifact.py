@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+model_artifact.py
+
+Fast-loading, memory-mappable export of the attack classifier pipeline.
+
+The joblib pickle rebuilds every tree, vocabulary dict and IDF vector as
+private heap objects in each worker. This format stores them as flat NumPy
+arrays plus a small JSON manifest, so workers open them with
+`np.load(mmap_mode="r")` and the OS shares the pages between processes:
+
+  manifest.json            format version, vectorizer parameters, classes,
+                           array index (file, dtype, shape, sha256), checksum
+  <name>.<sha8>.npy        one file per array, named by content hash
+
+Hashed n-gram features (HashingTfidfVectorizer) only need their IDF array.
+Vocabularies are sorted fixed-width unicode arrays, bucketed by term length
+and searched with np.searchsorted. The forest is concatenated into global
+node arrays and traversed for all trees at once. Predictions are identical
+to the joblib pipeline's. A CascadePipeline is exported with its linear
+stage (coefficients + calibrated band) and loaded back as one.
+"""
+
+import hashlib
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import normalize
+
+from cascade import CascadePipeline
+from scripts.feature_utils import HashingTfidfVectorizer, SideChannelFeatures
+
+FORMAT = "waf-xai-mmap"
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+
+# Term-length buckets for vocabulary arrays ('<U{width}' each)
+_WIDTHS = (4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+# Vectorizer parameters the manifest can express
+_VECTORIZER_PARAMS = ("analyzer", "ngram_range", "lowercase", "token_pattern")
+_REQUIRED_DEFAULTS = {
+    "binary": False,
+    "sublinear_tf": False,
+    "norm": "l2",
+    "use_idf": True,
+    "strip_accents": None,
+    "preprocessor": None,
+    "tokenizer": None,
+    "stop_words": None,
+    "dtype": np.float64,
+}
+
+
+class ArtifactError(Exception):
+    """Raised for unsupported pipelines and corrupt or mismatched artifacts."""
+
+
+# ─── Export ───────────────────────────────────────────────────────────────────
+def export_pipeline(pipeline, out_dir: str) -> Dict[str, Any]:
+    """
+    Write `pipeline` (features FeatureUnion + RandomForest, optionally
+    wrapped in a CascadePipeline) to `out_dir`.
+    The manifest is replaced last and atomically; array files it no longer
+    references are removed afterwards.
+    """
+    cascade = pipeline if isinstance(pipeline, CascadePipeline) else None
+    if cascade is not None:
+        pipeline = cascade.pipeline
+    features = pipeline.named_steps["features"]
+    forest = pipeline.named_steps["clf"]
+    arrays: Dict[str, np.ndarray] = {}
+    blocks = []
+
+    for name, transformer in features.transformer_list:
+        if isinstance(transformer, TfidfVectorizer):
+            blocks.append(_export_tfidf(name, transformer, arrays))
+        elif isinstance(transformer, HashingTfidfVectorizer):
+            blocks.append(_export_hashing(name, transformer, arrays))
+        elif isinstance(transformer, SideChannelFeatures):
+            blocks.append({"name": name, "kind": "side", "n_features": 4})
+        else:
+            raise ArtifactError(f"Unsupported transformer {name!r}: {transformer!r}")
+    if features.transformer_weights:
+        raise ArtifactError("transformer_weights are not supported")
+
+    manifest = {
+        "format": FORMAT,
+        "format_version": FORMAT_VERSION,
+        "created": datetime.utcnow().isoformat(),
+        "classes": [str(c) for c in forest.classes_],
+        "blocks": blocks,
+        "forest": _export_forest(forest, arrays, sum(b["n_features"] for b in blocks)),
+        "arrays": {},
+    }
+    if cascade is not None:
+        manifest["cascade"] = _export_cascade(cascade, arrays)
+
+    os.makedirs(out_dir, exist_ok=True)
+    for key, arr in arrays.items():
+        data = _npy_bytes(arr)
+        digest = hashlib.sha256(data).hexdigest()
+        filename = f"{key}.{digest[:8]}.npy"
+        path = os.path.join(out_dir, filename)
+        if not os.path.exists(path):
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        manifest["arrays"][key] = {
+            "file": filename,
+            "dtype": arr.dtype.str,
+            "shape": list(arr.shape),
+            "sha256": digest,
+        }
+    manifest["checksum"] = _manifest_checksum(manifest)
+
+    tmp = os.path.join(out_dir, MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST))
+
+    keep = {a["file"] for a in manifest["arrays"].values()} | {MANIFEST}
+    for filename in os.listdir(out_dir):
+        if filename.endswith(".npy") and filename not in keep:
+            os.remove(os.path.join(out_dir, filename))
+    return manifest
+
+
+def _export_tfidf(name: str, vec: TfidfVectorizer, arrays) -> Dict[str, Any]:
+    params = vec.get_params()
+    for key, expected in _REQUIRED_DEFAULTS.items():
+        if params[key] != expected:
+            raise ArtifactError(f"{name}: {key}={params[key]!r} is not supported")
+
+    buckets: Dict[int, List[Tuple[str, int]]] = {}
+    nul_terms = {}
+    for term, idx in vec.vocabulary_.items():
+        if "\x00" in term:
+            # NumPy unicode arrays drop trailing NULs; keep these exact
+            nul_terms[term] = int(idx)
+            continue
+        buckets.setdefault(_width_for(len(term)), []).append((term, int(idx)))
+
+    widths = []
+    for width, items in sorted(buckets.items()):
+        items.sort()
+        arrays[f"{name}_terms_{width}"] = np.array(
+            [t for t, _ in items], dtype=f"<U{width}"
+        )
+        arrays[f"{name}_index_{width}"] = np.array(
+            [i for _, i in items], dtype=np.int32
+        )
+        widths.append(width)
+    arrays[f"{name}_idf"] = np.asarray(vec.idf_, dtype=np.float64)
+
+    return {
+        "name": name,
+        "kind": "tfidf",
+        "params": {
+            k: list(v) if isinstance(v, tuple) else v
+            for k, v in ((k, params[k]) for k in _VECTORIZER_PARAMS)
+        },
+        "n_features": len(vec.vocabulary_),
+        "widths": widths,
+        "nul_terms": nul_terms,
+    }
+
+
+def _export_hashing(name: str, vec: HashingTfidfVectorizer, arrays) -> Dict[str, Any]:
+    arrays[f"{name}_idf"] = np.asarray(vec.idf_, dtype=np.float64)
+    params = vec.get_params()
+    params["ngram_range"] = list(params["ngram_range"])
+    return {
+        "name": name,
+        "kind": "hashing",
+        "params": params,
+        "n_features": vec.n_features,
+    }
+
+
+def _export_cascade(cascade: CascadePipeline, arrays) -> Dict[str, Any]:
+    linear = cascade.linear
+    arrays["linear_coef"] = np.asarray(linear.coef_, dtype=np.float64)
+    arrays["linear_intercept"] = np.asarray(linear.intercept_, dtype=np.float64)
+    return {
+        "low": cascade.low,
+        "high": cascade.high,
+        "calibration": cascade.calibration,
+        "linear_classes": [str(c) for c in linear.classes_],
+    }
+
+
+def _export_forest(forest, arrays, n_features: int) -> Dict[str, Any]:
+    if forest.n_outputs_ != 1:
+        raise ArtifactError("Only single-output forests are supported")
+    trees = [est.tree_ for est in forest.estimators_]
+    used = np.unique(np.concatenate([t.feature[t.feature >= 0] for t in trees]))
+    local = np.full(n_features, -1, dtype=np.int32)
+    local[used] = np.arange(len(used), dtype=np.int32)
+
+    roots, left, right, feature, threshold, proba = [], [], [], [], [], []
+    offset = 0
+    for t in trees:
+        roots.append(offset)
+        is_leaf = t.children_left == -1
+        left.append(np.where(is_leaf, -1, t.children_left + offset))
+        right.append(np.where(is_leaf, -1, t.children_right + offset))
+        feature.append(np.where(is_leaf, 0, local[np.maximum(t.feature, 0)]))
+        threshold.append(t.threshold)
+        proba.append(t.value[:, 0, : forest.n_classes_])
+        offset += t.node_count
+
+    arrays["forest_roots"] = np.array(roots, dtype=np.int64)
+    arrays["forest_left"] = np.concatenate(left).astype(np.int64)
+    arrays["forest_right"] = np.concatenate(right).astype(np.int64)
+    arrays["forest_feature"] = np.concatenate(feature).astype(np.int32)
+    arrays["forest_threshold"] = np.concatenate(threshold).astype(np.float64)
+    arrays["forest_proba"] = np.concatenate(proba).astype(np.float64)
+    arrays["forest_used_features"] = used.astype(np.int32)
+    return {
+        "n_estimators": len(trees),
+        "max_depth": int(max(t.max_depth for t in trees)),
+        "n_features": n_features,
+    }
+
+
+# ─── Load ─────────────────────────────────────────────────────────────────────
+def load_artifact(path: str, mmap: bool = True, verify: bool = True):
+    """
+    Open an exported artifact. `path` is the artifact directory or its
+    manifest.json. With `verify`, every array file is hashed and compared
+    to the manifest before use.
+    """
+    directory = os.path.dirname(path) if path.endswith(MANIFEST) else path
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+
+    if manifest.get("format") != FORMAT:
+        raise ArtifactError(f"Not a {FORMAT} artifact: {directory}")
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ArtifactError(
+            f"Unsupported format_version {manifest.get('format_version')}"
+        )
+    if manifest.get("checksum") != _manifest_checksum(manifest):
+        raise ArtifactError("Manifest checksum mismatch")
+
+    arrays = {}
+    for key, meta in manifest["arrays"].items():
+        file_path = os.path.join(directory, meta["file"])
+        if verify and _file_sha256(file_path) != meta["sha256"]:
+            raise ArtifactError(f"Checksum mismatch for {meta['file']}")
+        arr = np.load(file_path, mmap_mode="r" if mmap else None, allow_pickle=False)
+        if arr.dtype.str != meta["dtype"] or list(arr.shape) != meta["shape"]:
+            raise ArtifactError(f"Shape/dtype mismatch for {meta['file']}")
+        arrays[key] = arr
+
+    pipeline = FastPipeline(manifest, arrays)
+    if "cascade" not in manifest:
+        return pipeline
+    spec = manifest["cascade"]
+    # A fitted LogisticRegression is fully described by these attributes
+    linear = LogisticRegression()
+    linear.classes_ = np.array(spec["linear_classes"])
+    linear.coef_ = arrays["linear_coef"]
+    linear.intercept_ = arrays["linear_intercept"]
+    linear.n_features_in_ = linear.coef_.shape[1]
+    return CascadePipeline(
+        pipeline, linear, spec["low"], spec["high"], spec["calibration"]
+    )
+
+
+class FastPipeline:
+    """
+    Inference-only stand-in for the sklearn pipeline, backed by the
+    (memory-mapped) artifact arrays. Provides classes_, predict_proba and
+    predict, plus the two halves of predict_proba for CascadePipeline.
+    """
+
+    def __init__(self, manifest: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        self.manifest = manifest
+        self.classes_ = np.array(manifest["classes"])
+        self._blocks = []
+        for block in manifest["blocks"]:
+            if block["kind"] == "tfidf":
+                self._blocks.append(_TfidfBlock(block, arrays))
+            elif block["kind"] == "hashing":
+                self._blocks.append(_hashing_block(block, arrays))
+            else:
+                self._blocks.append(_SideBlock(block))
+
+        self._roots = arrays["forest_roots"]
+        self._left = arrays["forest_left"]
+        self._right = arrays["forest_right"]
+        self._feature = arrays["forest_feature"]
+        self._threshold = arrays["forest_threshold"]
+        self._proba = arrays["forest_proba"]
+        self._used = arrays["forest_used_features"]
+        self._max_depth = manifest["forest"]["max_depth"]
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.predict_proba_features(self.transform_features(list(X)))
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def transform_features(self, texts: List[str]) -> sp.csr_matrix:
+        """The FeatureUnion output (all columns), as a CSR matrix."""
+        return sp.hstack([b.transform(texts) for b in self._blocks]).tocsr()
+
+    def predict_proba_features(self, features) -> np.ndarray:
+        # float64 FeatureUnion output → float32, as the forest validates it
+        used = sp.csc_matrix(features)[:, self._used]
+        return self._forest_proba(used.toarray().astype(np.float32))
+
+    def _forest_proba(self, X: np.ndarray) -> np.ndarray:
+        n, n_trees = X.shape[0], len(self._roots)
+        node = np.broadcast_to(self._roots, (n, n_trees)).ravel().copy()
+        # Walk every (sample, tree) pair one level per step, dropping the
+        # pairs that reached a leaf
+        pending = np.arange(n * n_trees)
+        X_flat = X.ravel()
+        n_cols = X.shape[1]
+        for _ in range(self._max_depth + 1):
+            cur = node[pending]
+            left = self._left[cur]
+            inner = left != -1
+            if not inner.all():
+                pending, cur, left = pending[inner], cur[inner], left[inner]
+            if not len(pending):
+                break
+            values = X_flat[(pending // n_trees) * n_cols + self._feature[cur]]
+            node[pending] = np.where(
+                values <= self._threshold[cur], left, self._right[cur]
+            )
+
+        # Accumulate tree by tree, in order, like RandomForest.predict_proba
+        leaf_proba = self._proba[node.reshape(n, n_trees)]  # (n, trees, classes)
+        out = np.zeros((n, leaf_proba.shape[2]), dtype=np.float64)
+        for t in range(leaf_proba.shape[1]):
+            out += leaf_proba[:, t]
+        out /= leaf_proba.shape[1]
+        return out
+
+
+class _TfidfBlock:
+    def __init__(self, block: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        params = dict(block["params"])
+        params["ngram_range"] = tuple(params["ngram_range"])
+        # Unfitted vectorizer: only used for its (stateless) analyzer
+        self.analyze = TfidfVectorizer(**params).build_analyzer()
+        self.n_features = block["n_features"]
+        self.idf = arrays[f"{block['name']}_idf"]
+        self.nul_terms = block["nul_terms"]
+        self.lookup = {
+            w: (
+                arrays[f"{block['name']}_terms_{w}"],
+                arrays[f"{block['name']}_index_{w}"],
+            )
+            for w in block["widths"]
+        }
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        rows, cols, counts = [], [], []
+        for row, text in enumerate(texts):
+            for term, count in Counter(self.analyze(text)).items():
+                rows.append(row)
+                cols.append(term)
+                counts.append(count)
+
+        col_idx = self._indices(cols)
+        found = col_idx >= 0
+        X = sp.csr_matrix(
+            (
+                np.asarray(counts, dtype=np.float64)[found],
+                (np.asarray(rows, dtype=np.int64)[found], col_idx[found]),
+            ),
+            shape=(len(texts), self.n_features),
+        )
+        X.sum_duplicates()
+        X.sort_indices()
+        X.data *= self.idf[X.indices]
+        return normalize(X, norm="l2", copy=False)
+
+    def _indices(self, terms: List[str]) -> np.ndarray:
+        # -1 for out-of-vocabulary terms, including any longer than the
+        # widest bucket: export refuses such terms, so none is in the vocabulary
+        out = np.full(len(terms), -1, dtype=np.int64)
+        groups: Dict[int, List[int]] = {}
+        for i, term in enumerate(terms):
+            if "\x00" in term:
+                out[i] = self.nul_terms.get(term, -1)
+            elif len(term) <= _WIDTHS[-1]:
+                groups.setdefault(_width_for(len(term)), []).append(i)
+
+        for width, positions in groups.items():
+            if width not in self.lookup:
+                continue
+            vocab, index = self.lookup[width]
+            query = np.array([terms[i] for i in positions], dtype=f"<U{width}")
+            pos = np.searchsorted(vocab, query)
+            pos[pos == len(vocab)] = 0
+            hit = vocab[pos] == query
+            out[np.asarray(positions)[hit]] = index[pos[hit]]
+        return out
+
+
+def _hashing_block(block: Dict[str, Any], arrays) -> HashingTfidfVectorizer:
+    # No vocabulary to rebuild: the transformer only needs its IDF array
+    params = dict(block["params"])
+    params["ngram_range"] = tuple(params["ngram_range"])
+    vec = HashingTfidfVectorizer(**params)
+    vec.idf_ = arrays[f"{block['name']}_idf"]
+    return vec
+
+
+class _SideBlock:
+    def __init__(self, block: Dict[str, Any]):
+        self.transformer = SideChannelFeatures()
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        return sp.csr_matrix(self.transformer.transform(texts))
+
+
+# ─── helpers ──────────────────────────────────────────────────────────────────
+def _width_for(length: int) -> int:
+    for width in _WIDTHS:
+        if length <= width:
+            return width
+    raise ArtifactError(f"Term of length {length} exceeds {_WIDTHS[-1]}")
+
+
+def _npy_bytes(arr: np.ndarray) -> bytes:
+    from io import BytesIO
+
+    buf = BytesIO()
+    np.save(buf, np.ascontiguousarray(arr), allow_pickle=False)
+    return buf.getvalue()
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _manifest_checksum(manifest: Dict[str, Any]) -> str:
+    body = {k: v for k, v in manifest.items() if k != "checksum"}
+    return hashlib.sha256(
+        json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
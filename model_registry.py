@@ -0,0 +1,128 @@
+# model_registry.py
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import joblib
+
+from hot_reload import HotReloadRegistry, Stamp
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = "models/attack_classifier_pipeline.pkl"
+# Memory-mappable export (model_artifact.py); preferred when present
+ARTIFACT_PATH = "models/attack_classifier_mmap"
+RELOAD_CHECK_INTERVAL = 5.0  # seconds between checks of the artifact on disk
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+class ModelHandle:
+    """
+    One fully loaded model version. Never mutated after construction, so a
+    request that grabbed a handle keeps a consistent model even if a newer
+    one is swapped in meanwhile.
+
+    Expensive derived objects (e.g. the SHAP explainer) are attached lazily
+    per handle with `attachment()` and are dropped along with the handle.
+    """
+
+    def __init__(
+        self, pipeline, version: str, path: str, stamp: Optional[Tuple] = None
+    ):
+        self.pipeline = pipeline
+        self.version = version
+        self.path = path
+        self.stamp = stamp  # (mtime_ns, size) of the file it was loaded from
+        self.loaded_at = time.time()
+        self._attachments: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def classes(self):
+        return self.pipeline.classes_
+
+    def attachment(self, name: str, factory: Callable[["ModelHandle"], Any]) -> Any:
+        """
+        Return the object stored under `name`, building it with
+        `factory(handle)` on first use.
+        """
+        value = self._attachments.get(name)
+        if value is None:
+            with self._lock:
+                value = self._attachments.get(name)
+                if value is None:
+                    value = self._attachments[name] = factory(self)
+        return value
+
+
+class ModelRegistry(HotReloadRegistry[ModelHandle]):
+    """
+    Process-wide owner of the attack classifier.
+
+    The artifact is loaded on first use, not at import. If `artifact_path`
+    holds a memory-mappable export it is used instead of the pickle at
+    `path`. The file is then hot-reloaded as described in
+    HotReloadRegistry: a new version is only swapped in once fully built,
+    and a failed load keeps the current handle.
+    """
+
+    kind = "model"
+
+    def __init__(
+        self,
+        path: str = MODEL_PATH,
+        check_interval: float = RELOAD_CHECK_INTERVAL,
+        loader: Callable[[str], Any] = joblib.load,
+        artifact_path: Optional[str] = None,
+    ):
+        super().__init__(check_interval)
+        self.path = path
+        self.artifact_path = artifact_path
+        self.loader = loader
+
+    # ── internals ─────────────────────────────────────────────────────────
+    def _source(self) -> Tuple[str, Callable[[str], Any]]:
+        # The manifest is replaced last on export, so it versions the arrays
+        if self.artifact_path:
+            manifest = os.path.join(self.artifact_path, "manifest.json")
+            if os.path.exists(manifest):
+                from model_artifact import load_artifact
+
+                return manifest, load_artifact
+        return self.path, self.loader
+
+    def _path(self) -> str:
+        return self._source()[0]
+
+    def _load(self) -> Tuple[ModelHandle, Stamp]:
+        start = time.perf_counter()
+        path, loader = self._source()
+        stamp = self._stat()
+        pipeline = loader(path)
+        handle = ModelHandle(pipeline, file_digest(path), path, stamp)
+        logger.info(
+            "Loaded model %s (version %s) in %.3fs",
+            path,
+            handle.version,
+            time.perf_counter() - start,
+        )
+        return handle, stamp
+
+
+# Shared by the middleware and the explainers
+registry = ModelRegistry(artifact_path=ARTIFACT_PATH)
+
+
+def get_model() -> ModelHandle:
+    return registry.current()
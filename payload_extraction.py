@@ -0,0 +1,129 @@
+# payload_extraction.py
+
+import json
+from typing import Any, List, Optional
+
+try:  # optional, several times faster than the stdlib decoder
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# ─── Limits for the string-leaf walk ───────────────────────────────────────────
+MAX_DEPTH = 32  # containers nested deeper than this are not descended into
+MAX_STRINGS = 1000  # string leaves collected per body
+LEAF_SEPARATOR = "\n"  # joins the leaves into the inspected payload
+
+_NOT_JSON = object()
+
+
+def json_loads(raw: bytes) -> Any:
+    """
+    Decode JSON with orjson when installed. Anything orjson refuses is
+    retried with the stdlib decoder (which also accepts NaN, non-UTF-8
+    encodings and lone surrogates), so both give the same documents.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw)
+
+
+class _LeafLimit(Exception):
+    pass
+
+
+def string_leaves(
+    document: Any, max_depth: int = MAX_DEPTH, max_strings: int = MAX_STRINGS
+):
+    """
+    Every string in a decoded JSON document (object keys and values, and
+    array items, at any level), in document order. Returns (leaves,
+    truncated); truncated is True if a limit stopped the walk. The recursion
+    is bounded by max_depth.
+    """
+    leaves: List[str] = []
+    too_deep = []
+
+    def walk(container, depth):
+        if depth >= max_depth:
+            too_deep.append(depth)
+            return
+        if type(container) is dict:
+            # Keys are inspected too: an attack can sit in a key as well
+            children = (item for pair in container.items() for item in pair)
+        else:
+            children = container
+        for child in children:
+            kind = type(child)
+            if kind is str:
+                if len(leaves) >= max_strings:
+                    raise _LeafLimit
+                leaves.append(child)
+            elif kind is dict or kind is list:
+                walk(child, depth + 1)
+
+    if type(document) is str:
+        return [document][:max_strings], max_strings < 1
+    if type(document) is not dict and type(document) is not list:
+        return leaves, False
+    try:
+        walk(document, 0)
+    except _LeafLimit:
+        return leaves, True
+    return leaves, bool(too_deep)
+
+
+class ParsedBody:
+    """
+    One request body, parsed once and shared by the WAF and the endpoint.
+      raw:       the body bytes
+      json:      the decoded document (only if is_json)
+      strings:   its string leaves (bounded, see string_leaves)
+      truncated: a walk limit was hit
+      payload:   the text the WAF inspects: the leaves joined with
+                 LEAF_SEPARATOR, or the whole body decoded as UTF-8 when
+                 it is not JSON or the walk was truncated
+    """
+
+    __slots__ = ("raw", "json", "is_json", "strings", "truncated", "payload")
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        try:
+            document = json_loads(raw) if raw else _NOT_JSON
+        except (ValueError, RecursionError):
+            document = _NOT_JSON
+
+        self.is_json = document is not _NOT_JSON
+        if self.is_json:
+            self.json = document
+            self.strings, self.truncated = string_leaves(document)
+            if self.truncated:
+                # Never leave a blind spot past the limits: inspect it all
+                self.payload = raw.decode("utf-8", "ignore")
+            else:
+                self.payload = LEAF_SEPARATOR.join(self.strings)
+        else:
+            self.json = None
+            self.payload = raw.decode("utf-8", "ignore")
+            self.strings = [self.payload]
+            self.truncated = False
+
+
+def cached_body(request) -> Optional[ParsedBody]:
+    """The ParsedBody the WAF stored on this request, if any."""
+    return getattr(request.state, "parsed_body", None)
+
+
+async def parsed_body(request) -> ParsedBody:
+    """
+    The request body parsed once per request: reuses the WAF's ParsedBody
+    (stored in request.state) or parses and stores it.
+    """
+    parsed = cached_body(request)
+    if parsed is None:
+        parsed = ParsedBody(await request.body())
+        request.state.parsed_body = parsed
+    return parsed
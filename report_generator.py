@@ -1,12 +1,261 @@
 # report_generator.py
 
-import json
+import argparse
+import heapq
 import os
-from datetime import datetime
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
 from fpdf import FPDF
 
-LOG_FILE = "logs/alerts.json"
+from alert_logger import (
+    ALERT_STORE_DIR,
+    EXPLANATION_LOG_FILE,
+    EXPLANATION_PENDING,
+    LOG_FILE,
+    ROLLUP_DIR,
+    explanation_text,
+)
+from payload_extraction import json_loads
+
 REPORT_FILE = "reports/waf_xai_report.pdf"
+# Where alerts are read from: the JSONL log ("jsonl"), the Parquet store
+# ("store") or the rollup counters ("rollups"). The log has every alert; the
+# store and rollups only those logged since they were enabled, so they are
+# never picked implicitly.
+REPORT_SOURCE = "jsonl"
+SOURCES = ("jsonl", "store", "rollups")
+
+# ─── Bounded aggregation ───────────────────────────────────────────────────────
+TOP_N = 10  # client IPs / patterns listed in the report
+TOP_TRACKED = 1000  # counters kept per top-N table (Space-Saving)
+SAMPLE_ROWS = 40  # alerts listed in the sample table (reservoir sample)
+
+
+class TopK:
+    """
+    Space-Saving heavy hitters: approximate top counts of an unbounded
+    stream in `capacity` counters. When a new item arrives with every
+    counter taken, it replaces the smallest counter and inherits its count
+    as `error`. A reported count never undercounts, and overcounts by at
+    most its error. Items that were never evicted have exact counts (error
+    0).
+    """
+
+    def __init__(self, capacity: int = TOP_TRACKED):
+        self.capacity = capacity
+        self.counts: Dict[Any, int] = {}
+        self.errors: Dict[Any, int] = {}
+        self._heap: List[Tuple[int, Any]] = []  # (count, item), lazily updated
+
+    def add(self, item, n: int = 1) -> None:
+        counts = self.counts
+        if item in counts:
+            counts[item] += n
+        elif len(counts) < self.capacity:
+            counts[item] = n
+            self.errors[item] = 0
+        else:
+            while True:  # the smallest counter whose heap entry is current
+                count, victim = heapq.heappop(self._heap)
+                if counts.get(victim) == count:
+                    break
+            del counts[victim], self.errors[victim]
+            counts[item] = count + n
+            self.errors[item] = count
+        heapq.heappush(self._heap, (counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, i) for i, c in counts.items()]
+            heapq.heapify(self._heap)
+
+    def most_common(self, n: int) -> List[Tuple[Any, int, int]]:
+        """[(item, count, error)] for the n largest counts (ties by item)."""
+        top = heapq.nsmallest(
+            n, self.counts.items(), key=lambda kv: (-kv[1], str(kv[0]))
+        )
+        return [(item, count, self.errors[item]) for item, count in top]
+
+
+class ReportStats:
+    """
+    Everything the report shows, aggregated in one pass with bounded
+    memory. Per-value counts cover type, severity and source (a handful of
+    values each) and the 24 hours of the day. Top IPs and patterns use TopK,
+    and the sample table is a reservoir sample of SAMPLE_ROWS alerts.
+    """
+
+    def __init__(
+        self,
+        top_tracked: int = TOP_TRACKED,
+        sample_rows: int = SAMPLE_ROWS,
+        seed: Optional[int] = None,
+    ):
+        self.total = 0
+        self.by_type: Counter = Counter()
+        self.by_severity: Counter = Counter()
+        self.by_source: Counter = Counter()
+        self.by_hour = [0] * 24
+        self.client_ips = TopK(top_tracked)
+        self.patterns = TopK(top_tracked)
+        self.first: Optional[datetime] = None
+        self.last: Optional[datetime] = None
+        self.sample: List[Dict[str, Any]] = []
+        self.sample_rows = sample_rows
+        self._rng = random.Random(seed)
+
+    def add(self, alert: Dict[str, Any], timestamp: Optional[datetime]) -> None:
+        self.total += 1
+        self.by_type[alert.get("attack_type") or "unknown"] += 1
+        self.by_severity[alert.get("severity") or "unknown"] += 1
+        self.by_source[alert.get("source") or "unknown"] += 1
+        self.client_ips.add(alert.get("client_ip") or "unknown")
+        if alert.get("pattern"):
+            self.patterns.add(alert["pattern"])
+        if timestamp is not None:
+            self.by_hour[timestamp.hour] += 1
+            if self.first is None or timestamp < self.first:
+                self.first = timestamp
+            if self.last is None or timestamp > self.last:
+                self.last = timestamp
+
+        # Reservoir sampling (Algorithm R)
+        if len(self.sample) < self.sample_rows:
+            self.sample.append(alert)
+        else:
+            slot = self._rng.randrange(self.total)
+            if slot < self.sample_rows:
+                self.sample[slot] = alert
+
+
+# ─── Alert sources (streamed, filtered to [since, until)) ────────────────────
+def iter_jsonl(path: str, since=None, until=None) -> Iterator[Tuple[dict, datetime]]:
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                alert = json_loads(line)
+                timestamp = utc(alert.get("timestamp"))
+            except (ValueError, TypeError, AttributeError):
+                continue  # unparsable line or timestamp
+            if since is not None and (timestamp is None or timestamp < since):
+                continue
+            if until is not None and (timestamp is None or timestamp >= until):
+                continue
+            yield alert, timestamp
+
+
+def iter_store(root: str, since=None, until=None) -> Iterator[Tuple[dict, datetime]]:
+    from alert_store import AlertStore  # pyarrow, only for the store
+
+    for batch in AlertStore(root).scan(since, until):
+        for alert in batch.to_pylist():
+            timestamp = alert["timestamp"]
+            alert["timestamp"] = timestamp.isoformat() if timestamp else ""
+            yield alert, timestamp
+
+
+def utc(value) -> Optional[datetime]:
+    """An ISO 8601 string as a naive UTC datetime, like the logged timestamps."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def iter_alerts(source: str = REPORT_SOURCE, since=None, until=None):
+    """
+    Alerts in [since, until) from the JSONL log ("jsonl") or the Parquet
+    store ("store").
+    """
+    if source == "store":
+        return iter_store(ALERT_STORE_DIR, since, until)
+    if source != "jsonl":
+        raise ValueError(f"Unknown alert source {source!r}")
+    if not os.path.exists(LOG_FILE):
+        return iter([])
+    return iter_jsonl(LOG_FILE, since, until)
+
+
+def resolve_explanations(
+    alerts: List[Dict[str, Any]], path: Optional[str] = None
+) -> int:
+    """
+    Replace the pending explanation of ML alerts with the one logged later
+    under their request_id (EXPLANATION_LOG_FILE), in one pass over that
+    file. Meant for the sample rows; returns how many were resolved.
+    """
+    pending = {
+        alert["request_id"]: alert
+        for alert in alerts
+        if alert.get("explanation") == EXPLANATION_PENDING and alert.get("request_id")
+    }
+    path = path or EXPLANATION_LOG_FILE
+    if not pending or not os.path.exists(path):
+        return 0
+    resolved = 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                record = json_loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            alert = pending.pop(record.get("request_id"), None)
+            if alert is not None:
+                alert["explanation"] = explanation_text(record)
+                resolved += 1
+                if not pending:
+                    break
+    return resolved
+
+
+def rollup_stats(since=None, until=None, root: Optional[str] = None) -> ReportStats:
+    """
+    ReportStats from the alert_rollups counters, without reading any alert:
+    counts, the hourly histogram and top client IPs, but no patterns and no
+    sample. The window is rounded out to whole buckets of the finest
+    resolution still retained at `since`.
+    """
+    from alert_rollups import RETENTION, Rollups
+
+    rollups = Rollups(root or ROLLUP_DIR)
+    resolution = "day"
+    if since is not None:
+        age = datetime.utcnow() - since
+        for candidate in ("minute", "hour"):
+            if age <= RETENTION[candidate] - timedelta(hours=1):
+                resolution = candidate
+                break
+
+    stats = ReportStats()
+    for (bucket, attack_type, severity, source), n in rollups.counts(
+        resolution, since, until
+    ).items():
+        stats.total += n
+        stats.by_type[attack_type] += n
+        stats.by_severity[severity] += n
+        stats.by_source[source] += n
+        if resolution != "day":
+            stats.by_hour[int(bucket[11:13])] += n
+    ip_resolution = "day" if resolution == "day" else "hour"
+    for ip, n in rollups.top_client_ips(ip_resolution, since, until, TOP_TRACKED):
+        stats.client_ips.add(ip, n)
+    return stats
+
+
+# ─── PDF ───────────────────────────────────────────────────────────────────────
+def _text(value, limit: Optional[int] = None) -> str:
+    # The core PDF fonts are Latin-1 only
+    text = "" if value is None else str(value)
+    if limit is not None and len(text) > limit:
+        text = text[:limit] + "..."
+    return text.encode("latin-1", "replace").decode("latin-1")
 
 
 class PDFReport(FPDF):
@@ -28,20 +277,49 @@ class PDFReport(FPDF):
         self.set_font("Arial", "I", 8)
         self.cell(0, 10, "Generated by WAF-XAI", align="C")
 
-    def add_summary(self, alerts):
+    def add_summary(self, stats: ReportStats, since=None, until=None):
         self.set_font("Arial", "B", 12)
         self.cell(0, 10, "Summary", ln=True)
         self.set_font("Arial", "", 11)
 
-        total = len(alerts)
-        xss = sum(1 for a in alerts if a["attack_type"] == "XSS")
-        sqli = sum(1 for a in alerts if a["attack_type"] == "SQLi")
+        window = f"{since or stats.first or '-'}  to  {until or stats.last or '-'}"
+        self.cell(0, 8, _text(f"Window: {window}"), ln=True)
+        self.cell(0, 8, f"Total Attacks: {stats.total}", ln=True)
+        self.cell(0, 8, f"XSS: {stats.by_type['XSS']}", ln=True)
+        self.cell(0, 8, f"SQL Injection: {stats.by_type['SQLi']}", ln=True)
+        self.ln(5)
 
-        self.cell(0, 10, f"Total Attacks: {total}", ln=True)
-        self.cell(0, 10, f"XSS: {xss}", ln=True)
-        self.cell(0, 10, f"SQL Injection: {sqli}", ln=True)
+    def add_counts(self, title: str, rows, first_header: str, with_error=False):
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 10, _text(title), ln=True)
+        self.set_font("Arial", "B", 10)
+        self.cell(130, 8, _text(first_header), border=1)
+        self.cell(30, 8, "Count", border=1)
+        if with_error:
+            self.cell(30, 8, "+/-", border=1)
+        self.ln()
+        self.set_font("Arial", "", 10)
+        for row in rows:
+            self.cell(130, 8, _text(row[0], 70), border=1)
+            self.cell(30, 8, str(row[1]), border=1)
+            if with_error:
+                self.cell(30, 8, str(row[2]) if row[2] else "", border=1)
+            self.ln()
         self.ln(5)
 
+    def add_hourly(self, by_hour: List[int]):
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 10, "Alerts by Hour of Day (UTC)", ln=True)
+        peak = max(by_hour) or 1
+        x0, y0, width, height = self.get_x(), self.get_y(), 7.5, 40
+        self.set_font("Arial", "", 7)
+        for hour, count in enumerate(by_hour):
+            bar = height * count / peak
+            self.set_fill_color(200, 60, 60)
+            self.rect(x0 + hour * width, y0 + height - bar, width - 1, bar, "F")
+            self.text(x0 + hour * width + 1, y0 + height + 4, f"{hour:02d}")
+        self.set_y(y0 + height + 10)
+
     def add_table(self, alerts):
         self.set_font("Arial", "B", 11)
         self.cell(40, 10, "Time", border=1)
@@ -53,39 +331,86 @@ class PDFReport(FPDF):
 
         self.set_font("Arial", "", 10)
         for alert in alerts:
-            self.cell(40, 10, alert["timestamp"][:19], border=1)
-            self.cell(30, 10, alert["client_ip"], border=1)
-            self.cell(25, 10, alert["attack_type"], border=1)
-            self.cell(25, 10, alert["severity"], border=1)
-            explanation = (
-                alert["explanation"][:60] + "..."
-                if len(alert["explanation"]) > 60
-                else alert["explanation"]
-            )
-            self.cell(70, 10, explanation, border=1)
+            self.cell(40, 10, _text(alert.get("timestamp"))[:19], border=1)
+            self.cell(30, 10, _text(alert.get("client_ip")), border=1)
+            self.cell(25, 10, _text(alert.get("attack_type")), border=1)
+            self.cell(25, 10, _text(alert.get("severity")), border=1)
+            self.cell(70, 10, _text(alert.get("explanation"), 60), border=1)
             self.ln()
 
 
-def generate_report():
-    if not os.path.exists(LOG_FILE):
-        print("No alerts found. Log file does not exist.")
-        return
-
-    with open(LOG_FILE, "r") as f:
-        alerts = [json.loads(line) for line in f if line.strip()]
+def generate_report(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    source: str = REPORT_SOURCE,
+    output: str = REPORT_FILE,
+) -> Optional[ReportStats]:
+    """
+    Aggregate the alerts in [since, until) in one streaming pass and write
+    the PDF. Memory and PDF size are bounded (TOP_N, TOP_TRACKED,
+    SAMPLE_ROWS) whatever the number of alerts. source="rollups" reads
+    the pre-aggregated counters instead (see rollup_stats).
+    """
+    if source == "rollups":
+        stats = rollup_stats(since, until)
+    else:
+        stats = ReportStats()
+        for alert, timestamp in iter_alerts(source, since, until):
+            stats.add(alert, timestamp)
+        resolve_explanations(stats.sample)
 
-    if not alerts:
+    if not stats.total:
         print("No alerts to report.")
-        return
+        return None
 
-    os.makedirs("reports", exist_ok=True)
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
     pdf = PDFReport()
     pdf.add_page()
-    pdf.add_summary(alerts)
-    pdf.add_table(alerts)
-    pdf.output(REPORT_FILE)
-    print(f"✅ Report generated: {REPORT_FILE}")
+    pdf.add_summary(stats, since, until)
+    pdf.add_counts("Attack Types", stats.by_type.most_common(), "Type")
+    pdf.add_counts("Severity", stats.by_severity.most_common(), "Severity")
+    pdf.add_counts("Detection Source", stats.by_source.most_common(), "Source")
+    if any(stats.by_hour):
+        pdf.add_hourly(stats.by_hour)
+    pdf.add_counts(
+        f"Top {TOP_N} Client IPs",
+        stats.client_ips.most_common(TOP_N),
+        "Client IP",
+        with_error=True,
+    )
+    if stats.patterns.counts:
+        pdf.add_counts(
+            f"Top {TOP_N} Patterns",
+            stats.patterns.most_common(TOP_N),
+            "Pattern",
+            with_error=True,
+        )
+    if stats.sample:
+        pdf.add_page()
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(0, 10, f"Sample of {len(stats.sample)} alerts", ln=True)
+        pdf.add_table(sorted(stats.sample, key=lambda a: a.get("timestamp") or ""))
+    pdf.output(output)
+    print(f"✅ Report generated: {output} ({stats.total} alerts)")
+    return stats
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser("Generate the WAF-XAI PDF report")
+    p.add_argument("--since", type=utc, help="ISO 8601, inclusive (UTC if no offset)")
+    p.add_argument("--until", type=utc, help="ISO 8601, exclusive (UTC if no offset)")
+    p.add_argument(
+        "--source",
+        choices=SOURCES,
+        default=REPORT_SOURCE,
+        help="the store and rollups miss alerts logged before they were enabled",
+    )
+    p.add_argument("-o", "--output", default=REPORT_FILE)
+    return p.parse_args(argv)
 
 
 if __name__ == "__main__":
-    generate_report()
+    args = parse_args()
+    generate_report(args.since, args.until, args.source, args.output)
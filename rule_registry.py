@@ -0,0 +1,73 @@
+# rule_registry.py
+
+import logging
+import time
+from typing import Optional, Tuple
+
+from detection_engine import RULES_PATH, RULESET, RuleSet, load_rule_bundle
+from hot_reload import HotReloadRegistry, Stamp
+
+logger = logging.getLogger(__name__)
+
+RULE_RELOAD_INTERVAL = 5.0  # seconds between checks of the rule bundle on disk
+
+
+class RuleRegistry(HotReloadRegistry[RuleSet]):
+    """
+    Process-wide owner of the active detection RuleSet.
+
+    The bundle at `path` is loaded on first use (or `initial` is served if
+    given) and hot-reloaded as described in HotReloadRegistry. A RuleSet is
+    never mutated, so a request that took one keeps matching, caching and
+    explaining against it while a newer one is swapped in; a bundle that
+    fails to compile keeps the current rules (reload() re-raises its
+    RuleBundleError).
+    """
+
+    kind = "rule"
+
+    def __init__(
+        self,
+        path: str = RULES_PATH,
+        check_interval: float = RULE_RELOAD_INTERVAL,
+        initial: Optional[RuleSet] = None,
+    ):
+        self.path = path
+        super().__init__(check_interval, initial, self._stat() if initial else None)
+        self.last_compile_ms: Optional[float] = None
+        self.last_swap_ms: Optional[float] = None
+
+    # ── internals ─────────────────────────────────────────────────────────
+    def _path(self) -> str:
+        return self.path
+
+    def _load(self) -> Tuple[RuleSet, Stamp]:
+        stamp = self._stat()
+        start = time.perf_counter()
+        rules = load_rule_bundle(self.path)
+        self.last_compile_ms = (time.perf_counter() - start) * 1000
+        return rules, stamp
+
+    def _swap(self, rules: RuleSet, stamp: Stamp) -> None:
+        start = time.perf_counter()
+        previous = self._current
+        super()._swap(rules, stamp)
+        self.last_swap_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            "Loaded rule bundle %s (version %s → %s, %d rules): "
+            "compiled in %.1f ms, swapped in %.3f ms",
+            self.path,
+            previous.version if previous else None,
+            rules.version,
+            len(rules),
+            self.last_compile_ms,
+            self.last_swap_ms,
+        )
+
+
+# Starts from the bundle detection_engine compiled at import
+registry = RuleRegistry(initial=RULESET)
+
+
+def get_rules() -> RuleSet:
+    return registry.current()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_alert_store.py
+
+A year of synthetic alerts in the Parquet alert store vs the JSONL log:
+loading one day (partition pruning + pushed-down filters) against loading
+the whole JSONL log, plus append and compaction costs.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from alert_store import AlertStore, day_bounds
+from log_ingest import AlertFrame, AlertLog
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Benchmark the Parquet alert store")
+    p.add_argument("--days", type=int, default=365)
+    p.add_argument("--per-day", type=int, default=2000)
+    p.add_argument("--segments-per-day", type=int, default=8)
+    return p.parse_args()
+
+
+def day_alerts(day, count, rng):
+    return [
+        {
+            "timestamp": (
+                datetime.combine(day, datetime.min.time())
+                + timedelta(seconds=i * 86400 // count)
+            ).isoformat(),
+            "request_id": f"{day.isoformat()}-{i}",
+            "path": "http://testserver/submit",
+            "method": "POST",
+            "client_ip": f"10.0.{rng.randrange(256)}.{rng.randrange(256)}",
+            "user_agent": "bench",
+            "attack_type": rng.choice(("XSS", "SQLi")),
+            "pattern": None,
+            "explanation": "Detected <script>…</script>, a common XSS vector.",
+            "severity": rng.choice(("High", "Medium", "Low")),
+            "source": rng.choice(("regex", "ml")),
+            "confidence": round(rng.random(), 3),
+        }
+        for i in range(count)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(0)
+    first = date(2026, 1, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AlertStore(os.path.join(tmp, "store"), compact_interval=-1)
+        log_path = os.path.join(tmp, "alerts.jsonl")
+        append_ms = 0.0
+        with open(log_path, "w", encoding="utf-8") as log:
+            for d in range(args.days):
+                records = day_alerts(first + timedelta(days=d), args.per_day, rng)
+                log.writelines(json.dumps(r) + "\n" for r in records)
+                for s in range(args.segments_per_day):
+                    ms, _ = timed(
+                        lambda: store.append(records[s :: args.segments_per_day])
+                    )
+                    append_ms += ms
+        rows = args.days * args.per_day
+        print(
+            f"{rows:,} alerts over {args.days} days "
+            f"({os.path.getsize(log_path) / 1e6:.0f} MB JSONL); "
+            f"append {append_ms / store.segments_written:.1f} ms/segment"
+        )
+        ms, _ = timed(store.compact)
+        print(f"  compact {store.segments_written} segments:         {ms:9.1f} ms")
+
+        day = first + timedelta(days=args.days // 2)
+        ms, table = timed(lambda: AlertFrame(store.query(*day_bounds(day)).to_pandas()))
+        print(
+            f"  store, one day → AlertFrame:      {ms:9.1f} ms ({len(table.frame):,} rows)"
+        )
+        start, _ = day_bounds(day)
+        ms, table = timed(
+            lambda: store.query(
+                start,
+                start + timedelta(hours=1),
+                filters={"attack_type": "SQLi", "severity": ["High", "Medium"]},
+            )
+        )
+        print(
+            f"  store, one hour + filters:        {ms:9.1f} ms ({table.num_rows:,} rows)"
+        )
+        ms, table = timed(lambda: store.query(columns=["timestamp", "attack_type"]))
+        print(
+            f"  store, whole year, two columns:   {ms:9.1f} ms ({table.num_rows:,} rows)"
+        )
+        ms, _ = timed(lambda: AlertLog(log_path).refresh())
+        print(f"  JSONL, whole log → AlertLog:      {ms:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
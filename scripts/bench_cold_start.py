@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_cold_start.py
+
+Cold-start and memory report for one WAF worker. In a fresh interpreter it
+measures the time to import app_demo, the latency of the first request that
+reaches the ML stage, and the peak resident set size. Run it against
+another checkout with --root to compare versions.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+CHILD = r"""
+import json, resource, time
+t0 = time.perf_counter()
+import app_demo
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(app_demo.app)
+t2 = time.perf_counter()
+status = client.post("/submit", json={"input": "x=1&y=2 z"}).status_code
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "first_ml_request_s": t3 - t2,
+    "status": status,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Measure worker cold start and memory")
+    p.add_argument("--root", default=".", help="Checkout to measure")
+    p.add_argument("--runs", type=int, default=3)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    root = os.path.abspath(args.root)
+    env = dict(os.environ, PYTHONPATH=root)
+    runs = []
+    for _ in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD],
+            cwd=root,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    best = {k: min(r[k] for r in runs) for k in runs[0] if k != "status"}
+    print(f"root: {root}")
+    print(f"  import app_demo:     {best['import_s']:.3f} s")
+    print(f"  first ML request:    {best['first_ml_request_s']:.3f} s")
+    print(
+        f"  import + first req:  {best['import_s'] + best['first_ml_request_s']:.3f} s"
+    )
+    print(f"  peak RSS:            {best['max_rss_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
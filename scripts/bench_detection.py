@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_detection.py
+
+Micro-benchmark for detection_engine.detect_attack on the dataset/ corpora.
+Compares the original per-pattern re.search loop against the compiled
+single-pass RuleSet and reports mean per-request scan time, followed by the
+literal prefilter hit ratio per rule.
+"""
+
+import argparse
+import glob
+import json
+import re
+import time
+
+from detection_engine import RULESET, XSS_PATTERNS, SQLI_PATTERNS, detect_attack
+
+
+def detect_attack_legacy(user_input):
+    """Reference implementation: one re.search per raw pattern string."""
+    combined = " ".join(str(v) for v in user_input.values())
+    for pat in XSS_PATTERNS:
+        if re.search(pat, combined, re.IGNORECASE):
+            return {"is_malicious": True, "label": "XSS", "pattern": pat}
+    for pat in SQLI_PATTERNS:
+        if re.search(pat, combined, re.IGNORECASE):
+            return {"is_malicious": True, "label": "SQLi", "pattern": pat}
+    return {"is_malicious": False, "label": "benign", "pattern": None}
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Benchmark the regex detection engine")
+    p.add_argument(
+        "--corpora",
+        nargs="+",
+        default=sorted(glob.glob("dataset/waf_dataset_*.jsonl")),
+        help="JSONL files with an 'input' field",
+    )
+    p.add_argument("--repeat", type=int, default=5, help="Timing repetitions")
+    p.add_argument(
+        "--prefilter-corpus",
+        default="dataset/waf_dataset_benign.jsonl",
+        help="Corpus used for the per-rule prefilter report",
+    )
+    return p.parse_args()
+
+
+def load_inputs(path):
+    with open(path, "r") as f:
+        return [
+            {"body": json.loads(line)["input"], "query": {}}
+            for line in f
+            if line.strip()
+        ]
+
+
+def time_per_request(fn, inputs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in inputs:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(inputs) * 1e6  # µs per request
+
+
+def main():
+    args = parse_args()
+    print(
+        f"{'corpus':<40} {'n':>6} {'legacy µs':>10} {'compiled µs':>12} {'speedup':>8}"
+    )
+    for path in args.corpora:
+        inputs = load_inputs(path)
+        if not inputs:
+            continue
+
+        # Sanity check: both engines must agree on every payload
+        for item in inputs:
+            assert detect_attack(item) == detect_attack_legacy(item), item
+
+        legacy = time_per_request(detect_attack_legacy, inputs, args.repeat)
+        compiled = time_per_request(detect_attack, inputs, args.repeat)
+        print(
+            f"{path:<40} {len(inputs):>6} {legacy:>10.2f} {compiled:>12.2f} "
+            f"{legacy / compiled:>7.2f}x"
+        )
+
+    print_prefilter_report(args.prefilter_corpus)
+
+
+def print_prefilter_report(path):
+    inputs = load_inputs(path)
+    RULESET.reset_stats()
+    for item in inputs:
+        detect_attack(item)
+    stats = RULESET.prefilter_stats()
+
+    print(f"\nPrefilter report for {path} ({stats['scanned']} payloads)")
+    print(f"regex engine skipped entirely: {stats['skip_ratio']:.1%}")
+    print(f"{'label':<6} {'hit ratio':>9}  pattern")
+    for rule in stats["rules"]:
+        print(f"{rule['label']:<6} {rule['hit_ratio']:>9.1%}  {rule['pattern']}")
+
+
+if __name__ == "__main__":
+    main()
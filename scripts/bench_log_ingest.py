@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_log_ingest.py
+
+Dashboard data loading on a large synthetic alert log: the old full reload
+(json.loads per line + DataFrame) on every rerun vs log_ingest.AlertLog
+(first load, incremental refresh, filter change, memoized rerun).
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from log_ingest import AlertLog
+
+FILTERS = (["SQLi", "XSS"], ["ml", "regex"], ["High", "Medium"], (0.5, 1.0))
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Benchmark alert log ingestion")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--append", type=int, default=1000)
+    return p.parse_args()
+
+
+def write_alerts(path, rows, start=0):
+    rng = random.Random(start)
+    with open(path, "a", encoding="utf-8") as f:
+        for i in range(start, start + rows):
+            record = {
+                "timestamp": f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}T10:00:00",
+                "request_id": f"{i:032x}",
+                "path": "http://testserver/submit",
+                "method": "POST",
+                "client_ip": f"10.0.{i % 256}.{rng.randrange(256)}",
+                "user_agent": "bench",
+                "attack_type": rng.choice(("XSS", "SQLi", "benign")),
+                "pattern": None,
+                "explanation": "Detected <script>…</script>, a common XSS vector.",
+                "severity": rng.choice(("High", "Medium", "Low")),
+                "source": rng.choice(("regex", "ml")),
+                "confidence": round(rng.random(), 3),
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+def legacy_load(path):
+    with open(path, "r") as f:
+        lines = [line.strip() for line in f if line.strip()]
+    df = pd.DataFrame([json.loads(line) for line in lines])
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df["date"] = df["timestamp"].dt.date
+    return df
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "alerts.jsonl")
+        write_alerts(path, args.rows)
+        print(f"{args.rows:,} alerts, {os.path.getsize(path) / 1e6:.0f} MB")
+
+        print(
+            f"  legacy full reload (every rerun): {timed(lambda: legacy_load(path)):9.1f} ms"
+        )
+        log = AlertLog(path)
+        print(f"  AlertLog first load:              {timed(log.refresh):9.1f} ms")
+        print(f"  AlertLog rerun, nothing new:      {timed(log.refresh):9.1f} ms")
+        write_alerts(path, args.append, start=args.rows)
+        print(
+            f"  AlertLog rerun, {args.append} new lines:   {timed(log.refresh):9.1f} ms"
+        )
+
+        def filter_change():
+            log.filtered(*FILTERS)
+            log.summary(*FILTERS)
+
+        print(f"  filter change (filter + summary): {timed(filter_change):9.1f} ms")
+        print(f"  rerun with same filters (memo):   {timed(filter_change):9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
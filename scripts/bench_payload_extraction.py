@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_payload_extraction.py
+
+Benchmark for request body extraction: the old path (json.loads in the
+middleware for the "input" field, then json.loads again in the endpoint)
+versus payload_extraction.ParsedBody (one parse, every string leaf),
+with the stdlib decoder and with orjson when it is installed. Covers a
+small body, a large flat body and a deeply nested one.
+"""
+
+import argparse
+import json
+import time
+
+import payload_extraction
+from payload_extraction import ParsedBody
+
+
+def legacy_extract(raw):
+    # middleware: only "input" is inspected
+    try:
+        payload = json.loads(raw).get("input", "")
+    except Exception:
+        payload = raw.decode("utf-8", "ignore")
+    # endpoint: parses the same body again
+    try:
+        json.loads(raw)
+    except Exception:
+        pass
+    return payload
+
+
+def make_bodies():
+    small = {"input": "name=alice, note: see you at 10!"}
+    large = {
+        "input": "order #42: 2x coffee, 1x bagel.",
+        "items": [
+            {"sku": f"SKU-{i}", "qty": i % 5, "note": "extra hot, no sugar " * 4}
+            for i in range(450)
+        ],
+    }
+    nested = {"input": "leaf"}
+    for depth in range(30):
+        nested = {"level": depth, "tags": ["a", "b"], "child": nested}
+    return {
+        name: json.dumps(body).encode()
+        for name, body in (("small", small), ("large", large), ("nested", nested))
+    }
+
+
+def timeit(fn, raw, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(raw)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Benchmark request body extraction")
+    p.add_argument("--repeat", type=int, default=2000)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    fast = payload_extraction.orjson
+    print(f"orjson available: {fast is not None}")
+    print(
+        f"{'body':7} {'bytes':>8} {'legacy µs':>10} {'stdlib µs':>10} "
+        f"{'orjson µs':>10} {'leaves':>7}"
+    )
+    for name, raw in make_bodies().items():
+        repeat = max(1, args.repeat * 1000 // max(len(raw), 1000))
+        legacy = timeit(legacy_extract, raw, repeat)
+
+        payload_extraction.orjson = None
+        stdlib = timeit(ParsedBody, raw, repeat)
+        payload_extraction.orjson = fast
+        accelerated = timeit(ParsedBody, raw, repeat) if fast else float("nan")
+
+        parsed = ParsedBody(raw)
+        flag = " (truncated)" if parsed.truncated else ""
+        print(
+            f"{name:7} {len(raw):8d} {legacy:10.1f} {stdlib:10.1f} "
+            f"{accelerated:10.1f} {len(parsed.strings):7d}{flag}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_report.py
+
+Report generation on growing synthetic alert logs: the old approach (every
+alert loaded into a list) vs the single-pass ReportStats aggregation. Prints
+time and peak traced memory of the aggregation step for each log size.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from report_generator import ReportStats, iter_jsonl
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Benchmark streaming report aggregation")
+    p.add_argument("--rows", type=int, nargs="+", default=[100_000, 400_000])
+    p.add_argument("--ips", type=int, default=50_000)
+    return p.parse_args()
+
+
+def write_alerts(path, rows, ips):
+    rng = random.Random(0)
+    start = datetime(2026, 1, 1)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(rows):
+            record = {
+                "timestamp": (start + timedelta(seconds=i * 7)).isoformat(),
+                "request_id": f"{i:032x}",
+                "path": "http://testserver/submit",
+                "method": "POST",
+                "client_ip": f"10.{rng.randrange(ips) // 65536}.{rng.randrange(256)}"
+                f".{int(rng.paretovariate(1.2)) % 256}",
+                "user_agent": "bench",
+                "attack_type": rng.choice(("XSS", "SQLi")),
+                "pattern": rng.choice(("<script>", "union select", None)),
+                "explanation": "Detected <script>…</script>, a common XSS vector.",
+                "severity": rng.choice(("High", "Medium", "Low")),
+                "source": rng.choice(("regex", "ml")),
+                "confidence": round(rng.random(), 3),
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+def legacy(path):
+    with open(path, "r") as f:
+        alerts = [json.loads(line) for line in f if line.strip()]
+    return len(alerts)
+
+
+def streaming(path):
+    stats = ReportStats()
+    for alert, timestamp in iter_jsonl(path):
+        stats.add(alert, timestamp)
+    return stats.total
+
+
+def measure(fn, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "alerts.jsonl")
+        for rows in args.rows:
+            write_alerts(path, rows, args.ips)
+            print(f"{rows:,} alerts, {os.path.getsize(path) / 1e6:.0f} MB")
+            for name, fn in (("legacy list", legacy), ("ReportStats", streaming)):
+                elapsed, peak = measure(fn, path)
+                print(f"  {name:12s} {elapsed:7.2f} s   peak {peak:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_rollups.py
+
+Summaries of a synthetic alert history from alert_rollups vs scanning the
+JSONL log (report_generator's streaming pass), plus the cost of keeping the
+rollups up to date (per alert) and of persisting / compacting them.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from alert_rollups import Rollups
+from report_generator import ReportStats, iter_jsonl
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Benchmark alert rollups")
+    p.add_argument("--days", type=int, default=30)
+    p.add_argument("--per-day", type=int, default=10_000)
+    p.add_argument("--persist-every", type=int, default=1000, help="alerts")
+    return p.parse_args()
+
+
+def history(days, per_day):
+    rng = random.Random(0)
+    start = datetime.utcnow() - timedelta(days=days)
+    for i in range(days * per_day):
+        yield {
+            "timestamp": (start + timedelta(seconds=i * 86400 / per_day)).isoformat(),
+            "client_ip": f"10.0.{rng.randrange(64)}.{rng.randrange(256)}",
+            "attack_type": rng.choice(("XSS", "SQLi", "benign")),
+            "severity": rng.choice(("High", "Medium", "Low")),
+            "source": rng.choice(("regex", "ml")),
+            "explanation": "Detected <script>…</script>, a common XSS vector.",
+        }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "alerts.jsonl")
+        rollups = Rollups(os.path.join(tmp, "rollups"))
+        add_ms = persist_ms = 0.0
+        batch = []
+        with open(log_path, "w", encoding="utf-8") as log:
+            for i, alert in enumerate(history(args.days, args.per_day), 1):
+                log.write(json.dumps(alert) + "\n")
+                batch.append(alert)
+                if len(batch) == 256:  # the writer thread's batch size
+                    add_ms += timed(lambda: rollups.add(batch))[0]
+                    batch = []
+                if i % args.persist_every == 0:
+                    persist_ms += timed(rollups.persist)[0]
+            rollups.add(batch)
+        persist_ms += timed(rollups.persist)[0]
+        rows = args.days * args.per_day
+        print(
+            f"{rows:,} alerts over {args.days} days "
+            f"({os.path.getsize(log_path) / 1e6:.0f} MB JSONL), "
+            f"{rollups.deltas_written} deltas, {rollups.compactions} compactions"
+        )
+        print(f"  add():     {add_ms * 1000 / rows:7.2f} µs/alert (writer thread)")
+        print(
+            f"  persist(): {persist_ms / rollups.deltas_written:7.2f} ms/delta "
+            "(compactions included)"
+        )
+
+        reader = Rollups(rollups.root)
+        ms, summary = timed(lambda: reader.summary("day"))
+        print(f"  summary, all days, cold:        {ms:9.1f} ms ({summary['total']:,})")
+        ms, _ = timed(lambda: reader.summary("day"))
+        print(f"  summary, all days, warm:        {ms:9.1f} ms")
+        since = datetime.utcnow() - timedelta(hours=48)
+        ms, _ = timed(lambda: reader.summary("hour", since))
+        print(f"  summary, last 48 h hourly:      {ms:9.1f} ms")
+        rollups.add(list(history(1, args.persist_every)))
+        rollups.persist()
+        ms, _ = timed(lambda: reader.summary("day"))
+        print(f"  summary after one more delta:   {ms:9.1f} ms")
+
+        def scan():
+            stats = ReportStats()
+            for alert, timestamp in iter_jsonl(log_path):
+                stats.add(alert, timestamp)
+            return stats
+
+        ms, stats = timed(scan)
+        print(f"  JSONL scan (ReportStats):       {ms:9.1f} ms ({stats.total:,})")
+
+
+if __name__ == "__main__":
+    main()
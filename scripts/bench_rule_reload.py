@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_rule_reload.py
+
+Cost of a rule bundle hot reload: compiling the bundle into a RuleSet and
+swapping it into a RuleRegistry, for the shipped bundle and for larger
+synthetic ones (the shipped rules plus keyword rules).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+
+from detection_engine import RULES_PATH
+from rule_registry import RuleRegistry
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Benchmark rule bundle reloads")
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    return p.parse_args()
+
+
+def synthetic_bundle(path, extra):
+    with open(RULES_PATH, encoding="utf-8") as f:
+        bundle = json.load(f)
+    for i in range(extra):
+        bundle["rules"].append(
+            {
+                "id": f"kw-{i}",
+                "label": "SQLi",
+                "severity": "Medium",
+                "pattern": rf"(?i)\bkeyword{i}\b\s*\(",
+                "explanation": f"Detected keyword{i}(.",
+            }
+        )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(bundle, f)
+
+
+def measure(path, repeat):
+    registry = RuleRegistry(path, check_interval=-1)
+    compile_ms, swap_ms = [], []
+    for _ in range(repeat):
+        registry.reload()
+        compile_ms.append(registry.last_compile_ms)
+        swap_ms.append(registry.last_swap_ms)
+    return len(registry.current()), statistics.median(compile_ms), max(swap_ms)
+
+
+def main():
+    args = parse_args()
+    print(f"{'bundle':>10} {'rules':>6} {'compile ms':>11} {'swap ms (max)':>14}")
+    n, comp, swap = measure(RULES_PATH, args.repeat)
+    print(f"{'shipped':>10} {n:6d} {comp:11.2f} {swap:14.4f}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"rules_{size}.json")
+            synthetic_bundle(path, size)
+            n, comp, swap = measure(path, max(1, args.repeat // 4))
+            print(f"{'synthetic':>10} {n:6d} {comp:11.2f} {swap:14.4f}")
+
+
+if __name__ == "__main__":
+    main()
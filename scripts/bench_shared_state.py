@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_shared_state.py
+
+Per-process vs shared (memory-mapped) WAF state across worker processes:
+  1. cross-worker verdict hit rate: a scanner repeats a set of payloads,
+     load-balanced round-robin over N worker processes
+  2. lookup overhead of a verdict / reputation check in one process
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import timeit
+
+from client_reputation import ClientReputation
+from shared_state import SharedClientReputation, SharedVerdictCache
+from verdict_cache import VerdictCache
+
+VERDICT = {
+    "result": {
+        "is_malicious": True,
+        "label": "XSS",
+        "pattern": "<script.*?>.*?</script>",
+        "rule_id": "xss-script-tag",
+        "rule_severity": "High",
+        "detection_source": "regex",
+        "confidence": 1.0,
+    },
+    "explanation": "Detected <script>…</script>, a common XSS vector.",
+    "severity": "High",
+}
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Benchmark cross-worker shared state")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--payloads", type=int, default=997)
+    p.add_argument("--requests", type=int, default=20_000)
+    p.add_argument("--number", type=int, default=50_000)
+    return p.parse_args()
+
+
+def make_cache(path):
+    return SharedVerdictCache(path) if path else VerdictCache()
+
+
+def worker(index, args, path, results):
+    cache = make_cache(path)
+    hits = 0
+    for i in range(index, args.requests, args.workers):
+        key = cache.key(f"payload-{i % args.payloads}", {}, "rules", "model")
+        if cache.get(key) is None:
+            cache.put(key, VERDICT)
+        else:
+            hits += 1
+    results.put(hits)
+
+
+def hit_rate(args, path):
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(i, args, path, results))
+        for i in range(args.workers)
+    ]
+    for p in procs:
+        p.start()
+    hits = sum(results.get() for _ in procs)
+    for p in procs:
+        p.join()
+    return hits / args.requests
+
+
+def per_call_us(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        verdicts = os.path.join(tmp, "verdicts.shm")
+        print(
+            f"{args.requests} requests, {args.payloads} distinct payloads, "
+            f"{args.workers} workers (round-robin)"
+        )
+        print(f"  per-process caches: hit rate {hit_rate(args, None):.1%}")
+        print(f"  shared table:       hit rate {hit_rate(args, verdicts):.1%}")
+
+        local, shared = VerdictCache(), SharedVerdictCache(verdicts + ".2")
+        key = local.key("payload", {}, "rules", "model")
+        local.put(key, VERDICT)
+        shared.put(key, VERDICT)
+
+        def shared_tier_hit():
+            shared._entries.clear()  # force the lookup past the local tier
+            shared.get(key)
+
+        rep_local = ClientReputation()
+        rep_shared = SharedClientReputation(os.path.join(tmp, "reputation.shm"))
+        rep_local.record_block("10.0.0.1")
+        rep_shared.record_block("10.0.0.1")
+
+        n = args.number
+        print("lookup overhead (µs per call)")
+        rows = [
+            ("verdict, per-process dict", lambda: local.get(key)),
+            ("verdict, shared (local tier)", lambda: shared.get(key)),
+            ("verdict, shared (mmap tier)", shared_tier_hit),
+            ("  of which SharedTable.get", lambda: shared.shared.get(key)),
+            ("reputation, per-process", lambda: rep_local.is_banned("10.0.0.1")),
+            ("reputation, shared", lambda: rep_shared.is_banned("10.0.0.1")),
+            ("record_block, per-process", lambda: rep_local.record_block("10.0.0.2")),
+            ("record_block, shared", lambda: rep_shared.record_block("10.0.0.2")),
+        ]
+        for name, stmt in rows:
+            print(f"  {name:<30} {per_call_us(stmt, n):7.2f}")
+
+
+if __name__ == "__main__":
+    main()
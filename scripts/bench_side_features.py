@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_side_features.py
+
+Benchmark for SideChannelFeatures: the original per-text Counter loop
+versus the current transformer, on the full training set and on
+single-payload calls. Also checks the two agree bit for bit.
+"""
+
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from scripts.feature_utils import SideChannelFeatures
+
+
+def transform_legacy(X):
+    feats = []
+    for text in X:
+        length = len(text)
+        special = sum(1 for c in text if not c.isalnum() and not c.isspace())
+        ratio = special / length if length else 0.0
+
+        counts = np.array(list(Counter(text).values()), dtype=float)
+        probs = counts / counts.sum() if counts.sum() else np.array([0.0])
+        entropy = -np.sum(probs * np.log2(probs + 1e-9))
+
+        feats.append([length, special, ratio, entropy])
+    return np.array(feats)
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Benchmark SideChannelFeatures")
+    p.add_argument("--train-file", default="dataset/train/waf_dataset_train.jsonl")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--singles", type=int, default=2000)
+    return p.parse_args()
+
+
+def best_of(repeat, fn):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    args = parse_args()
+    texts = pd.read_json(args.train_file, lines=True)["input"].tolist()
+    singles = texts[: args.singles]
+    current = SideChannelFeatures().transform
+
+    assert np.array_equal(transform_legacy(texts), current(texts))
+    assert np.array_equal(transform_legacy(singles[:50]), current(singles[:50]))
+
+    print(f"{'':10} {'batch (' + str(len(texts)) + ' rows)':>20} {'single':>12}")
+    for name, fn in (("legacy", transform_legacy), ("current", current)):
+        batch = best_of(args.repeat, lambda: fn(texts))
+        single = best_of(args.repeat, lambda: [fn([t]) for t in singles])
+        print(
+            f"{name:10} {batch * 1000:17.1f} ms "
+            f"{single / len(singles) * 1e6:9.1f} µs"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+scripts/bulk_scan.py
+
+Offline re-scan of archived traffic with the WAF's decision logic
+(allow-list → regex rules → ML → threat scoring), without HTTP:
+
+  PYTHONPATH=. python scripts/bulk_scan.py corpus.jsonl -o verdicts.jsonl
+  PYTHONPATH=. python scripts/bulk_scan.py access.log -o verdicts.parquet
+
+Inputs are JSONL (the payload is the --field of each record; objects and
+arrays are inspected by their string leaves, as for JSON bodies) or plain
+text (one payload per line). The file is split into byte ranges on line
+boundaries, and each worker process reads its own ranges from disk.
+Workers load the rules and model once, and score the ML stage in batches.
+At most two ranges per worker are in flight, and verdicts are written as
+each range completes, in input order, so memory stays constant whatever
+the input size. Each verdict records the byte offset of its line.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter, deque
+
+from ml_inference import predict_batch
+from model_registry import get_model
+from payload_extraction import LEAF_SEPARATOR, json_loads, string_leaves
+from rule_registry import get_rules
+from threat_scoring import score_threat
+from waf_middleware import (
+    ALLOWLIST_RE,
+    ML_CASCADE_BAND,
+    ml_result,
+    regex_result,
+)
+
+FIELDS = (
+    "offset",
+    "label",
+    "is_malicious",
+    "detection_source",
+    "confidence",
+    "severity",
+    "rule_id",
+    "pattern",
+    "model_version",
+    "payload",
+)
+
+_options = None  # per-worker copy of the parsed arguments
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser("Scan JSONL or text files with the WAF pipeline")
+    p.add_argument("input", help="JSONL or text file")
+    p.add_argument(
+        "-o", "--output", required=True, help="verdicts: .jsonl, or .parquet"
+    )
+    p.add_argument(
+        "--format",
+        choices=("auto", "jsonl", "text"),
+        default="auto",
+        help="input format (auto: jsonl for .jsonl/.ndjson, else text)",
+    )
+    p.add_argument("--field", default="input", help="JSONL payload field")
+    p.add_argument("--query-field", help="JSONL field with query parameters")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--chunk-mb", type=float, default=8.0, help="range size")
+    p.add_argument("--no-ml", action="store_true", help="regex stage only")
+    p.add_argument("--ml-batch", type=int, default=256)
+    p.add_argument("--all", action="store_true", help="write benign verdicts too")
+    p.add_argument(
+        "--payload-chars",
+        type=int,
+        default=200,
+        help="payload prefix kept per verdict (0: none)",
+    )
+    p.add_argument("--progress", type=float, default=2.0, help="seconds (0: off)")
+    args = p.parse_args(argv)
+    if args.format == "auto":
+        ext = os.path.splitext(args.input)[1].lower()
+        args.format = "jsonl" if ext in (".jsonl", ".ndjson") else "text"
+    return args
+
+
+# ─── Input ─────────────────────────────────────────────────────────────────────
+def chunk_ranges(path, chunk_bytes):
+    """(start, end) byte ranges of `path`, each ending on a line boundary."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            yield start, end
+            start = end
+
+
+def parse_line(line, options):
+    """(payload, query) for one input line; payload None if there is none."""
+    if options.format == "text":
+        return line.decode("utf-8", "replace").rstrip("\r\n"), {}
+    record = json_loads(line)
+    if not isinstance(record, dict):
+        return None, {}
+    value = record.get(options.field)
+    if isinstance(value, (dict, list)):
+        leaves, truncated = string_leaves(value)
+        value = json.dumps(value) if truncated else LEAF_SEPARATOR.join(leaves)
+    elif value is not None and not isinstance(value, str):
+        value = str(value)
+    query = record.get(options.query_field) if options.query_field else None
+    if isinstance(query, dict):
+        query = {str(k): str(v) for k, v in query.items()}
+    else:
+        query = {}
+    return value, query
+
+
+# ─── Workers ───────────────────────────────────────────────────────────────────
+def init_worker(options):
+    global _options
+    _options = options
+    # Load once per worker, not per range
+    get_rules()
+    if not options.no_ml:
+        get_model()
+
+
+def analyze(records, use_ml, ml_batch):
+    """
+    Verdict results for [(offset, payload, query)], the same decisions as
+    WAFEngine: allow-list, then regex, then ML for what regex let through.
+    """
+    rules = get_rules()
+    results = []
+    pending = []  # indexes still to be scored by ML
+    for _, payload, query in records:
+        if ALLOWLIST_RE.fullmatch(payload):
+            result = {
+                "label": "benign",
+                "is_malicious": False,
+                "detection_source": "allowlist",
+                "confidence": 1.0,
+            }
+        else:
+            result = regex_result(payload, query, rules)
+            if use_ml and not result["is_malicious"]:
+                pending.append(len(results))
+        results.append(result)
+
+    for i in range(0, len(pending), ml_batch):
+        batch = pending[i : i + ml_batch]
+        model = get_model()
+        payloads = [records[j][1] for j in batch]
+        # Same cascade routing as WAFEngine's default ml_cascade_band
+        predictions = predict_batch(model.pipeline, payloads, ML_CASCADE_BAND)
+        for j, prediction in zip(batch, predictions):
+            prediction["model_version"] = model.version
+            results[j] = ml_result(prediction)
+    return results
+
+
+def scan_range(job):
+    """Scan the lines in one byte range; returns (rows, counts)."""
+    path, start, end = job
+    options = _options
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    counts = Counter(bytes=end - start)
+    records = []
+    offset = start
+    for line in data.splitlines(keepends=True):
+        line_offset, offset = offset, offset + len(line)
+        if not line.strip():
+            continue
+        try:
+            payload, query = parse_line(line, options)
+        except (ValueError, RecursionError):
+            counts["errors"] += 1
+            continue
+        if payload is None:
+            counts["skipped"] += 1
+            continue
+        records.append((line_offset, payload, query))
+    counts["records"] = len(records)
+
+    rows = []
+    results = analyze(records, not options.no_ml, options.ml_batch)
+    for (line_offset, payload, _), result in zip(records, results):
+        malicious = result["is_malicious"]
+        if malicious:
+            counts["malicious"] += 1
+            counts["label:" + result["label"]] += 1
+        elif not options.all:
+            continue
+        rows.append(
+            {
+                "offset": line_offset,
+                "label": result["label"],
+                "is_malicious": malicious,
+                "detection_source": result["detection_source"],
+                "confidence": float(result["confidence"]),
+                "severity": score_threat(result, payload) if malicious else None,
+                "rule_id": result.get("rule_id"),
+                "pattern": result.get("pattern"),
+                "model_version": result.get("model_version"),
+                "payload": payload[: options.payload_chars] or None,
+            }
+        )
+    return rows, counts
+
+
+# ─── Output ────────────────────────────────────────────────────────────────────
+class JsonlWriter:
+    def __init__(self, path):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, rows):
+        self._file.writelines(json.dumps(row) + "\n" for row in rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    # One row group per scanned range
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.schema = pa.schema(
+            [
+                ("offset", pa.int64()),
+                ("label", pa.string()),
+                ("is_malicious", pa.bool_()),
+                ("detection_source", pa.string()),
+                ("confidence", pa.float64()),
+                ("severity", pa.string()),
+                ("rule_id", pa.string()),
+                ("pattern", pa.string()),
+                ("model_version", pa.string()),
+                ("payload", pa.string()),
+            ]
+        )
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        if rows:
+            table = self._pa.Table.from_pylist(rows, schema=self.schema)
+            self._writer.write_table(table)
+
+    def close(self):
+        self._writer.close()
+
+
+def open_writer(path):
+    if path.endswith(".parquet"):
+        return ParquetWriter(path)
+    return JsonlWriter(path)
+
+
+# ─── Driver ────────────────────────────────────────────────────────────────────
+def scan(options):
+    """Scan options.input into options.output; returns the summed counts."""
+    total_bytes = os.path.getsize(options.input)
+    chunk_bytes = max(1, int(options.chunk_mb * 1024 * 1024))
+    jobs = (
+        (options.input, start, end)
+        for start, end in chunk_ranges(options.input, chunk_bytes)
+    )
+    totals = Counter()
+    started = last_report = time.perf_counter()
+
+    def consume(rows, counts):
+        nonlocal last_report
+        writer.write(rows)
+        totals.update(counts)
+        now = time.perf_counter()
+        if options.progress and now - last_report >= options.progress:
+            last_report = now
+            elapsed = now - started
+            print(
+                f"\r{totals['bytes'] / max(total_bytes, 1):6.1%}  "
+                f"{totals['records']:,} records  "
+                f"{totals['records'] / elapsed:,.0f} rec/s  "
+                f"{totals['bytes'] / elapsed / 1e6:.1f} MB/s  "
+                f"{totals['malicious']:,} malicious",
+                end="",
+                file=sys.stderr,
+                flush=True,
+            )
+
+    writer = open_writer(options.output)
+    try:
+        if options.workers <= 1:
+            init_worker(options)
+            for job in jobs:
+                consume(*scan_range(job))
+        else:
+            ctx = multiprocessing.get_context("fork")
+            with ctx.Pool(options.workers, init_worker, (options,)) as pool:
+                inflight = deque()
+                for job in jobs:
+                    inflight.append(pool.apply_async(scan_range, (job,)))
+                    if len(inflight) >= 2 * options.workers:
+                        consume(*inflight.popleft().get())
+                while inflight:
+                    consume(*inflight.popleft().get())
+    finally:
+        writer.close()
+    if options.progress:
+        print(file=sys.stderr)
+    totals["seconds"] = time.perf_counter() - started
+    return totals
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    totals = scan(options)
+    seconds = totals["seconds"]
+    print(
+        f"Scanned {totals['records']:,} records ({totals['bytes'] / 1e6:.1f} MB) "
+        f"in {seconds:.1f}s: {totals['records'] / seconds:,.0f} rec/s, "
+        f"{totals['bytes'] / seconds / 1e6:.1f} MB/s"
+    )
+    labels = {k[6:]: v for k, v in totals.items() if k.startswith("label:")}
+    print(f"Malicious: {totals['malicious']:,} {labels}")
+    if totals["skipped"] or totals["errors"]:
+        print(
+            f"Skipped {totals['skipped']:,} records without a payload, "
+            f"{totals['errors']:,} unparsable lines"
+        )
+    print(f"Verdicts written to {options.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+scripts/compare_feature_modes.py
+
+Side-by-side report for the two text feature modes of the training script
+("vocab": fitted TF-IDF vocabularies, "hashing": hashed n-grams with IDF
+arrays). Each pipeline is fitted on the train set and evaluated on the test
+set. The pickled model and its memory-mappable export (model_artifact.py)
+are then each loaded in a fresh interpreter to measure the resident memory
+they add and single-payload prediction latency.
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import joblib
+import pandas as pd
+from sklearn.metrics import f1_score, roc_auc_score
+
+from model_artifact import export_pipeline
+from scripts.train_attack_classifier import build_pipeline
+
+CHILD = r"""
+import json, os, sys, time
+import joblib, numpy, scipy.sparse, sklearn.ensemble, sklearn.feature_extraction.text
+from scripts import feature_utils
+from model_artifact import load_artifact
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+payloads = json.loads(sys.stdin.read())
+loader = joblib.load if sys.argv[1].endswith(".pkl") else load_artifact
+before = rss_mb()
+pipeline = loader(sys.argv[1])
+pipeline.predict_proba(payloads[:1])  # warm-up
+start = time.perf_counter()
+for p in payloads:
+    pipeline.predict_proba([p])
+elapsed = time.perf_counter() - start
+after = rss_mb()  # mmap pages count once they have been touched
+print(json.dumps({
+    "model_rss_mb": after - before,
+    "latency_ms": elapsed / len(payloads) * 1000,
+}))
+"""
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Compare vocabulary vs hashing text features")
+    p.add_argument("--train-file", default="dataset/train/waf_dataset_train.jsonl")
+    p.add_argument("--test-file", default="dataset/test/waf_dataset_test.jsonl")
+    p.add_argument("--hash-bits", type=int, default=16)
+    p.add_argument("--latency-payloads", type=int, default=300)
+    p.add_argument("--random-state", type=int, default=42)
+    p.add_argument("--n-jobs", type=int, default=-1)
+    return p.parse_args()
+
+
+def measure_in_child(model_path, payloads):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, model_path],
+        input=json.dumps(payloads),
+        env=dict(os.environ, PYTHONPATH=os.getcwd()),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    train_df = pd.read_json(args.train_file, lines=True)
+    test_df = pd.read_json(args.test_file, lines=True)
+    payloads = test_df["input"].tolist()[: args.latency_payloads]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("vocab", "hashing"):
+            logging.info(f"Fitting {mode} pipeline")
+            pipeline = build_pipeline(
+                mode, args.hash_bits, args.random_state, args.n_jobs
+            )
+            start = time.perf_counter()
+            pipeline.fit(train_df["input"], train_df["label"])
+            fit_s = time.perf_counter() - start
+
+            y_pred = pipeline.predict(test_df["input"])
+            y_proba = pipeline.predict_proba(test_df["input"])
+            path = os.path.join(tmp, f"{mode}.pkl")
+            joblib.dump(pipeline, path)
+            artifact = os.path.join(tmp, mode)
+            export_pipeline(pipeline, artifact)
+            pickled = measure_in_child(path, payloads)
+            mapped = measure_in_child(artifact, payloads)
+            rows.append(
+                {
+                    "mode": mode,
+                    "f1_macro": f1_score(test_df["label"], y_pred, average="macro"),
+                    "roc_auc": roc_auc_score(
+                        pd.get_dummies(test_df["label"]), y_proba, average="macro"
+                    ),
+                    "fit_s": fit_s,
+                    "pickle_mb": os.path.getsize(path) / 2**20,
+                    "pickle_rss_mb": pickled["model_rss_mb"],
+                    "pickle_ms": pickled["latency_ms"],
+                    "mmap_rss_mb": mapped["model_rss_mb"],
+                    "mmap_ms": mapped["latency_ms"],
+                }
+            )
+
+    print(
+        f"{'':8} {'':9} {'':8} {'':7} {'':10} "
+        f"{'-- pickle --':>19} {'-- mmap artifact --':>19}"
+    )
+    print(
+        f"{'mode':8} {'F1 macro':>9} {'ROC AUC':>8} {'fit s':>7} {'pickle MB':>10} "
+        f"{'RSS MB':>8} {'ms/req':>10} {'RSS MB':>8} {'ms/req':>10}"
+    )
+    for r in rows:
+        print(
+            f"{r['mode']:8} {r['f1_macro']:9.4f} {r['roc_auc']:8.4f} "
+            f"{r['fit_s']:7.1f} {r['pickle_mb']:10.1f} "
+            f"{r['pickle_rss_mb']:8.1f} {r['pickle_ms']:10.2f} "
+            f"{r['mmap_rss_mb']:8.1f} {r['mmap_ms']:10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
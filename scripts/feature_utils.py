@@ -2,16 +2,54 @@
 """
 feature_utils.py
 
-Defines a transformer extracting side-channel stats from text:
+Custom transformers for the attack classifier.
+
+SideChannelFeatures extracts side-channel stats from text:
   - length of input
   - special/non-alphanumeric char count
   - ratio of special chars
   - Shannon entropy of character distribution
+
+Batches are featurized with array operations over the code points of all
+texts at once; small batches (where NumPy call overhead dominates) go
+through a per-text path. Both produce bit-identical results.
+
+HashingTfidfVectorizer is the vocabulary-free TF-IDF behind the training
+script's `--features hashing` mode.
 """
 
 import numpy as np
 from collections import Counter
 from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from sklearn.utils.validation import check_is_fitted
+
+# Batches smaller than this use the per-text path
+VECTORIZE_MIN_ROWS = 24
+
+# Code points are packed with their row index into one int64 sort key
+_CP_BITS = 21
+
+# "special" = neither alphanumeric nor whitespace; table for ASCII,
+# computed (and memoised) per character beyond that
+_SPECIAL_ASCII = np.array(
+    [not chr(c).isalnum() and not chr(c).isspace() for c in range(128)]
+)
+_special_cache = {}
+
+
+def _is_special(char):
+    special = _special_cache.get(char)
+    if special is None:
+        special = _special_cache[char] = not char.isalnum() and not char.isspace()
+    return special
+
+
+def _entropy(counts):
+    # Same expression (and summation order) for both paths
+    probs = counts / counts.sum() if counts.sum() else np.array([0.0])
+    return -np.sum(probs * np.log2(probs + 1e-9), axis=-1)
 
 
 class SideChannelFeatures(BaseEstimator, TransformerMixin):
@@ -19,15 +57,126 @@ class SideChannelFeatures(BaseEstimator, TransformerMixin):
         return self
 
     def transform(self, X):
-        feats = []
-        for text in X:
-            length = len(text)
-            special = sum(1 for c in text if not c.isalnum() and not c.isspace())
-            ratio = special / length if length else 0.0
-
-            counts = np.array(list(Counter(text).values()), dtype=float)
-            probs = counts / counts.sum() if counts.sum() else np.array([0.0])
-            entropy = -np.sum(probs * np.log2(probs + 1e-9))
-
-            feats.append([length, special, ratio, entropy])
-        return np.array(feats)
+        texts = list(X)
+        if len(texts) < VECTORIZE_MIN_ROWS:
+            return np.array([self._features(text) for text in texts])
+        return self._batch_features(texts)
+
+    @staticmethod
+    def _features(text):
+        length = len(text)
+        counts = Counter(text)
+        special = sum(n for c, n in counts.items() if _is_special(c))
+        ratio = special / length if length else 0.0
+        entropy = _entropy(np.array(list(counts.values()), dtype=float))
+        return [length, special, ratio, entropy]
+
+    @staticmethod
+    def _batch_features(texts):
+        n = len(texts)
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=n)
+        code_points = np.frombuffer(
+            "".join(texts).encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+        )
+        rows = np.repeat(np.arange(n, dtype=np.int64), lengths)
+
+        # Distinct (row, char) pairs with counts, in first-occurrence order
+        # within each row (the order Counter would produce)
+        keys, first, counts = np.unique(
+            (rows << _CP_BITS) | code_points, return_index=True, return_counts=True
+        )
+        order = np.argsort(first, kind="stable")
+        keys, counts = keys[order], counts[order]
+        key_rows = keys >> _CP_BITS
+        key_chars = keys & ((1 << _CP_BITS) - 1)
+
+        special_flag = np.zeros(len(keys), dtype=bool)
+        ascii_chars = key_chars < 128
+        special_flag[ascii_chars] = _SPECIAL_ASCII[key_chars[ascii_chars]]
+        if not ascii_chars.all():
+            others = ~ascii_chars
+            distinct, inverse = np.unique(key_chars[others], return_inverse=True)
+            flags = np.array([_is_special(chr(c)) for c in distinct.tolist()])
+            special_flag[others] = flags[inverse]
+        special = np.bincount(
+            key_rows, weights=counts * special_flag, minlength=n
+        ).astype(np.int64)
+
+        ratio = np.zeros(n)
+        nonempty = lengths > 0
+        ratio[nonempty] = special[nonempty] / lengths[nonempty]
+
+        # Entropy row-wise, grouping rows by their number of distinct chars
+        distinct_per_row = np.bincount(key_rows, minlength=n)
+        starts = np.cumsum(distinct_per_row) - distinct_per_row
+        entropy = np.zeros(n)
+        for k in np.unique(distinct_per_row[nonempty]):
+            sel = np.flatnonzero(distinct_per_row == k)
+            block = counts[starts[sel][:, None] + np.arange(k)].astype(float)
+            probs = block / lengths[sel][:, None].astype(float)
+            entropy[sel] = -np.sum(probs * np.log2(probs + 1e-9), axis=1)
+
+        return np.column_stack([lengths, special, ratio, entropy]).astype(float)
+
+
+class HashingTfidfVectorizer(BaseEstimator, TransformerMixin):
+    """
+    TF-IDF over hashed n-grams, a vocabulary-free alternative to
+    TfidfVectorizer. N-grams are hashed into `n_features` buckets
+    (murmurhash3, as in sklearn's HashingVectorizer), so memory is one
+    fixed-width IDF array and lookups need no dict.
+
+    Document frequencies can be accumulated in chunks with partial_fit().
+    Weighting matches TfidfVectorizer's defaults: raw counts, smoothed IDF,
+    l2 normalisation.
+    """
+
+    def __init__(
+        self,
+        analyzer="word",
+        ngram_range=(1, 1),
+        n_features=2**16,
+        lowercase=True,
+        token_pattern=r"(?u)\b\w\w+\b",
+    ):
+        self.analyzer = analyzer
+        self.ngram_range = ngram_range
+        self.n_features = n_features
+        self.lowercase = lowercase
+        self.token_pattern = token_pattern
+
+    def _hasher(self):
+        hasher = getattr(self, "hasher_", None)
+        if hasher is None:
+            hasher = self.hasher_ = HashingVectorizer(
+                analyzer=self.analyzer,
+                ngram_range=self.ngram_range,
+                n_features=self.n_features,
+                lowercase=self.lowercase,
+                token_pattern=self.token_pattern,
+                alternate_sign=False,
+                norm=None,
+            )
+        return hasher
+
+    def fit(self, X, y=None):
+        for attr in ("hasher_", "df_", "n_docs_", "idf_"):
+            self.__dict__.pop(attr, None)
+        return self.partial_fit(X)
+
+    def partial_fit(self, X, y=None):
+        counts = self._hasher().transform(X)
+        if not hasattr(self, "df_"):
+            self.df_ = np.zeros(self.n_features, dtype=np.int64)
+            self.n_docs_ = 0
+        # Rows have unique column indices, so this counts documents
+        self.df_ += np.bincount(counts.indices, minlength=self.n_features)
+        self.n_docs_ += counts.shape[0]
+        self.idf_ = np.log((1 + self.n_docs_) / (1 + self.df_)) + 1.0
+        return self
+
+    def transform(self, X):
+        check_is_fitted(self, "idf_")
+        counts = self._hasher().transform(X)
+        counts.data *= self.idf_[counts.indices]
+        return normalize(counts, norm="l2", copy=False)
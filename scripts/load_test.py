@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+scripts/load_test.py
+
+HTTP load test comparing the two WAF middleware implementations
+(app_demo.create_app("base" | "asgi")). Each one is served by uvicorn in a
+child process and hit with concurrent POST /submit requests (a mix of
+benign, XSS and SQLi payloads); reports requests/s and latency
+percentiles.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+SERVER = r"""
+import sys
+import uvicorn
+import app_demo
+from waf_middleware import set_ml_mode
+set_ml_mode(sys.argv[2])
+uvicorn.run(app_demo.create_app(sys.argv[1]), host="127.0.0.1",
+            port=int(sys.argv[3]), log_level="warning", access_log=False)
+"""
+
+PAYLOADS = [
+    "name=alice, note: see you at 10!",
+    "order #{i}: 2x coffee, 1x bagel.",
+    "search?q=blue+shoes&page={i}",
+    "<script>alert({i})</script>",
+    "1' OR '1'='1' -- {i}",
+    "SELECT * FROM users WHERE id={i}",
+]
+
+
+def parse_args():
+    p = argparse.ArgumentParser("Load test the WAF middleware implementations")
+    p.add_argument("--requests", type=int, default=3000)
+    p.add_argument("--concurrency", type=int, default=32)
+    p.add_argument(
+        "--ml-mode",
+        default="off",
+        help="ML mode of the served app (off isolates the middleware cost)",
+    )
+    p.add_argument(
+        "--body-kb", type=int, default=0, help="Pad each JSON body by this many KB"
+    )
+    p.add_argument("--impl", nargs="+", default=["base", "asgi"])
+    return p.parse_args()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(port, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def run_load(port, n_requests, concurrency, padding):
+    latencies = []
+    statuses = {}
+    counter = iter(range(n_requests))
+
+    async def worker(client):
+        for i in counter:
+            body = {"input": PAYLOADS[i % len(PAYLOADS)].format(i=i), "pad": padding}
+            start = time.perf_counter()
+            res = await client.post("/submit", json=body)
+            latencies.append(time.perf_counter() - start)
+            statuses[res.status_code] = statuses.get(res.status_code, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30.0
+    ) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return elapsed, np.array(latencies), statuses
+
+
+def main():
+    args = parse_args()
+    padding = "x" * (args.body_kb * 1024)
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+
+    print(
+        f"{args.requests} requests, concurrency {args.concurrency}, "
+        f"ML mode {args.ml_mode}, padding {args.body_kb} KB"
+    )
+    print(f"{'impl':6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}  statuses")
+    for impl in args.impl:
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-c", SERVER, impl, args.ml_mode, str(port)], env=env
+        )
+        try:
+            wait_until_up(port)
+            # Warm-up (model load, first batches)
+            asyncio.run(run_load(port, 200, args.concurrency, padding))
+            elapsed, lat, statuses = asyncio.run(
+                run_load(port, args.requests, args.concurrency, padding)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        print(
+            f"{impl:6} {args.requests / elapsed:8.0f} "
+            f"{np.percentile(lat, 50) * 1000:8.2f} "
+            f"{np.percentile(lat, 99) * 1000:8.2f}  {statuses}"
+        )
+
+
+if __name__ == "__main__":
+    main()
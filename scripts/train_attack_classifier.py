@@ -4,7 +4,11 @@ scripts/train_attack_classifier.py
 
 Train a reproducible RandomForest on hybrid features (word‐ & char‐TFIDF + side‐stats).
 Performs 5×2 repeated stratified CV, logs mean±std for F1 & ROC‐AUC, then
-fits on full train set and evaluates on held-out test set.
+fits on the train set and evaluates on held-out test set. By default the
+saved model is a cascade: a logistic regression on the same features decides
+confident payloads and only its uncertain band reaches the forest. The band
+is tuned on a calibration split held out from the training data, so the
+test set is only used for reporting.
 """
 
 import os
@@ -18,10 +22,107 @@ import joblib
 from sklearn.pipeline import Pipeline, FeatureUnion
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import RepeatedStratifiedKFold, cross_validate
+from sklearn.model_selection import (
+    RepeatedStratifiedKFold,
+    cross_validate,
+    train_test_split,
+)
 from sklearn.metrics import classification_report, roc_auc_score
 
-from scripts.feature_utils import SideChannelFeatures
+from scripts.feature_utils import HashingTfidfVectorizer, SideChannelFeatures
+from model_artifact import export_pipeline
+from cascade import (
+    CASCADE_TOLERANCE,
+    CascadePipeline,
+    calibrate_band,
+    fit_linear_stage,
+)
+
+
+def build_pipeline(features="vocab", hash_bits=16, random_state=42, n_jobs=-1):
+    """
+    features="vocab":   word & char TfidfVectorizer (fitted vocabularies)
+    features="hashing": word & char HashingTfidfVectorizer with 2**hash_bits
+                        buckets each (no vocabulary, constant memory)
+    """
+    if features == "vocab":
+        word = TfidfVectorizer(analyzer="word", ngram_range=(1, 2), max_features=5000)
+        char = TfidfVectorizer(analyzer="char", ngram_range=(3, 5), max_features=3000)
+    elif features == "hashing":
+        word = HashingTfidfVectorizer(
+            analyzer="word", ngram_range=(1, 2), n_features=2**hash_bits
+        )
+        char = HashingTfidfVectorizer(
+            analyzer="char", ngram_range=(3, 5), n_features=2**hash_bits
+        )
+    else:
+        raise ValueError(f"Unknown feature mode {features!r}")
+
+    return Pipeline(
+        [
+            (
+                "features",
+                FeatureUnion(
+                    [
+                        ("word", word),
+                        ("char", char),
+                        ("side", SideChannelFeatures()),
+                    ]
+                ),
+            ),
+            (
+                "clf",
+                RandomForestClassifier(
+                    n_estimators=200,
+                    class_weight="balanced",
+                    random_state=random_state,
+                    n_jobs=n_jobs,
+                ),
+            ),
+        ]
+    )
+
+
+def build_cascade(pipeline, X_train, y_train, X_cal, y_cal, X_test, y_test, args):
+    """
+    Fit the linear stage on the pipeline's features and calibrate its
+    uncertainty band on the calibration split (see cascade.calibrate_band),
+    which neither stage was fitted on. The cascade is then reported on the
+    test set.
+    """
+    logging.info("Fitting linear first stage for the cascade")
+    features = pipeline.named_steps["features"]
+    linear = fit_linear_stage(
+        features.transform(X_train), y_train, random_state=args.random_state
+    )
+
+    cal_features = features.transform(X_cal)
+    calibration = calibrate_band(
+        linear.predict_proba(cal_features),
+        pipeline.named_steps["clf"].predict_proba(cal_features),
+        y_cal,
+        pipeline.classes_,
+        tolerance=args.cascade_tolerance,
+    )
+    cascade = CascadePipeline(
+        pipeline, linear, calibration["low"], calibration["high"], calibration
+    )
+    logging.info(
+        f"Cascade band ({calibration['low']:.2f}, {calibration['high']:.2f}): "
+        f"accuracy {calibration['accuracy']:.4f} "
+        f"(forest {calibration['forest_accuracy']:.4f}, "
+        f"linear {calibration['linear_accuracy']:.4f}, "
+        f"tolerance {calibration['tolerance']}), "
+        f"{calibration['forest_fraction']:.1%} of calibration traffic reaches "
+        "the forest"
+    )
+    proba, routed = cascade.predict_proba_routed(X_test)
+    y_pred = cascade.classes_.take(np.argmax(proba, axis=1))
+    logging.info(
+        f"Cascade on test set ({routed.mean():.1%} reaches the forest)\n"
+        + classification_report(y_test, y_pred, digits=4)
+    )
+    return cascade
 
 
 def parse_args():
@@ -41,6 +142,41 @@ def parse_args():
         default="models/attack_classifier_pipeline.pkl",
         help="Where to write the trained pipeline",
     )
+    p.add_argument(
+        "--output-artifact",
+        default="models/attack_classifier_mmap",
+        help="Directory for the memory-mappable export ('' to skip)",
+    )
+    p.add_argument(
+        "--features",
+        choices=("vocab", "hashing"),
+        default="vocab",
+        help="Text features: fitted TF-IDF vocabularies or hashed n-grams",
+    )
+    p.add_argument(
+        "--hash-bits",
+        type=int,
+        default=16,
+        help="log2 of the bucket count per hashed vectorizer (--features hashing)",
+    )
+    p.add_argument(
+        "--cascade",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Also fit a linear first stage and save the model as a cascade",
+    )
+    p.add_argument(
+        "--cascade-tolerance",
+        type=float,
+        default=CASCADE_TOLERANCE,
+        help="Max calibration accuracy the cascade may lose vs the forest alone",
+    )
+    p.add_argument(
+        "--calibration-size",
+        type=float,
+        default=0.2,
+        help="Share of the training set held out to calibrate the cascade band",
+    )
     p.add_argument(
         "--random-state", type=int, default=42, help="Random seed for reproducibility"
     )
@@ -64,38 +200,8 @@ def main():
     logging.info(f"Train samples: {len(X_train)}, Test samples: {len(X_test)}")
 
     # 2) Build pipeline
-    pipeline = Pipeline(
-        [
-            (
-                "features",
-                FeatureUnion(
-                    [
-                        (
-                            "word",
-                            TfidfVectorizer(
-                                analyzer="word", ngram_range=(1, 2), max_features=5000
-                            ),
-                        ),
-                        (
-                            "char",
-                            TfidfVectorizer(
-                                analyzer="char", ngram_range=(3, 5), max_features=3000
-                            ),
-                        ),
-                        ("side", SideChannelFeatures()),
-                    ]
-                ),
-            ),
-            (
-                "clf",
-                RandomForestClassifier(
-                    n_estimators=200,
-                    class_weight="balanced",
-                    random_state=args.random_state,
-                    n_jobs=args.n_jobs,
-                ),
-            ),
-        ]
+    pipeline = build_pipeline(
+        args.features, args.hash_bits, args.random_state, args.n_jobs
     )
 
     # 3) Repeated stratified CV
@@ -119,8 +225,18 @@ def main():
         scores = cv_res[f"test_{metric}"]
         logging.info(f"{metric}: mean={scores.mean():.4f}, std={scores.std():.4f}")
 
-    # 4) Fit on full train set
-    logging.info("Fitting pipeline on full training data")
+    # 4) Fit on the train set, minus the cascade's calibration split: the
+    # band must be tuned on payloads neither stage has seen
+    if args.cascade:
+        X_train, X_cal, y_train, y_cal = train_test_split(
+            X_train,
+            y_train,
+            test_size=args.calibration_size,
+            stratify=y_train,
+            random_state=args.random_state,
+        )
+        logging.info(f"Holding out {len(X_cal)} training samples for calibration")
+    logging.info("Fitting pipeline on training data")
     pipeline.fit(X_train, y_train)
 
     # 5) Evaluate on hold-out test set
@@ -132,11 +248,25 @@ def main():
     auc = roc_auc_score(pd.get_dummies(y_test), y_proba, average="macro")
     logging.info(f"Test ROC AUC (macro): {auc:.6f}")
 
-    # 6) Persist artifact
+    # 6) Cascade: linear first stage, forest only for its uncertain band
+    if args.cascade:
+        pipeline = build_cascade(
+            pipeline, X_train, y_train, X_cal, y_cal, X_test, y_test, args
+        )
+
+    # 7) Persist artifact
+    # Write to a temp file and rename, so a serving process hot-reloading
+    # the model never sees a half-written artifact
     os.makedirs(os.path.dirname(args.output_model), exist_ok=True)
-    joblib.dump(pipeline, args.output_model)
+    tmp_path = args.output_model + ".tmp"
+    joblib.dump(pipeline, tmp_path)
+    os.replace(tmp_path, args.output_model)
     logging.info(f"Saved trained pipeline to '{args.output_model}'")
 
+    if args.output_artifact:
+        export_pipeline(pipeline, args.output_artifact)
+        logging.info(f"Saved memory-mappable artifact to '{args.output_artifact}'")
+
 
 if __name__ == "__main__":
     main()
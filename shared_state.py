@@ -0,0 +1,334 @@
+# shared_state.py
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from client_reputation import ClientReputation
+from verdict_cache import VerdictCache
+
+# ─── Table layout ──────────────────────────────────────────────────────────────
+BUCKET_SLOTS = 8  # slots per bucket: a key lives in one of them
+LOCK_STRIPES = 64  # write locks per table (one per bucket % LOCK_STRIPES)
+VERDICT_VALUE_BYTES = 1024  # largest shared verdict (JSON); bigger stay local
+
+_MAGIC = b"WAFSHM01"
+_HEADER = struct.Struct("<8sII")  # magic, slot count, value bytes per slot
+_HEADER_SIZE = 64
+_SLOT = struct.Struct("<I16sdI")  # crc32, key, expires_at, value length
+_CRC_START = 4  # the CRC covers the rest of the header and the value
+
+
+class SharedTable:
+    """
+    Fixed-capacity hash table in a memory-mapped file. Every process that
+    opens the same path (e.g. the workers of `uvicorn --workers N`) sees
+    the same entries; all of them must use the same capacity and
+    value_size.
+
+    Keys are 16-byte digests. Each slot holds a wall-clock expiry time and
+    up to `value_size` bytes. A key lives in one of the BUCKET_SLOTS slots
+    of its bucket. A write reuses the key's slot or an expired one, or
+    evicts the slot closest to expiry, so the file never grows.
+
+    Reads take no lock. The slot is copied and checked against its CRC, so
+    a read that races a write is a miss, never a torn value. Writes hold
+    one of LOCK_STRIPES fcntl byte-range locks, plus a thread lock because
+    fcntl locks are per process. POSIX only.
+    """
+
+    def __init__(self, path: str, capacity: int, value_size: int):
+        if capacity < 1 or value_size < 1:
+            raise ValueError("capacity and value_size must be >= 1")
+        self.path = path
+        self.buckets = -(-capacity // BUCKET_SLOTS)
+        self.capacity = self.buckets * BUCKET_SLOTS
+        self.value_size = value_size
+        self.slot_size = _SLOT.size + value_size
+        size = _HEADER_SIZE + self.capacity * self.slot_size
+
+        self._fd = self._open(size)
+        self._mm = mmap.mmap(self._fd, size)
+        self._thread_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self.evictions = 0  # live entries overwritten by this process
+
+    def _open(self, size: int) -> int:
+        """
+        A descriptor of the file at `path`, with this table's layout. A file
+        left with another layout may still be mapped by running workers, so
+        it is never resized: an empty file is built next to it and renamed
+        over it, and the old mappings keep the old inode.
+        """
+        header = _HEADER.pack(_MAGIC, self.capacity, self.value_size)
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.lockf(fd, fcntl.LOCK_EX, 1, 0)  # byte 0: layout lock
+            try:
+                # The file may have been replaced while we waited for the lock
+                if os.path.samestat(os.fstat(fd), os.stat(self.path)):
+                    found = os.pread(fd, _HEADER.size, 0)
+                else:
+                    found = None
+                if found == b"":  # a new file
+                    os.ftruncate(fd, size)
+                    os.pwrite(fd, header, 0)
+                    found = header
+                elif found is not None and found != header:
+                    self._replace(size, header)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, 1, 0)
+            if found == header:
+                return fd
+            os.close(fd)  # open the file that is at `path` now
+
+    def _replace(self, size: int, header: bytes) -> None:
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, size)
+            os.pwrite(fd, header, 0)
+        finally:
+            os.close(fd)
+        os.replace(tmp, self.path)
+
+    # ── reads ─────────────────────────────────────────────────────────────
+    def get(self, key: bytes) -> Optional[bytes]:
+        """The live value stored under `key`, or None."""
+        offset = self._find(key)
+        if offset is None:
+            return None
+        entry = self._read(offset, key)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1]
+
+    def values(self) -> Iterator[bytes]:
+        """Every live value (a full scan; for stats, not the request path)."""
+        now = time.time()
+        for slot in range(self.capacity):
+            offset = _HEADER_SIZE + slot * self.slot_size
+            entry = self._read(offset)
+            if entry is not None and entry[0] > now:
+                yield entry[1]
+
+    # ── writes ────────────────────────────────────────────────────────────
+    def put(self, key: bytes, value: bytes, expires_at: float) -> bool:
+        """Store `value` until `expires_at` (time.time()); False if too large."""
+        if len(value) > self.value_size:
+            return False
+        with self._locked(key):
+            self._write(self._slot_for(key), key, value, expires_at)
+        return True
+
+    def modify(
+        self,
+        key: bytes,
+        update: Callable[[Optional[bytes]], Tuple[bytes, float]],
+    ) -> None:
+        """
+        Read-modify-write under the key's lock: update(current value or
+        None) returns the new (value, expires_at).
+        """
+        with self._locked(key):
+            offset = self._find(key)
+            entry = self._read(offset, key) if offset is not None else None
+            current = entry[1] if entry and entry[0] > time.time() else None
+            value, expires_at = update(current)
+            if len(value) > self.value_size:
+                raise ValueError(f"value of {len(value)} bytes exceeds the slot")
+            self._write(self._slot_for(key), key, value, expires_at)
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+    # ── internals ─────────────────────────────────────────────────────────
+    def _bucket(self, key: bytes) -> int:
+        return int.from_bytes(key[:8], "little") % self.buckets
+
+    @contextmanager
+    def _locked(self, key: bytes):
+        stripe = self._bucket(key) % LOCK_STRIPES
+        with self._thread_locks[stripe]:
+            # Bytes 1.. of the file, one per stripe (only the lock range)
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 1 + stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 1 + stripe)
+
+    def _find(self, key: bytes) -> Optional[int]:
+        mm = self._mm
+        first = _HEADER_SIZE + self._bucket(key) * BUCKET_SLOTS * self.slot_size
+        for i in range(BUCKET_SLOTS):
+            offset = first + i * self.slot_size
+            if mm[offset + 4 : offset + 20] == key:
+                return offset
+        return None
+
+    def _slot_for(self, key: bytes) -> int:
+        """The key's own slot, else an empty or expired one, else the oldest."""
+        offset = self._find(key)
+        if offset is not None:
+            return offset
+        first = _HEADER_SIZE + self._bucket(key) * BUCKET_SLOTS * self.slot_size
+        now = time.time()
+        victim, victim_expiry = first, float("inf")
+        for i in range(BUCKET_SLOTS):
+            offset = first + i * self.slot_size
+            entry = self._read(offset)
+            if entry is None or entry[0] <= now:
+                return offset
+            if entry[0] < victim_expiry:
+                victim, victim_expiry = offset, entry[0]
+        self.evictions += 1
+        return victim
+
+    def _read(self, offset: int, key: Optional[bytes] = None):
+        head = self._mm[offset : offset + _SLOT.size]
+        crc, stored_key, expires_at, length = _SLOT.unpack(head)
+        if (key is not None and stored_key != key) or length > self.value_size:
+            return None
+        value = self._mm[offset + _SLOT.size : offset + _SLOT.size + length]
+        if zlib.crc32(value, zlib.crc32(head[_CRC_START:])) != crc:
+            return None  # empty, or being written right now
+        return expires_at, value
+
+    def _write(self, offset: int, key: bytes, value: bytes, expires_at: float):
+        head = _SLOT.pack(0, key, expires_at, len(value))
+        crc = zlib.crc32(value, zlib.crc32(head[_CRC_START:]))
+        self._mm[offset : offset + _SLOT.size + len(value)] = (
+            _SLOT.pack(crc, key, expires_at, len(value)) + value
+        )
+
+
+class SharedVerdictCache(VerdictCache):
+    """
+    VerdictCache with a second tier shared by all workers on the host. A
+    local miss is looked up in the SharedTable at `path` and promoted into
+    the local LRU on a hit. Every put is written to both tiers. The shared
+    copies expire after the same TTL. Verdicts that are too large or not
+    JSON-serialisable stay local.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 10_000,
+        ttl_seconds: float = 300.0,
+        value_size: int = VERDICT_VALUE_BYTES,
+    ):
+        super().__init__(max_entries, ttl_seconds)
+        self.shared = SharedTable(path, max_entries, value_size)
+        self.shared_hits = 0  # local misses answered by another worker's verdict
+        self.local_only = 0  # verdicts that could not be shared
+
+    def get(self, key: bytes) -> Optional[Any]:
+        verdict = super().get(key)
+        if verdict is None:
+            raw = self.shared.get(key)
+            if raw is not None:
+                verdict = json.loads(raw)
+                self.shared_hits += 1
+                super().put(key, verdict)
+        return verdict
+
+    def put(self, key: bytes, verdict: Any) -> None:
+        super().put(key, verdict)
+        try:
+            raw = json.dumps(verdict, separators=(",", ":")).encode("utf-8")
+        except (TypeError, ValueError):
+            raw = None
+        if raw is None or not self.shared.put(key, raw, time.time() + self.ttl):
+            self.local_only += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            super().stats(), shared_hits=self.shared_hits, local_only=self.local_only
+        )
+
+
+class SharedClientReputation(ClientReputation):
+    """
+    ClientReputation whose per-client block times and bans are kept in a
+    SharedTable at `path`, so a client is counted and banned across all
+    workers. A client's entry expires when it has no block inside the
+    window and no ban; when a bucket is full, the entry closest to expiry
+    is evicted. The counters (short_circuited, bans) are per process.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        threshold: int = 20,
+        window_seconds: float = 60.0,
+        cooldown_seconds: float = 300.0,
+        max_clients: int = 100_000,
+    ):
+        super().__init__(threshold, window_seconds, cooldown_seconds, max_clients)
+        self._record = struct.Struct(f"<dI{threshold}d")  # banned_until, n, times
+        self.table = SharedTable(path, max_clients, self._record.size)
+
+    def is_banned(self, client: str) -> bool:
+        value = self.table.get(_client_key(client))
+        if value is None or self._record.unpack(value)[0] <= time.time():
+            return False
+        with self._lock:
+            self.short_circuited += 1
+        return True
+
+    def record_block(self, client: str) -> bool:
+        now = time.time()
+        started = []
+
+        def update(value: Optional[bytes]) -> Tuple[bytes, float]:
+            banned_until, blocks = 0.0, []
+            if value is not None:
+                record = self._record.unpack(value)
+                banned_until, blocks = record[0], list(record[2 : 2 + record[1]])
+            blocks = (blocks + [now])[-self.threshold :]
+            if (
+                len(blocks) == self.threshold
+                and blocks[0] > now - self.window
+                and banned_until <= now
+            ):
+                banned_until = now + self.cooldown
+                blocks = []
+                started.append(True)
+            padded = blocks + [0.0] * (self.threshold - len(blocks))
+            record = self._record.pack(banned_until, len(blocks), *padded)
+            return record, max(banned_until, now + self.window)
+
+        self.table.modify(_client_key(client), update)
+        if started:
+            with self._lock:
+                self.bans += 1
+        return bool(started)
+
+    def stats(self) -> Dict[str, int]:
+        now = time.time()
+        clients = banned = 0
+        for value in self.table.values():
+            clients += 1
+            banned += self._record.unpack(value)[0] > now
+        return {
+            "clients": clients,
+            "banned": banned,
+            "bans": self.bans,
+            "short_circuited": self.short_circuited,
+            "evictions": self.table.evictions,
+        }
+
+
+def _client_key(client: str) -> bytes:
+    return hashlib.blake2b(
+        client.encode("utf-8", "surrogatepass"), digest_size=16
+    ).digest()
@@ -0,0 +1,41 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import waf_middleware
+from waf_asgi import WAFASGIMiddleware
+from waf_middleware import MLSettings
+
+
+@pytest.fixture
+def alerts(monkeypatch):
+    """The alerts the WAF logs, collected instead of written to disk."""
+    logged = []
+    monkeypatch.setattr(
+        waf_middleware, "log_alert", lambda **kwargs: logged.append(kwargs)
+    )
+    return logged
+
+
+async def _ok():
+    return {"ok": True}
+
+
+@pytest.fixture
+def make_client():
+    """
+    Factory for a TestClient of an app with one endpoint, POST /submit
+    (`endpoint`, default: answers {"ok": true}), behind a WAF `middleware`.
+    The ML stage is off unless `settings` says otherwise; other keyword
+    arguments go to the middleware.
+    """
+
+    def make(middleware=WAFASGIMiddleware, endpoint=_ok, settings=None, **options):
+        app = FastAPI()
+        app.post("/submit")(endpoint)
+        app.add_middleware(
+            middleware, settings=settings or MLSettings(mode="off"), **options
+        )
+        return TestClient(app)
+
+    return make
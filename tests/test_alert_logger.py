@@ -0,0 +1,41 @@
+import json
+import os
+
+from alert_logger import AlertWriter
+
+
+def read_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_writer_flushes_and_closes(tmp_path):
+    path = str(tmp_path / "logs" / "alerts.jsonl")
+    writer = AlertWriter(path, flush_interval=10)
+    for i in range(5):
+        assert writer.submit({"i": i})
+    assert writer.flush()
+    assert [r["i"] for r in read_lines(path)] == [0, 1, 2, 3, 4]
+    writer.submit({"i": 5})
+    writer.close()
+    assert len(read_lines(path)) == 6
+    assert writer.stats()["written"] == 6
+
+
+def test_drop_newest_policy_counts_drops(tmp_path):
+    writer = AlertWriter(str(tmp_path / "a.jsonl"), max_queue=1)
+    writer._ensure_started = lambda: None  # keep the queue from draining
+    assert writer.submit({"i": 0})
+    assert not writer.submit({"i": 1})
+    assert (writer.queued, writer.dropped) == (1, 1)
+
+
+def test_reopens_after_file_removed(tmp_path):
+    path = str(tmp_path / "alerts.jsonl")
+    writer = AlertWriter(path)
+    writer.submit({"i": 0})
+    writer.flush()
+    os.remove(path)
+    writer.submit({"i": 1})
+    writer.close()
+    assert read_lines(path) == [{"i": 1}]
@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+from datetime import datetime
+
+import report_generator
+from alert_logger import RollupWriter
+from alert_rollups import Rollups
+
+
+def alerts(count, day="2026-01-01", attack_type="XSS", ip=None):
+    return [
+        {
+            "timestamp": f"{day}T{i % 24:02d}:{i % 60:02d}:00.{i:06d}",
+            "client_ip": ip or f"10.0.0.{i % 3}",
+            "attack_type": attack_type,
+            "severity": "High",
+            "source": "regex",
+        }
+        for i in range(count)
+    ]
+
+
+def test_counts_per_resolution_and_window(tmp_path):
+    rollups = Rollups(str(tmp_path))
+    rollups.add(alerts(48) + alerts(10, day="2026-01-02", attack_type="SQLi"))
+    assert rollups.counts("day") == {
+        ("2026-01-01", "XSS", "High", "regex"): 48,
+        ("2026-01-02", "SQLi", "High", "regex"): 10,
+    }
+    hourly = rollups.counts("hour", datetime(2026, 1, 1, 6), datetime(2026, 1, 1, 8))
+    assert sum(hourly.values()) == 4
+    summary = rollups.summary("day", end=datetime(2026, 1, 2))
+    assert summary["total"] == 48 and summary["by_attack_type"] == {"XSS": 48}
+    assert summary["per_bucket"] == {"2026-01-01": 48}
+    assert summary["top_client_ips"][0] == ("10.0.0.0", 16)
+
+
+def test_workers_share_a_directory_across_restarts(tmp_path):
+    first, second = Rollups(str(tmp_path)), Rollups(str(tmp_path))
+    first.add(alerts(5))
+    second.add(alerts(7, attack_type="SQLi"))
+    assert first.persist() and second.persist()
+    assert len(os.listdir(tmp_path)) >= 2
+
+    restarted = Rollups(str(tmp_path))
+    assert restarted.summary("day")["by_attack_type"] == {"XSS": 5, "SQLi": 7}
+    restarted.add(alerts(1))  # visible before it is persisted
+    assert restarted.summary("minute")["total"] == 13
+
+
+def _worker(root, attack_type):
+    rollups = Rollups(root, compact_min_deltas=3)  # compacts while others write
+    for _ in range(10):
+        rollups.add(alerts(25, attack_type=attack_type))
+        rollups.persist()
+
+
+def test_concurrent_workers_and_compactions_lose_nothing(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=_worker, args=(str(tmp_path), t))
+        for t in ("XSS", "SQLi", "XSS", "benign")
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(30)
+        assert w.exitcode == 0
+    by_type = Rollups(str(tmp_path)).summary("day")["by_attack_type"]
+    assert by_type == {"XSS": 500, "SQLi": 250, "benign": 250}
+
+
+def test_compaction_keeps_totals_and_applies_retention(tmp_path):
+    rollups = Rollups(str(tmp_path), compact_min_deltas=1000, top_ips=2)
+    for i in range(5):
+        rollups.add(alerts(10, ip=f"10.0.1.{i}"))
+        rollups.persist()
+    assert rollups.compact(now=datetime(2026, 1, 2)) is True
+    names = [n for n in os.listdir(tmp_path) if not n.startswith(".")]
+    assert names == ["rollups.json"]
+
+    reader = Rollups(str(tmp_path))
+    assert reader.summary("day")["total"] == 50
+    assert len(reader.top_client_ips("day", n=10)) == 2  # top_ips per bucket
+    # Minute buckets are dropped once past their retention
+    assert reader.compact(now=datetime(2026, 2, 1)) is True
+    assert Rollups(str(tmp_path)).counts("minute") == {}
+    assert Rollups(str(tmp_path)).summary("hour")["total"] == 50
+
+
+def test_rollup_writer_persists_on_close(tmp_path):
+    writer = RollupWriter(Rollups(str(tmp_path), persist_interval=3600))
+    for alert in alerts(20):
+        writer.submit(alert)
+    writer.close()
+    assert Rollups(str(tmp_path)).summary("day")["total"] == 20
+
+
+def test_rollup_writer_survives_a_failed_batch(tmp_path, monkeypatch):
+    rollups = Rollups(str(tmp_path), persist_interval=3600)
+    add, failures = rollups.add, [OSError("disk full")]
+
+    def flaky_add(records):
+        if failures:
+            raise failures.pop()
+        add(records)
+
+    monkeypatch.setattr(rollups, "add", flaky_add)
+    writer = RollupWriter(rollups)
+    writer.submit(alerts(1)[0])
+    assert writer.flush()
+    for alert in alerts(5):
+        writer.submit(alert)
+    writer.close()
+    assert writer.stats()["dropped"] == 1 and writer.stats()["written"] == 5
+    assert Rollups(str(tmp_path)).summary("day")["total"] == 5
+
+
+def test_report_from_rollups(tmp_path, monkeypatch):
+    rollups = Rollups(str(tmp_path))
+    rollups.add(alerts(30) + alerts(6, day="2026-01-02", attack_type="SQLi"))
+    rollups.persist()
+    monkeypatch.setattr(report_generator, "ROLLUP_DIR", str(tmp_path))
+
+    output = tmp_path / "report.pdf"
+    stats = report_generator.generate_report(
+        until=datetime(2026, 1, 2), source="rollups", output=str(output)
+    )
+    assert output.exists() and stats.total == 30
+    assert stats.by_type == {"XSS": 30}
+    assert stats.client_ips.most_common(1) == [("10.0.0.0", 10, 0)]
+    assert not stats.sample
@@ -0,0 +1,83 @@
+import os
+from datetime import datetime
+
+import pyarrow as pa
+
+import alert_logger
+from alert_logger import StoreWriter
+from alert_store import AlertStore, day_bounds
+
+
+def alerts(day, count, attack_type="XSS"):
+    return [
+        {
+            "timestamp": f"{day}T{i % 24:02d}:00:00.{i:06d}",
+            "request_id": f"{day}-{i}",
+            "client_ip": f"10.0.0.{i % 3}",
+            "attack_type": attack_type,
+            "severity": "High",
+            "source": "regex",
+            "confidence": 1.0,
+        }
+        for i in range(count)
+    ]
+
+
+def test_query_reads_only_the_requested_days(tmp_path):
+    store = AlertStore(str(tmp_path), compact_interval=-1)
+    store.append(alerts("2026-01-01", 5) + alerts("2026-01-02", 3, "SQLi"))
+    assert store.days() == ["2026-01-01", "2026-01-02"]
+
+    # A corrupt segment in another partition is never opened
+    with open(tmp_path / "date=2026-01-01" / "seg-bad.parquet", "wb") as f:
+        f.write(b"not parquet")
+    table = store.query(*day_bounds(datetime(2026, 1, 2).date()))
+    assert table.num_rows == 3
+    assert set(table.column("attack_type").to_pylist()) == {"SQLi"}
+    assert pa.types.is_dictionary(table.schema.field("client_ip").type)
+
+
+def test_time_and_column_filters(tmp_path):
+    store = AlertStore(str(tmp_path), compact_interval=-1)
+    store.append(alerts("2026-01-01", 24) + alerts("2026-01-01", 6, "SQLi"))
+    table = store.query(
+        datetime(2026, 1, 1, 3), datetime(2026, 1, 1, 6), filters={"attack_type": "XSS"}
+    )
+    assert table.num_rows == 3
+    table = store.query(
+        filters={"client_ip": ["10.0.0.1", "10.0.0.2"]}, columns=["request_id"]
+    )
+    assert table.num_rows == 20 and table.column_names == ["request_id"]
+    assert store.query(datetime(2027, 1, 1)).num_rows == 0
+
+
+def test_compaction_merges_small_segments(tmp_path):
+    store = AlertStore(str(tmp_path), compact_interval=-1, compact_min_segments=3)
+    for i in range(4):
+        store.append(alerts("2026-01-01", 10)[i::4])
+    partition = tmp_path / "date=2026-01-01"
+    before = sorted(store.query().column("request_id").to_pylist())
+    assert store.compact() == 1
+    segments = [n for n in os.listdir(partition) if n.endswith(".parquet")]
+    assert len(segments) == 1 and segments[0].startswith("cmp-")
+    assert sorted(store.query().column("request_id").to_pylist()) == before
+    assert store.compact() == 0
+
+
+def test_store_writer_rolls_batches_into_segments(tmp_path):
+    writer = StoreWriter(AlertStore(str(tmp_path), compact_interval=-1))
+    for record in alerts("2026-01-01", 5):
+        assert writer.submit(record)
+    writer.close()
+    assert writer.stats()["written"] == 5
+    assert writer.store.segments_written == 1
+    assert writer.store.query().num_rows == 5
+
+
+def test_startup_creates_the_store_writer(tmp_path, monkeypatch):
+    monkeypatch.setattr(alert_logger, "_writers", {})
+    monkeypatch.setattr(alert_logger, "ALERT_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(alert_logger, "ROLLUP_DIR", None)
+    alert_logger.start()
+    # Nothing left to import or set up when the first alert is logged
+    assert isinstance(alert_logger._writers[str(tmp_path)], StoreWriter)
@@ -0,0 +1,116 @@
+import asyncio
+import random
+import re
+import time
+
+import pytest
+from fastapi import Request
+
+import detection_engine
+import waf_middleware
+from detection_engine import (
+    OVERRUN_LABEL,
+    RULESET,
+    SAFE_FORMS,
+    SQLI_PATTERNS,
+    XSS_PATTERNS,
+    RuleSet,
+    detect_attack,
+)
+from waf_middleware import MLSettings, WAFEngine
+
+# Each of these takes the original rules from hundreds of milliseconds to
+# minutes (worst: the <img> rule, cubic); the safe forms are linear.
+ADVERSARIAL = {
+    "img_stages": "<img src= onerror= " * 5000,
+    "handler_word": "<" + "on" * 50_000,
+    "handler_spaces": "<" + " onx=" * 20_000,
+    "open_brackets": "<" * 100_000,
+    "script_tags": "<script" * 15_000,
+    "tautology": "or " * 30_000,
+    "tautology_newlines": ("or " * 500 + "\n") * 60,
+    "mixed": ("<img src=x onerror=y " + "or " * 20 + "on" * 20) * 800,
+}
+TIME_LIMIT = 1.0  # seconds, per payload
+
+
+@pytest.mark.parametrize("name", sorted(ADVERSARIAL))
+def test_adversarial_payload_bounded(name):
+    payload = ADVERSARIAL[name]
+    start = time.perf_counter()
+    detect_attack({"body": payload})
+    assert time.perf_counter() - start < TIME_LIMIT
+
+
+def test_safe_forms_match_exactly_when_originals_do():
+    tokens = ["<", ">", "<script", "</script>", "script", "<img", "img", "src="]
+    tokens += ["onerror=", "on", "On", "x", "_", "é", " ", "\t", "\n", "=", "or"]
+    tokens += ["OR", "o", "r", "-"]
+    rng = random.Random(0)
+    for _ in range(20_000):
+        text = "".join(rng.choice(tokens) for _ in range(rng.randint(0, 12)))
+        for original, safe in SAFE_FORMS.items():
+            expected = re.search(original, text, re.IGNORECASE) is not None
+            assert (re.search(safe, text, re.IGNORECASE) is not None) == expected, (
+                original,
+                text,
+            )
+
+
+def test_windows_keep_rule_priority():
+    rules = RuleSet.from_patterns(XSS_PATTERNS, SQLI_PATTERNS)
+    rules.window, rules.overlap = 64, 16
+    text = "1 OR 1=1 " + "x" * 200 + "<script>alert(1)</script>" + "y" * 200
+    assert rules.scan(text) == (("XSS", XSS_PATTERNS[0]), True)
+    # A match across a window boundary is found within the overlap
+    text = "x" * 60 + "javascript:" + "x" * 60
+    assert rules.scan(text) == (("XSS", "javascript:"), True)
+
+
+def test_overruns_follow_policy(monkeypatch):
+    rules = RuleSet.from_patterns(XSS_PATTERNS, SQLI_PATTERNS)
+    rules.window, rules.overlap, rules.budget = 64, 16, 0.0
+    benign = "x = y or z\n" * 100  # passes the prefilter, no match
+    assert rules.scan(benign) == (None, False)
+    assert rules.overruns == 1
+    # Too long: the tail is never inspected
+    rules.max_chars = 32
+    assert rules.scan("x" * 40 + "<script>x</script>") == (None, False)
+
+    monkeypatch.setattr(detection_engine, "RULESET", rules)
+    monkeypatch.setattr(detection_engine, "OVERRUN_POLICY", "block")
+    res = detect_attack({"body": benign})
+    assert res["is_malicious"] and res["label"] == OVERRUN_LABEL
+    monkeypatch.setattr(detection_engine, "OVERRUN_POLICY", "allow")
+    res = detect_attack({"body": benign})
+    assert not res["is_malicious"] and res["scan_complete"] is False
+    # A hit in the inspected part still blocks
+    assert detect_attack({"body": "<script>x</script>" + benign})["label"] == "XSS"
+
+
+def test_default_limits_leave_normal_payloads_alone():
+    assert RULESET.scan("<b onclick=go()>") == (("XSS", XSS_PATTERNS[2]), True)
+    assert RULESET.scan("hello " * 20_000) == (None, True)
+
+
+def test_incomplete_scans_are_not_cached(alerts, monkeypatch):
+    rules = RuleSet.from_patterns(XSS_PATTERNS, SQLI_PATTERNS)
+    rules.window, rules.overlap, rules.budget = 64, 16, 0.0
+    monkeypatch.setattr(waf_middleware, "get_rules", lambda: rules)
+    monkeypatch.setattr(detection_engine, "OVERRUN_POLICY", "allow")
+    engine = WAFEngine(settings=MLSettings(mode="off"))
+    request = Request(
+        {
+            "type": "http",
+            "method": "POST",
+            "headers": [],
+            "query_string": b"",
+            "client": ("10.0.0.1", 50000),
+        }
+    )
+
+    # Let through, but only for this request: the next one is scanned again
+    state, _ = asyncio.run(engine.inspect(request, "x = y or z\n" * 100))
+    assert state is not None and len(engine.verdict_cache) == 0
+    asyncio.run(engine.inspect(request, "x = y or z"))
+    assert len(engine.verdict_cache) == 1
@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import pyarrow.parquet as pq
+
+from rule_registry import get_rules
+from scripts import bulk_scan
+from waf_middleware import MLSettings, WAFEngine
+
+PAYLOADS = [
+    "hello world",
+    "<script>alert(1)</script>",
+    "name=alice, note: see you at 10!",
+    "1' OR '1'='1' --",
+    "SELECT * FROM users WHERE id=3",
+    "<img src=x onerror=alert(1)>",
+]
+
+
+def write_corpus(path, copies=20):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(copies):
+            for payload in PAYLOADS:
+                f.write(json.dumps({"input": payload, "n": i}) + "\n")
+            f.write("not json\n")
+            f.write(json.dumps({"other": "field"}) + "\n")
+            f.write(json.dumps({"input": {"a": ["x", PAYLOADS[1]]}}) + "\n")
+
+
+def scan(tmp_path, *args):
+    corpus = tmp_path / "corpus.jsonl"
+    write_corpus(corpus)
+    out = tmp_path / "verdicts.jsonl"
+    options = bulk_scan.parse_args(
+        [str(corpus), "-o", str(out), "--no-ml", "--progress", "0", *args]
+    )
+    totals = bulk_scan.scan(options)
+    with open(out, encoding="utf-8") as f:
+        return [json.loads(line) for line in f], totals
+
+
+def test_chunk_ranges_split_on_lines(tmp_path):
+    corpus = tmp_path / "corpus.jsonl"
+    write_corpus(corpus)
+    data = corpus.read_bytes()
+    ranges = list(bulk_scan.chunk_ranges(str(corpus), 100))
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start and data[end - 1 : end] == b"\n"
+
+
+def test_verdicts_match_the_middleware(tmp_path):
+    rows, totals = scan(tmp_path, "--all", "--workers", "1")
+    assert totals["records"] == 20 * (len(PAYLOADS) + 1)
+    assert totals["errors"] == 20 and totals["skipped"] == 20
+
+    engine = WAFEngine(settings=MLSettings(mode="off"))
+    expected = {}
+    for payload in PAYLOADS:
+        verdict = asyncio.run(engine._analyze(payload, {}, get_rules(), use_ml=False))
+        expected[payload] = verdict["result"]["label"], verdict["severity"]
+    for row in rows:
+        if row["payload"] in expected and row["detection_source"] == "regex":
+            assert (row["label"], row["severity"]) == expected[row["payload"]]
+    # String leaves of nested JSON values are inspected
+    assert sum(row["payload"] == "a\nx\n" + PAYLOADS[1] for row in rows) == 20
+
+
+def test_workers_and_chunks_give_the_same_output(tmp_path):
+    single, _ = scan(tmp_path, "--workers", "1")
+    pooled, totals = scan(tmp_path, "--workers", "2", "--chunk-mb", "0.001")
+    assert pooled == single
+    assert totals["malicious"] == len(single) > 0
+    assert [row["offset"] for row in pooled] == sorted(r["offset"] for r in pooled)
+
+
+def test_parquet_output(tmp_path):
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("\n".join(PAYLOADS) + "\n", encoding="utf-8")
+    out = tmp_path / "verdicts.parquet"
+    bulk_scan.main([str(corpus), "-o", str(out), "--no-ml", "--progress", "0"])
+    table = pq.read_table(out)
+    assert table.schema.names == list(bulk_scan.FIELDS)
+    assert set(table.column("label").to_pylist()) == {"XSS", "SQLi"}
@@ -0,0 +1,62 @@
+import numpy as np
+
+from cascade import CascadePipeline, calibrate_band
+from ml_inference import predict_batch
+
+CLASSES = np.array(["SQLi", "XSS", "benign"])
+
+
+class StubLinear:
+    classes_ = CLASSES
+
+    def predict_proba(self, features):
+        # features are the payload lengths; longer = more malicious
+        p_mal = np.clip(np.asarray(features, dtype=float) / 10.0, 0.0, 1.0)
+        return np.column_stack([p_mal / 2, p_mal / 2, 1.0 - p_mal])
+
+
+class StubPipeline:
+    classes_ = CLASSES
+
+    def __init__(self):
+        self.seen = []
+
+    def transform_features(self, texts):
+        return np.array([len(t) for t in texts])
+
+    def predict_proba_features(self, features):
+        self.seen.extend(features.tolist())
+        return np.tile([0.0, 1.0, 0.0], (len(features), 1))
+
+
+def test_only_uncertain_band_reaches_forest():
+    forest = StubPipeline()
+    cascade = CascadePipeline(forest, StubLinear(), low=0.2, high=0.8)
+    payloads = ["a", "abcd", "abcdefg", "abcdefghij"]  # p_mal .1 .4 .7 1.0
+
+    results = predict_batch(cascade, payloads)
+    assert [r["stage"] for r in results] == ["linear", "forest", "forest", "linear"]
+    assert forest.seen == [4, 7]
+    assert [r["label"] for r in results] == ["benign", "XSS", "XSS", "SQLi"]
+    assert cascade.stats()["forest_fraction"] == 0.5
+
+    # Per-call override of the calibrated band
+    results = predict_batch(cascade, payloads, cascade_band=(0.5, 0.8))
+    assert [r["stage"] for r in results][:2] == ["linear", "linear"]
+
+
+def test_calibrate_band_respects_tolerance():
+    y = np.array(["benign", "XSS", "XSS", "benign"])
+    linear = np.array(
+        [[0.0, 0.05, 0.95], [0.0, 0.9, 0.1], [0.0, 0.4, 0.6], [0.1, 0.1, 0.8]]
+    )
+    forest = np.array([[0, 0, 1], [0, 1, 0], [0, 1, 0], [0, 0, 1]], dtype=float)
+
+    strict = calibrate_band(linear, forest, y, CLASSES, tolerance=0.0)
+    assert strict["accuracy"] == strict["forest_accuracy"] == 1.0
+    assert strict["forest_fraction"] == 0.25  # only the 0.4 payload
+    assert strict["low"] < 0.4 < strict["high"]
+
+    loose = calibrate_band(linear, forest, y, CLASSES, tolerance=0.25)
+    assert loose["forest_fraction"] == 0.0
+    assert loose["accuracy"] == 0.75
@@ -0,0 +1,89 @@
+import types
+
+import pytest
+from fastapi import Request
+
+import client_reputation
+from client_reputation import ClientReputation
+from waf_asgi import WAFASGIMiddleware
+from waf_middleware import WAFMiddleware
+
+ATTACK = {"input": "<script>alert(1)</script>"}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    fake = types.SimpleNamespace(monotonic=lambda: now[0])
+    monkeypatch.setattr(client_reputation, "time", fake)
+    return now
+
+
+def test_ban_after_threshold_within_window(clock):
+    rep = ClientReputation(threshold=3, window_seconds=10, cooldown_seconds=60)
+    assert not rep.record_block("a")
+    assert not rep.record_block("a")
+    assert not rep.is_banned("a")
+    assert rep.record_block("a")
+    assert rep.is_banned("a")
+    assert not rep.is_banned("b")
+    assert rep.stats()["short_circuited"] == 1
+    assert rep.stats()["bans"] == 1
+
+
+def test_blocks_outside_window_do_not_count(clock):
+    rep = ClientReputation(threshold=3, window_seconds=10, cooldown_seconds=60)
+    for _ in range(2):
+        rep.record_block("a")
+    clock[0] += 11
+    assert not rep.record_block("a")
+    assert not rep.record_block("a")
+    assert rep.record_block("a")
+
+
+def test_ban_expires_after_cooldown(clock):
+    rep = ClientReputation(threshold=2, window_seconds=10, cooldown_seconds=60)
+    rep.record_block("a")
+    rep.record_block("a")
+    clock[0] += 59
+    assert rep.is_banned("a")
+    clock[0] += 2
+    assert not rep.is_banned("a")
+    # The ban reset the window: one new block is not enough
+    assert not rep.record_block("a")
+
+
+def test_idle_clients_evicted_first(clock):
+    rep = ClientReputation(threshold=2, max_clients=2)
+    rep.record_block("a")
+    rep.record_block("b")
+    rep.record_block("a")  # ban refreshes "a"
+    rep.record_block("c")  # evicts "b", the least recently seen
+    assert rep.stats() == {
+        "clients": 2,
+        "banned": 1,
+        "bans": 1,
+        "short_circuited": 0,
+        "evictions": 1,
+    }
+    assert rep.is_banned("a")
+
+
+@pytest.mark.parametrize("middleware", [WAFMiddleware, WAFASGIMiddleware])
+def test_flood_is_short_circuited(alerts, make_client, middleware):
+    seen = []
+
+    async def submit(request: Request):
+        seen.append(await request.body())
+        return {"ok": True}
+
+    client = make_client(middleware, endpoint=submit, reputation_threshold=3)
+    for _ in range(10):
+        assert client.post("/submit", json=ATTACK).status_code == 403
+    # Only the blocks before the ban were inspected and logged
+    assert len(alerts) == 3
+
+    # Once banned, even benign requests are refused without reaching the app
+    assert client.post("/submit", json={"input": "hello"}).status_code == 403
+    assert seen == []
+    assert client.get("/docs").status_code == 200
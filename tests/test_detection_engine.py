@@ -0,0 +1,87 @@
+import re
+
+from detection_engine import (
+    RULESET,
+    SQLI_PATTERNS,
+    XSS_PATTERNS,
+    RuleSet,
+    detect_attack,
+    required_literals,
+)
+
+
+def _legacy(text):
+    for pat in XSS_PATTERNS:
+        if re.search(pat, text, re.IGNORECASE):
+            return ("XSS", pat)
+    for pat in SQLI_PATTERNS:
+        if re.search(pat, text, re.IGNORECASE):
+            return ("SQLi", pat)
+    return None
+
+
+def test_xss_takes_priority_over_earlier_sqli_hit():
+    # The quote appears first in the string, but XSS rules rank higher
+    res = detect_attack({"body": "' <script>alert(1)</script>"})
+    assert res["label"] == "XSS"
+    assert res["pattern"] == XSS_PATTERNS[0]
+
+
+def test_onerror_rule_beats_generic_handler():
+    res = detect_attack({"body": "<img src=x onerror=alert(1)>"})
+    assert res["pattern"] == XSS_PATTERNS[1]
+
+
+def test_benign_payload():
+    res = detect_attack({"body": "hello world", "query": {}})
+    assert res == {"is_malicious": False, "label": "benign", "pattern": None}
+
+
+def test_matches_legacy_loop():
+    samples = [
+        "1 OR 1=1",
+        "DROP TABLE users",
+        "1 UNION SELECT name FROM users",
+        "insert   into t values(1)",
+        "javascript:alert(1)",
+        "<b onclick=go()>",
+        "price -- discount",
+        "plain text",
+    ]
+    for text in samples:
+        assert RULESET.match(text) == _legacy(text), text
+
+
+def test_empty_ruleset():
+    assert RuleSet([]).match("<script>x</script>") is None
+
+
+def test_required_literals():
+    assert required_literals(r"(?i)\b(or)\b.*=.*") == [
+        frozenset(["or"]),
+        frozenset(["="]),
+    ]
+    assert required_literals(r"(\%27)|(\')|(#)") == [frozenset(["%27", "'", "#"])]
+    # Optional parts are not required
+    assert required_literals(r"a(bc)?") == [frozenset(["a"])]
+
+
+def test_prefilter_skips_regex_for_plain_payloads():
+    rules = RuleSet.from_patterns(XSS_PATTERNS, SQLI_PATTERNS)
+    assert rules.match("top 10 cooking blogs") is None
+    assert rules.match("1 OR 1=1") == ("SQLi", SQLI_PATTERNS[1])
+    stats = rules.prefilter_stats()
+    assert stats["scanned"] == 2
+    assert stats["skipped"] == 1
+    assert stats["rules"][5]["hits"] == 1
+
+
+def test_prefilter_bypassed_for_non_ascii():
+    # U+017F (long s) matches "s" under IGNORECASE
+    assert RULESET.match("<\u017fcript>x</script>") == ("XSS", XSS_PATTERNS[0])
+
+
+def test_overlapping_literals_are_not_missed():
+    # The scanner consumes "into", hiding the "on" starting inside it
+    rules = RuleSet([("A", r"on"), ("B", r"into")])
+    assert rules.match("inton") == ("A", "on")
@@ -0,0 +1,36 @@
+import threading
+
+from explainability import ExplanationWorker
+
+
+def test_jobs_report_to_sink_by_request_id():
+    results, done = [], threading.Event()
+
+    def sink(request_id, explanation, status):
+        results.append((request_id, explanation, status))
+        done.set()
+
+    worker = ExplanationWorker(sink=sink)
+    res = {"detection_source": "regex", "label": "XSS", "pattern": "javascript:"}
+    assert worker.submit("req-1", "javascript:alert(1)", res)
+    assert done.wait(5)
+    worker.close()
+    assert results == [
+        ("req-1", "Detected 'javascript:' URI, frequently used in XSS.", "ok")
+    ]
+
+
+def test_full_queue_drops_job():
+    results = []
+    gate = threading.Event()
+    worker = ExplanationWorker(
+        max_queue=1, sink=lambda *args: results.append(args), time_budget=1
+    )
+    worker._executor.submit(gate.wait)  # occupy the only worker thread
+    res = {"detection_source": "regex", "label": "XSS", "pattern": "javascript:"}
+    assert worker.submit("a", "javascript:", res)
+    assert not worker.submit("b", "javascript:", res)
+    gate.set()
+    worker.close()
+    assert ("b", None, "dropped") in results
+    assert worker.stats()["dropped"] == 1
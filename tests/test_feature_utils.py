@@ -0,0 +1,61 @@
+from collections import Counter
+
+import numpy as np
+
+from scripts.feature_utils import (
+    VECTORIZE_MIN_ROWS,
+    HashingTfidfVectorizer,
+    SideChannelFeatures,
+)
+
+
+def legacy(X):
+    feats = []
+    for text in X:
+        length = len(text)
+        special = sum(1 for c in text if not c.isalnum() and not c.isspace())
+        ratio = special / length if length else 0.0
+        counts = np.array(list(Counter(text).values()), dtype=float)
+        probs = counts / counts.sum() if counts.sum() else np.array([0.0])
+        entropy = -np.sum(probs * np.log2(probs + 1e-9))
+        feats.append([length, special, ratio, entropy])
+    return np.array(feats)
+
+
+TEXTS = [
+    "",
+    "a",
+    "hello world",
+    "' OR 1=1 --",
+    "<script>alert(1)</script>",
+    "café ½ ٣ 𝟘 🚀🚀   ",
+    "\ud800 lone surrogate",
+    "x" * 3000 + "<>" * 50,
+    "".join(chr(i) for i in range(1, 3000)),
+]
+
+
+def test_batch_and_single_paths_match_legacy():
+    batch = TEXTS * VECTORIZE_MIN_ROWS
+    assert np.array_equal(SideChannelFeatures().transform(batch), legacy(batch))
+    for text in TEXTS:
+        assert np.array_equal(SideChannelFeatures().transform([text]), legacy([text]))
+
+
+def test_hashing_partial_fit_matches_fit():
+    docs = ["select * from users", "<b>hello</b>", "' or 1=1 --", "plain text"] * 5
+    full = HashingTfidfVectorizer(
+        analyzer="char", ngram_range=(3, 5), n_features=2**10
+    )
+    full.fit(docs)
+    streamed = HashingTfidfVectorizer(
+        analyzer="char", ngram_range=(3, 5), n_features=2**10
+    )
+    for i in range(0, len(docs), 3):
+        streamed.partial_fit(docs[i : i + 3])
+
+    assert streamed.n_docs_ == len(docs)
+    assert np.array_equal(streamed.idf_, full.idf_)
+    X = streamed.transform(docs)
+    assert X.shape == (len(docs), 2**10)
+    assert np.allclose(np.asarray(X.multiply(X).sum(axis=1)).ravel(), 1.0)
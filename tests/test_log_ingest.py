@@ -0,0 +1,124 @@
+import json
+import os
+
+import pandas as pd
+
+from alert_logger import EXPLANATION_PENDING as PENDING
+from log_ingest import AlertLog
+
+
+def alert(i, attack_type="XSS", source="regex", severity="High", confidence=1.0):
+    return {
+        "timestamp": f"2026-01-{1 + i % 28:02d}T12:00:00.{i:06d}",
+        "client_ip": f"10.0.0.{i % 5}",
+        "attack_type": attack_type,
+        "source": source,
+        "severity": severity,
+        "confidence": confidence,
+    }
+
+
+def append(path, records, tail=""):
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(json.dumps(r) + "\n" for r in records)
+        f.write(tail)
+
+
+def test_incremental_refresh(tmp_path):
+    path = tmp_path / "alerts.jsonl"
+    log = AlertLog(str(path))
+    assert log.refresh() == 0 and log.frame.empty
+
+    append(path, [alert(i) for i in range(3)], tail='{"timestamp": "2026-')
+    assert log.refresh() == 3
+    generation = log.generation
+    assert log.refresh() == 0 and log.generation == generation
+
+    # The partly written line is picked up once it is complete
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('01-02T00:00:00", "attack_type": "SQLi"}\nnot json\n')
+    assert log.refresh() == 1
+    assert log.bad_lines == 1
+    assert list(log.frame["attack_type"]) == ["XSS", "XSS", "XSS", "SQLi"]
+    assert log.frame["source"].iloc[-1] == "unknown"
+    assert str(log.frame["attack_type"].dtype) == "category"
+    assert pd.api.types.is_datetime64_any_dtype(log.frame["timestamp"])
+
+
+def test_truncation_and_rotation_reload(tmp_path):
+    path = tmp_path / "alerts.jsonl"
+    log = AlertLog(str(path))
+    append(path, [alert(i) for i in range(5)])
+    assert log.refresh() == 5
+
+    open(path, "w").close()
+    append(path, [alert(0, "SQLi")])
+    assert log.refresh() == 1
+    assert list(log.frame["attack_type"]) == ["SQLi"]
+
+    os.rename(path, tmp_path / "alerts.jsonl.1")
+    append(path, [alert(1), alert(2)])
+    assert log.refresh() == 2
+    assert len(log.frame) == 2
+
+    os.remove(path)
+    assert log.refresh() == 0 and log.frame.empty
+
+
+def test_filters_and_summary_are_memoized(tmp_path):
+    path = tmp_path / "alerts.jsonl"
+    records = [alert(i) for i in range(10)]
+    records += [alert(i, "SQLi", "ml", "Medium", 0.5) for i in range(4)]
+    append(path, records)
+    log = AlertLog(str(path))
+    log.refresh()
+    assert log.options("attack_type") == ["SQLi", "XSS"]
+
+    filters = (["SQLi", "XSS"], ["ml", "regex"], ["High", "Medium"], (0.6, 1.0))
+    filtered = log.filtered(*filters)
+    assert len(filtered) == 10
+    assert log.filtered(*filters) is filtered
+    summary = log.summary(["SQLi"], ["ml"], ["Medium"])
+    assert summary["total"] == 4
+    assert summary["by_attack_type"].to_dict("records") == [
+        {"attack_type": "SQLi", "count": 4}
+    ]
+    assert summary["confidence_hist"]["count"].sum() == 4
+
+    # New rows invalidate the memo
+    append(path, [alert(20)])
+    log.refresh()
+    assert len(log.filtered(*filters)) == 11
+
+
+def test_deferred_explanations_are_joined_by_request_id(tmp_path):
+    path, explanations = tmp_path / "alerts.jsonl", tmp_path / "explanations.jsonl"
+    log = AlertLog(str(path), explanations_path=str(explanations))
+
+    def ml_alert(i):
+        return dict(alert(i, source="ml"), request_id=f"r{i}", explanation=PENDING)
+
+    def explained(i, status="ok"):
+        text = f"why {i}" if status == "ok" else None
+        return {"request_id": f"r{i}", "status": status, "explanation": text}
+
+    # The explanation of r0 is written before its alert, r1's after it
+    append(explanations, [explained(0)])
+    append(path, [ml_alert(0), ml_alert(1), ml_alert(2)])
+    assert log.refresh() == 3
+    assert list(log.frame["explanation"]) == ["why 0", PENDING, PENDING]
+
+    generation = log.generation
+    append(explanations, [explained(1), explained(2, "timeout")])
+    assert log.refresh() == 0 and log.generation > generation
+    assert list(log.frame["explanation"]) == [
+        "why 0",
+        "why 1",
+        "Explanation unavailable (timeout).",
+    ]
+
+    # A reloaded log is joined again
+    os.rename(path, tmp_path / "alerts.jsonl.1")
+    append(path, [ml_alert(1)])
+    assert log.refresh() == 1
+    assert list(log.frame["explanation"]) == ["why 1"]
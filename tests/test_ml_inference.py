@@ -0,0 +1,71 @@
+import asyncio
+
+import numpy as np
+
+from ml_inference import BatchScheduler, predict_batch, predict_one
+
+
+class CountingPipeline:
+    classes_ = np.array(["SQLi", "XSS", "benign"])
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict_proba(self, texts):
+        self.calls += 1
+        return np.array(
+            [[0.1, 0.2, 0.7] if t == "ok" else [0.0, 0.9, 0.1] for t in texts]
+        )
+
+
+def test_single_forward_pass():
+    pipe = CountingPipeline()
+    res = predict_one(pipe, "<b onclick=x>")
+    assert pipe.calls == 1
+    assert res["label"] == "XSS"
+    assert res["confidence"] == 0.9
+    assert res["probabilities"] == {"SQLi": 0.0, "XSS": 0.9, "benign": 0.1}
+
+
+def test_batch_preserves_order():
+    pipe = CountingPipeline()
+    labels = [r["label"] for r in predict_batch(pipe, ["ok", "bad", "ok"])]
+    assert labels == ["benign", "XSS", "benign"]
+    assert pipe.calls == 1
+
+
+def test_scheduler_batches_concurrent_submits():
+    batches = []
+
+    def predict_fn(payloads):
+        batches.append(list(payloads))
+        return [{"label": p} for p in payloads]
+
+    async def run():
+        sched = BatchScheduler(predict_fn, window_ms=50, max_batch=8)
+        try:
+            return await asyncio.gather(*(sched.submit(str(i)) for i in range(5)))
+        finally:
+            sched.close()
+
+    results = asyncio.run(run())
+    assert [r["label"] for r in results] == ["0", "1", "2", "3", "4"]
+    assert batches == [["0", "1", "2", "3", "4"]]
+
+
+def test_scheduler_flushes_at_max_batch():
+    sizes = []
+
+    def predict_fn(payloads):
+        sizes.append(len(payloads))
+        return [{} for _ in payloads]
+
+    async def run():
+        sched = BatchScheduler(predict_fn, window_ms=10_000, max_batch=2)
+        try:
+            await asyncio.gather(*(sched.submit("x") for _ in range(4)))
+        finally:
+            sched.close()
+
+    asyncio.run(run())
+    assert sizes == [2, 2]
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import waf_middleware
+from model_registry import ModelHandle
+from waf_middleware import MLSettings, WAFMiddleware
+
+
+class AlwaysXSS:
+    classes_ = np.array(["SQLi", "XSS", "benign"])
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict_proba(self, X):
+        self.calls += len(X)
+        return np.tile([0.02, 0.96, 0.02], (len(X), 1))
+
+
+@pytest.fixture
+def waf(monkeypatch, alerts, make_client):
+    pipeline = AlwaysXSS()
+    handle = ModelHandle(pipeline, "test-model", "memory")
+    monkeypatch.setattr(waf_middleware, "get_model", lambda: handle)
+
+    def client_for(**settings):
+        return make_client(WAFMiddleware, settings=MLSettings(**settings))
+
+    return client_for, pipeline, alerts
+
+
+# Not allow-listed (punctuation) and not matched by any regex rule
+PAYLOAD = {"input": "name=obrien, note: hello!"}
+
+
+def test_off_skips_ml(waf):
+    make_client, pipeline, alerts = waf
+    client = make_client(mode="off")
+    assert client.post("/submit", json=PAYLOAD).status_code == 200
+    assert pipeline.calls == 0 and alerts == []
+
+
+def test_async_shadow_logs_would_block_without_blocking(waf):
+    make_client, pipeline, alerts = waf
+    client = make_client(mode="shadow_async")
+    assert client.post("/submit", json=PAYLOAD).status_code == 200
+    assert pipeline.calls == 1
+    assert len(alerts) == 1
+    result = alerts[0]["detection_result"]
+    assert result["detection_source"] == "ml_shadow"
+    assert result["label"] == "XSS"
+
+
+def test_sampled_shadow_respects_rate(waf):
+    make_client, pipeline, alerts = waf
+    client = make_client(mode="shadow_sampled", sample_rate=0.0)
+    client.post("/submit", json=PAYLOAD)
+    assert pipeline.calls == 0
+
+    client = make_client(mode="shadow_sampled", sample_rate=1.0)
+    assert client.post("/submit", json=PAYLOAD).status_code == 200
+    assert pipeline.calls == 1 and len(alerts) == 1
+
+
+def test_enforce_uses_conf_thresh(waf):
+    make_client, pipeline, alerts = waf
+    client = make_client(mode="enforce")
+    # ML_CONF_THRESH = 1.0: scored, but never blocks and nothing is logged
+    assert client.post("/submit", json=PAYLOAD).status_code == 200
+    assert pipeline.calls == 1 and alerts == []
+
+
+def test_invalid_mode_rejected():
+    with pytest.raises(ValueError):
+        MLSettings(mode="sometimes")
@@ -0,0 +1,132 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.pipeline import FeatureUnion, Pipeline
+
+from cascade import CascadePipeline, fit_linear_stage
+from model_artifact import ArtifactError, export_pipeline, load_artifact
+from model_registry import ModelRegistry
+from scripts.feature_utils import HashingTfidfVectorizer, SideChannelFeatures
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    train = pd.read_json("dataset/train/waf_dataset_train.jsonl", lines=True)
+    train = train.sample(n=2000, random_state=0)
+    test = pd.read_json("dataset/test/waf_dataset_test.jsonl", lines=True)
+    features = FeatureUnion(
+        [
+            ("word_tfidf", TfidfVectorizer(ngram_range=(1, 2), max_features=2000)),
+            (
+                "char_tfidf",
+                TfidfVectorizer(analyzer="char", ngram_range=(3, 5), max_features=1500),
+            ),
+            ("side", SideChannelFeatures()),
+        ]
+    )
+    pipeline = Pipeline(
+        [
+            ("features", features),
+            ("clf", RandomForestClassifier(n_estimators=15, random_state=0)),
+        ]
+    )
+    pipeline.fit(train["input"], train["label"])
+    payloads = test["input"].tolist() + ["", "\x00 union\x00", "émoji 🚀 <svg>"]
+    payloads += ["a" * 5000, "id=1 " + "b" * 4097 + " union"]  # terms > 4096 chars
+    return pipeline, payloads
+
+
+def test_artifact_matches_pipeline(fitted, tmp_path):
+    pipeline, payloads = fitted
+    export_pipeline(pipeline, str(tmp_path))
+    fast = load_artifact(str(tmp_path))
+
+    assert list(fast.classes_) == list(pipeline.classes_)
+    assert np.array_equal(
+        fast.predict_proba(payloads), pipeline.predict_proba(payloads)
+    )
+    assert list(fast.predict(payloads[:50])) == list(pipeline.predict(payloads[:50]))
+
+
+def test_corrupt_array_is_rejected(fitted, tmp_path):
+    pipeline, _ = fitted
+    manifest = export_pipeline(pipeline, str(tmp_path))
+    target = tmp_path / manifest["arrays"]["forest_threshold"]["file"]
+    data = bytearray(target.read_bytes())
+    data[-1] ^= 0xFF
+    target.write_bytes(bytes(data))
+
+    with pytest.raises(ArtifactError):
+        load_artifact(str(tmp_path))
+    load_artifact(str(tmp_path), verify=False)  # opt-out still opens it
+
+
+def test_registry_prefers_artifact(fitted, tmp_path):
+    pipeline, payloads = fitted
+    export_pipeline(pipeline, str(tmp_path / "mmap"))
+
+    def pickle_loader(path):
+        raise AssertionError("pickle should not be loaded")
+
+    reg = ModelRegistry(
+        str(tmp_path / "missing.pkl"),
+        check_interval=-1,
+        loader=pickle_loader,
+        artifact_path=str(tmp_path / "mmap"),
+    )
+    handle = reg.current()
+    assert handle.path == os.path.join(str(tmp_path / "mmap"), "manifest.json")
+    assert list(handle.classes) == list(pipeline.classes_)
+
+
+def test_hashing_features_export(fitted, tmp_path):
+    _, payloads = fitted
+    train = pd.read_json("dataset/train/waf_dataset_train.jsonl", lines=True)
+    train = train.sample(n=1000, random_state=1)
+    pipeline = Pipeline(
+        [
+            (
+                "features",
+                FeatureUnion(
+                    [
+                        ("word", HashingTfidfVectorizer(n_features=2**12)),
+                        (
+                            "char",
+                            HashingTfidfVectorizer(
+                                analyzer="char", ngram_range=(3, 5), n_features=2**12
+                            ),
+                        ),
+                        ("side", SideChannelFeatures()),
+                    ]
+                ),
+            ),
+            ("clf", RandomForestClassifier(n_estimators=10, random_state=0)),
+        ]
+    )
+    pipeline.fit(train["input"], train["label"])
+    export_pipeline(pipeline, str(tmp_path))
+    fast = load_artifact(str(tmp_path))
+    assert np.array_equal(
+        fast.predict_proba(payloads), pipeline.predict_proba(payloads)
+    )
+
+
+def test_cascade_round_trip(fitted, tmp_path):
+    pipeline, payloads = fitted
+    train = pd.read_json("dataset/train/waf_dataset_train.jsonl", lines=True)
+    features = pipeline.named_steps["features"].transform(train["input"][:1000])
+    linear = fit_linear_stage(features, train["label"][:1000])
+    cascade = CascadePipeline(pipeline, linear, 0.1, 0.9)
+
+    export_pipeline(cascade, str(tmp_path))
+    fast = load_artifact(str(tmp_path))
+    assert isinstance(fast, CascadePipeline)
+    assert (fast.low, fast.high) == (0.1, 0.9)
+    expected, expected_routed = cascade.predict_proba_routed(payloads)
+    actual, routed = fast.predict_proba_routed(payloads)
+    assert np.array_equal(routed, expected_routed)
+    assert np.allclose(actual, expected, rtol=0, atol=1e-12)
@@ -0,0 +1,73 @@
+import os
+import time
+
+from model_registry import ModelRegistry
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    # Make sure the mtime changes even on coarse-grained filesystems
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def wait_for(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_lazy_load_and_hot_swap(tmp_path):
+    path = str(tmp_path / "model.txt")
+    write(path, "v1")
+    loads = []
+
+    def loader(p):
+        loads.append(p)
+        with open(p) as f:
+            return f.read()
+
+    reg = ModelRegistry(path, check_interval=0, loader=loader)
+    assert loads == []  # nothing loaded until first use
+    first = reg.current()
+    assert first.pipeline == "v1"
+
+    write(path, "v2")
+    reg.current()  # notices the change, reloads in the background
+    assert wait_for(lambda: reg.current().pipeline == "v2")
+    assert reg.current().version != first.version
+    assert first.pipeline == "v1"  # old handle is untouched
+
+
+def test_failed_reload_keeps_current_model(tmp_path):
+    path = str(tmp_path / "model.txt")
+    write(path, "good")
+
+    def loader(p):
+        with open(p) as f:
+            text = f.read()
+        if text == "broken":
+            raise ValueError("corrupt artifact")
+        return text
+
+    reg = ModelRegistry(path, check_interval=0, loader=loader)
+    assert reg.current().pipeline == "good"
+    write(path, "broken")
+    reg.current()
+    assert wait_for(lambda: reg.failed_reloads == 1)
+    assert reg.current().pipeline == "good"
+
+
+def test_attachment_built_once_per_handle(tmp_path):
+    path = str(tmp_path / "model.txt")
+    write(path, "v1")
+    reg = ModelRegistry(path, check_interval=-1, loader=lambda p: object())
+    calls = []
+    handle = reg.current()
+    for _ in range(3):
+        handle.attachment("explainer", lambda h: calls.append(h) or "built")
+    assert calls == [handle]
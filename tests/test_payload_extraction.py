@@ -0,0 +1,73 @@
+import json
+
+import pytest
+from fastapi import Request
+
+from payload_extraction import MAX_DEPTH, ParsedBody, parsed_body, string_leaves
+from waf_asgi import WAFASGIMiddleware
+from waf_middleware import WAFMiddleware
+
+
+def test_collects_nested_string_leaves_in_order():
+    doc = {"input": "a", "user": {"name": "b", "tags": ["c", 1, None, {"x": "d"}]}}
+    body = ParsedBody(json.dumps(doc).encode())
+    assert body.is_json and not body.truncated
+    # Object keys are leaves too, each just before its value
+    assert body.strings == ["input", "a", "user", "name", "b", "tags", "c", "x", "d"]
+    assert ParsedBody(b'["hello"]').payload == "hello"
+
+
+def test_limits_truncate_the_walk():
+    nested = "x"
+    for _ in range(MAX_DEPTH + 5):
+        nested = [nested]
+    body = ParsedBody(json.dumps({"input": "top", "deep": nested}).encode())
+    assert body.strings == ["input", "top", "deep"] and body.truncated
+    # Whatever the walk skipped is still inspected, as raw text
+    assert '"x"' in body.payload
+    assert string_leaves(["a", "b", "c"], max_strings=2) == (["a", "b"], True)
+
+
+def test_non_json_and_pathological_bodies_fall_back_to_text():
+    body = ParsedBody(b"q=<script>")
+    assert not body.is_json and body.payload == "q=<script>"
+    # Far deeper than MAX_DEPTH (or than the decoders accept): no crash
+    deep = b"[" * 100_000 + b"]" * 100_000
+    assert ParsedBody(deep).payload == deep.decode()
+
+
+async def submit(request: Request):
+    cached = request.state.parsed_body
+    assert await parsed_body(request) is cached
+    return {"strings": cached.strings}
+
+
+@pytest.mark.parametrize("middleware", [WAFMiddleware, WAFASGIMiddleware])
+def test_parse_is_shared_with_the_endpoint(alerts, make_client, middleware):
+    client = make_client(middleware, endpoint=submit)
+    res = client.post("/submit", json={"input": "hi", "meta": {"note": "ok"}})
+    assert res.status_code == 200
+    assert res.json() == {"strings": ["input", "hi", "meta", "note", "ok"]}
+
+    # An attack outside "input" is inspected too
+    res = client.post(
+        "/submit", json={"input": "hi", "meta": ["<script>alert(1)</script>"]}
+    )
+    assert res.status_code == 403
+    assert alerts[0]["detection_result"]["label"] == "XSS"
+
+    # A benign first leaf must not allow-list an attack in a later one
+    res = client.post(
+        "/submit",
+        json={"name": "bob", "input": "1 UNION SELECT password FROM users"},
+    )
+    assert res.status_code == 403
+    assert alerts[1]["detection_result"]["label"] == "SQLi"
+
+    # So is an attack in an object key
+    res = client.post("/submit", json={"<script>alert(1)</script>": 1})
+    assert res.status_code == 403
+    assert alerts[2]["detection_result"]["label"] == "XSS"
+    res = client.post("/submit", json={"q": {"' OR 1=1 --": "x"}})
+    assert res.status_code == 403
+    assert alerts[3]["detection_result"]["label"] == "SQLi"
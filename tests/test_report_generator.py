@@ -0,0 +1,131 @@
+import json
+from collections import Counter
+from datetime import datetime
+
+import report_generator
+from alert_logger import EXPLANATION_PENDING
+from alert_store import AlertStore
+from report_generator import ReportStats, TopK, generate_report, iter_alerts, utc
+
+
+def alert(i, attack_type="XSS", client_ip=None):
+    return {
+        "timestamp": f"2026-01-0{1 + i % 3}T{i % 24:02d}:00:00",
+        "client_ip": client_ip or f"10.0.0.{i % 4}",
+        "attack_type": attack_type,
+        "pattern": "<script>" if attack_type == "XSS" else None,
+        "explanation": "Détecté → <script>",  # not Latin-1 encodable
+        "severity": "High",
+        "source": "regex",
+        "confidence": 1.0,
+    }
+
+
+def write_log(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(r) + "\n" for r in records)
+        f.write("not json\n")
+
+
+def test_topk_finds_heavy_hitters_in_bounded_space():
+    top = TopK(capacity=10)
+    stream = ["a"] * 500 + ["b"] * 300 + [f"noise-{i}" for i in range(1000)]
+    for i, item in enumerate(stream):
+        top.add(stream[(i * 7919) % len(stream)])  # interleaved
+    assert len(top.counts) == 10
+    (first, count_a, err_a), (second, count_b, err_b) = top.most_common(2)
+    assert (first, second) == ("a", "b")
+    assert count_a - err_a <= 500 <= count_a
+    assert count_b - err_b <= 300 <= count_b
+
+
+def test_topk_is_exact_without_evictions():
+    top = TopK(capacity=10)
+    for item in "abacabaa":
+        top.add(item)
+    assert top.most_common(2) == [("a", 5, 0), ("b", 2, 0)]
+
+
+def test_stats_are_bounded_and_counted_in_one_pass():
+    stats = ReportStats(top_tracked=5, sample_rows=3, seed=0)
+    for i in range(1000):
+        record = alert(i, client_ip=f"10.1.{i // 256}.{i % 256}")
+        stats.add(record, utc(record["timestamp"]))
+    assert stats.total == 1000
+    assert len(stats.sample) == 3 and len(stats.client_ips.counts) == 5
+    assert sum(stats.by_hour) == 1000 and stats.by_hour[0] == 42
+    assert stats.first == datetime(2026, 1, 1, 0) and stats.by_type["XSS"] == 1000
+
+
+def test_window_filters_jsonl(tmp_path, monkeypatch):
+    path = tmp_path / "alerts.jsonl"
+    write_log(path, [alert(i) for i in range(30)])
+    monkeypatch.setattr(report_generator, "LOG_FILE", str(path))
+    monkeypatch.setattr(report_generator, "ALERT_STORE_DIR", None)
+
+    rows = list(iter_alerts("jsonl", utc("2026-01-02"), utc("2026-01-03T00:00+00:00")))
+    assert len(rows) == 10
+    assert all(ts.date() == datetime(2026, 1, 2).date() for _, ts in rows)
+
+
+def test_report_from_the_store_matches_the_log(tmp_path, monkeypatch):
+    records = [alert(i) for i in range(20)] + [alert(i, "SQLi") for i in range(10)]
+    path = tmp_path / "alerts.jsonl"
+    write_log(path, records)
+    AlertStore(str(tmp_path / "store"), compact_interval=-1).append(records)
+    monkeypatch.setattr(report_generator, "LOG_FILE", str(path))
+    monkeypatch.setattr(report_generator, "ALERT_STORE_DIR", str(tmp_path / "store"))
+
+    since, until = utc("2026-01-01T06:00"), utc("2026-01-03")
+    from_log = generate_report(since, until, "jsonl", str(tmp_path / "log.pdf"))
+    output = tmp_path / "reports" / "store.pdf"
+    from_store = generate_report(since, until, "store", str(output))
+    assert output.read_bytes().startswith(b"%PDF")
+    for stats in (from_log, from_store):
+        assert stats.total == 17
+        assert stats.by_type == Counter({"XSS": 12, "SQLi": 5})
+    assert from_log.client_ips.most_common(4) == from_store.client_ips.most_common(4)
+    assert from_log.by_hour == from_store.by_hour
+
+
+def test_store_is_only_read_when_asked(tmp_path, monkeypatch):
+    # The store was enabled after the first 20 alerts were logged
+    path = tmp_path / "alerts.jsonl"
+    write_log(path, [alert(i) for i in range(30)])
+    store = AlertStore(str(tmp_path / "store"), compact_interval=-1)
+    store.append([alert(i) for i in range(20, 30)])
+    monkeypatch.setattr(report_generator, "LOG_FILE", str(path))
+    monkeypatch.setattr(report_generator, "ALERT_STORE_DIR", str(tmp_path / "store"))
+
+    assert len(list(iter_alerts())) == 30
+    assert len(list(iter_alerts("store"))) == 10
+
+
+def test_empty_window_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_generator, "LOG_FILE", str(tmp_path / "missing"))
+    monkeypatch.setattr(report_generator, "ALERT_STORE_DIR", None)
+    assert generate_report(output=str(tmp_path / "r.pdf")) is None
+    assert not (tmp_path / "r.pdf").exists()
+
+
+def test_sample_shows_deferred_explanations(tmp_path, monkeypatch):
+    pending = dict(alert(0), source="ml", explanation=EXPLANATION_PENDING)
+    records = [dict(pending, request_id=f"r{i}") for i in range(3)]
+    path, explanations = tmp_path / "alerts.jsonl", tmp_path / "explanations.jsonl"
+    write_log(path, records)
+    write_log(
+        explanations,
+        [
+            {"request_id": "r0", "status": "ok", "explanation": "why"},
+            {"request_id": "r1", "status": "dropped", "explanation": None},
+        ],
+    )
+    monkeypatch.setattr(report_generator, "LOG_FILE", str(path))
+    monkeypatch.setattr(report_generator, "EXPLANATION_LOG_FILE", str(explanations))
+
+    stats = generate_report(output=str(tmp_path / "r.pdf"))
+    assert sorted(a["explanation"] for a in stats.sample) == [
+        "Explanation pending.",
+        "Explanation unavailable (dropped).",
+        "why",
+    ]
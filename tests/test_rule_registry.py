@@ -0,0 +1,130 @@
+import json
+import os
+import time
+
+import pytest
+
+from detection_engine import (
+    RULES_PATH,
+    RuleBundleError,
+    detect_attack,
+    load_rule_bundle,
+)
+from explainability import explain_detection
+from rule_registry import RuleRegistry
+from threat_scoring import score_threat
+
+
+def write_bundle(path, rules):
+    with open(path, "w") as f:
+        json.dump({"rules": rules}, f)
+    # Make sure the mtime changes even on coarse-grained filesystems
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def rule(id, pattern, label="XSS", severity="High", explanation="why"):
+    return dict(
+        id=id, label=label, severity=severity, pattern=pattern, explanation=explanation
+    )
+
+
+def wait_for(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_bundled_rules_carry_severity_and_explanation():
+    res = detect_attack({"body": "1 UNION SELECT name FROM users"})
+    assert res["label"] == "SQLi" and "union select" in res["pattern"]
+    assert res["rule_id"] == "sqli-union-select"
+    assert res["rule_severity"] == "High"
+    res.update(detection_source="regex", confidence=1.0)
+    assert "UNION SELECT" in explain_detection(res, "")
+    # Every bundled rule has its own explanation
+    rules = load_rule_bundle(RULES_PATH)
+    assert all(rules.explanation(pat) for _, pat in rules.rules)
+
+
+def test_rule_severity_sets_base_level():
+    res = {"label": "SQLi", "rule_severity": "Low", "confidence": 0.8}
+    assert score_threat(res) == "Low"
+    assert score_threat({"label": "SQLi", "confidence": 0.8}) == "Medium"
+
+
+def test_version_covers_explanations(tmp_path):
+    path = str(tmp_path / "rules.json")
+    write_bundle(path, [rule("a", "evil")])
+    first = load_rule_bundle(path)
+    write_bundle(path, [rule("a", "evil", explanation="other text")])
+    assert load_rule_bundle(path).version != first.version
+
+
+@pytest.mark.parametrize(
+    "rules",
+    [
+        [rule("a", "(unclosed")],
+        [rule("a", "x"), rule("a", "y")],
+        [rule("a", "x", severity="Critical")],
+        [{"id": "a", "pattern": "x"}],
+        # Compile on their own, but not inside the combined alternation
+        [rule("a", "x"), rule("b", r"""(['"]).*\1""")],
+        [rule("a", "(?s)<script.*>")],
+        [rule("a", "(?P<r1>x)"), rule("b", "y")],
+        [rule("a", "(?P<q>x)"), rule("b", "(?P<q>y)")],
+    ],
+)
+def test_invalid_bundles_rejected(tmp_path, rules):
+    path = str(tmp_path / "rules.json")
+    write_bundle(path, rules)
+    with pytest.raises(RuleBundleError):
+        load_rule_bundle(path)
+
+
+def test_named_references_are_combined(tmp_path):
+    path = str(tmp_path / "rules.json")
+    write_bundle(path, [rule("a", "x"), rule("b", r"""(?P<q>['"]).*(?P=q)""")])
+    rules = load_rule_bundle(path)
+    assert rules.match("say 'hi'") == ("XSS", r"""(?P<q>['"]).*(?P=q)""")
+    assert rules.match("say 'hi\"") is None
+
+
+def test_edited_rule_losing_its_safe_form_warns(tmp_path, caplog):
+    path = str(tmp_path / "rules.json")
+    write_bundle(path, [rule("xss-script-tag", "<script.*?>.*?</script>")])
+    load_rule_bundle(path)
+    assert not caplog.records
+    write_bundle(path, [rule("xss-script-tag", "<script.*?>.*?</script >")])
+    load_rule_bundle(path)
+    assert "xss-script-tag" in caplog.records[0].getMessage()
+
+
+def test_hot_swap_keeps_old_rule_set_intact(tmp_path):
+    path = str(tmp_path / "rules.json")
+    write_bundle(path, [rule("a", "evil")])
+    reg = RuleRegistry(path, check_interval=0)
+    first = reg.current()
+    assert first.match("so evil") == ("XSS", "evil")
+
+    write_bundle(path, [rule("b", "wicked", label="SQLi")])
+    reg.current()  # notices the change, compiles in the background
+    assert wait_for(lambda: reg.current().version != first.version)
+    assert reg.current().match("so wicked") == ("SQLi", "wicked")
+    # A request still holding the old set is unaffected
+    assert first.match("so evil") == ("XSS", "evil")
+    assert reg.last_compile_ms is not None and reg.last_swap_ms is not None
+
+
+def test_failed_reload_keeps_current_rules(tmp_path):
+    path = str(tmp_path / "rules.json")
+    write_bundle(path, [rule("a", "evil")])
+    reg = RuleRegistry(path, check_interval=0)
+    first = reg.current()
+    write_bundle(path, [rule("a", "(broken")])
+    reg.current()
+    assert wait_for(lambda: reg.failed_reloads == 1)
+    assert reg.current() is first
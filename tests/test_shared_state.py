@@ -0,0 +1,97 @@
+import multiprocessing
+import time
+
+from shared_state import (
+    BUCKET_SLOTS,
+    SharedClientReputation,
+    SharedTable,
+    SharedVerdictCache,
+)
+
+
+def key(i):
+    return i.to_bytes(16, "little")
+
+
+def test_table_put_get_and_expiry(tmp_path):
+    table = SharedTable(str(tmp_path / "t.shm"), 64, 32)
+    assert table.put(key(1), b"one", time.time() + 60)
+    assert table.put(key(2), b"two", time.time() - 1)
+    assert table.get(key(1)) == b"one"
+    assert table.get(key(2)) is None
+    assert table.get(key(3)) is None
+    assert not table.put(key(4), b"x" * 33, time.time() + 60)
+
+
+def test_full_bucket_evicts_entry_closest_to_expiry(tmp_path):
+    table = SharedTable(str(tmp_path / "t.shm"), BUCKET_SLOTS, 8)
+    now = time.time()
+    for i in range(BUCKET_SLOTS):
+        table.put(key(i), b"v", now + 100 + i)
+    table.put(key(99), b"new", now + 100)
+    assert table.get(key(0)) is None
+    assert table.get(key(99)) == b"new"
+    assert len(list(table.values())) == BUCKET_SLOTS
+    assert table.evictions == 1
+
+
+def test_mappings_of_one_file_share_entries(tmp_path):
+    path = str(tmp_path / "t.shm")
+    a, b = SharedTable(path, 64, 32), SharedTable(path, 64, 32)
+    a.put(key(1), b"from a", time.time() + 60)
+    assert b.get(key(1)) == b"from a"
+    # Opening with another layout starts from an empty table, in a new file:
+    # the tables already mapped keep working on the old one
+    c = SharedTable(path, 128, 32)
+    assert c.get(key(1)) is None
+    assert a.get(key(1)) == b"from a"
+    c.put(key(2), b"from c", time.time() + 60)
+    assert SharedTable(path, 128, 32).get(key(2)) == b"from c"
+
+
+def test_verdict_shared_between_caches(tmp_path):
+    path = str(tmp_path / "verdicts.shm")
+    a, b = SharedVerdictCache(path, 100), SharedVerdictCache(path, 100)
+    k = a.key("<script>", {}, "r1", "m1")
+    a.put(k, {"result": {"is_malicious": True}, "severity": "High"})
+    assert b.get(k) == {"result": {"is_malicious": True}, "severity": "High"}
+    assert b.stats()["shared_hits"] == 1
+    # Promoted into b's local tier
+    assert b.get(k) is not None and b.stats()["shared_hits"] == 1
+
+    a.put(a.key("big", {}, "r1", "m1"), {"explanation": "x" * 2000})
+    assert a.stats()["local_only"] == 1
+
+
+def _record_blocks(path, client, count):
+    reputation = SharedClientReputation(path, threshold=3)
+    for _ in range(count):
+        reputation.record_block(client)
+
+
+def test_reputation_counts_blocks_from_other_processes(tmp_path):
+    path = str(tmp_path / "reputation.shm")
+    reputation = SharedClientReputation(path, threshold=3)
+    child = multiprocessing.get_context("fork").Process(
+        target=_record_blocks, args=(path, "1.2.3.4", 2)
+    )
+    child.start()
+    child.join()
+    assert not reputation.is_banned("1.2.3.4")
+    assert reputation.record_block("1.2.3.4")
+    assert reputation.is_banned("1.2.3.4")
+    assert reputation.stats()["banned"] == 1
+
+
+def test_workers_share_bans(tmp_path, alerts, make_client):
+    state_dir = str(tmp_path)
+    worker_1 = make_client(reputation_threshold=3, shared_state_dir=state_dir)
+    worker_2 = make_client(reputation_threshold=3, shared_state_dir=state_dir)
+    attack = {"input": "<script>alert(1)</script>"}
+    worker_1.post("/submit", json=attack)
+    worker_2.post("/submit", json=attack)
+    worker_1.post("/submit", json=attack)
+    assert len(alerts) == 3
+    # Banned in both workers after 3 blocks spread across them
+    assert worker_2.post("/submit", json={"input": "hi"}).status_code == 403
+    assert len(alerts) == 3
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app_demo
+import waf_middleware
+from metrics import REGISTRY, Registry
+from model_registry import ModelHandle
+
+
+class AlwaysBenign:
+    classes_ = np.array(["SQLi", "XSS", "benign"])
+
+    def predict_proba(self, X):
+        return np.tile([0.01, 0.01, 0.98], (len(X), 1))
+
+
+@pytest.fixture
+def model(monkeypatch, alerts):
+    handle = ModelHandle(AlwaysBenign(), "test-model", "memory")
+    monkeypatch.setattr(waf_middleware, "get_model", lambda: handle)
+    return handle
+
+
+def stage_count(stage):
+    snapshot = REGISTRY.snapshot().get(f'waf_stage_seconds{{stage="{stage}"}}')
+    return snapshot["count"] if snapshot else 0
+
+
+def decisions(source, label):
+    return REGISTRY.counter("waf_decisions_total", "").value(source, label)
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    registry.histogram("t_seconds", "T", (0.1, 1.0), labels={"stage": 'a"b'}).observe(
+        0.5
+    )
+    registry.counter("d_total", "D", ("source", "label")).inc("regex", "XSS")
+    assert registry.render().splitlines() == [
+        "# HELP t_seconds T",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{stage="a\\"b",le="0.1"} 0',
+        't_seconds_bucket{stage="a\\"b",le="1.0"} 1',
+        't_seconds_bucket{stage="a\\"b",le="+Inf"} 1',
+        't_seconds_sum{stage="a\\"b"} 0.5',
+        't_seconds_count{stage="a\\"b"} 1',
+        "# HELP d_total D",
+        "# TYPE d_total counter",
+        'd_total{source="regex",label="XSS"} 1',
+    ]
+
+
+@pytest.mark.parametrize("middleware", ["asgi", "base"])
+def test_stages_and_decisions_are_recorded(model, middleware):
+    client = TestClient(app_demo.create_app(middleware))
+    before = {s: stage_count(s) for s in ("total", "detect_attack", "ml_inference")}
+    blocked, benign = decisions("regex", "XSS"), decisions("ml", "benign")
+
+    assert (
+        client.post("/submit", json={"input": "<script>x</script>"}).status_code == 403
+    )
+    assert client.post("/submit", json={"input": "x=1; y=2"}).status_code == 200
+    assert decisions("regex", "XSS") == blocked + 1
+    assert decisions("ml", "benign") == benign + 1
+    assert stage_count("total") == before["total"] + 2
+    assert stage_count("detect_attack") == before["detect_attack"] + 2
+    assert stage_count("ml_inference") == before["ml_inference"] + 1
+
+
+def test_metrics_can_be_switched_off(alerts, make_client):
+    client = make_client(stage_metrics=False)
+    before = stage_count("total")
+    assert client.post("/submit", json={"input": "x=1; y=2"}).status_code == 200
+    assert stage_count("total") == before
+
+
+def test_metrics_endpoint_is_local_only(model):
+    app = app_demo.create_app()
+    TestClient(app).post("/submit", json={"input": "x=1; y=2"})
+    local = TestClient(app, client=("127.0.0.1", 50000)).get("/metrics")
+    assert local.status_code == 200
+    assert local.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'waf_stage_seconds_bucket{stage="total",le="+Inf"}' in local.text
+    assert "# TYPE waf_decisions_total counter" in local.text
+    assert TestClient(app).get("/metrics").status_code == 404
@@ -0,0 +1,34 @@
+import time
+
+from verdict_cache import VerdictCache
+
+
+def test_hit_miss_and_lru_eviction():
+    cache = VerdictCache(max_entries=2, ttl_seconds=60)
+    keys = [cache.key(p, {}, "r1", "m1") for p in ("a", "b", "c")]
+    cache.put(keys[0], "A")
+    cache.put(keys[1], "B")
+    assert cache.get(keys[0]) == "A"  # refreshes "a"
+    cache.put(keys[2], "C")  # evicts "b", the least recently used
+    assert cache.get(keys[1]) is None
+    assert cache.stats()["evictions"] == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_ttl_expiry():
+    cache = VerdictCache(ttl_seconds=0.01)
+    key = cache.key("a", {}, "r1", "m1")
+    cache.put(key, "A")
+    time.sleep(0.02)
+    assert cache.get(key) is None
+    assert cache.expirations == 1
+
+
+def test_version_change_invalidates():
+    cache = VerdictCache()
+    old = cache.key("a", {"q": "1"}, "r1", "m1")
+    cache.put(old, "A")
+    new = cache.key("a", {"q": "1"}, "r2", "m1")
+    assert new != old
+    assert len(cache) == 0
+    assert cache.invalidations == 1
@@ -0,0 +1,45 @@
+from fastapi import Request
+
+
+async def submit(request: Request):
+    body = await request.body()
+    return {"size": len(body), "waf": request.state.waf["detection_source"]}
+
+
+def test_benign_body_replayed_to_app(alerts, make_client):
+    client = make_client(endpoint=submit)
+    res = client.post("/submit", json={"input": "name=obrien, note: hello!"})
+    assert res.status_code == 200
+    assert res.json()["waf"] == "regex"
+    assert res.json()["size"] == len(b'{"input":"name=obrien, note: hello!"}')
+    assert alerts == []
+
+
+def test_attack_in_chunked_body_is_blocked(alerts, make_client):
+    client = make_client(endpoint=submit)
+    chunks = [b'{"input": "<scr', b"ipt>alert(1)</sc", b'ript>"}']
+    res = client.post(
+        "/submit", content=iter(chunks), headers={"content-type": "application/json"}
+    )
+    assert res.status_code == 403
+    assert alerts[0]["detection_result"]["label"] == "XSS"
+
+
+def test_oversized_body_rejected(alerts, make_client):
+    client = make_client(endpoint=submit, max_body_size=64)
+    res = client.post("/submit", json={"input": "a" * 100})
+    assert res.status_code == 413
+
+
+def test_oversized_body_prefix_inspected_and_streamed(alerts, make_client):
+    client = make_client(
+        endpoint=submit, max_body_size=64, oversize_policy="inspect_prefix"
+    )
+    body = b"hello " * 10 + b"<script>alert(1)</script>"
+    res = client.post("/submit", content=iter([body[:40], body[40:]]))
+    # The attack starts past the inspected prefix; the app sees every byte
+    assert res.status_code == 200
+    assert res.json()["size"] == len(body)
+
+    res = client.post("/submit", content=b"<script>alert(1)</script>" + b"x" * 100)
+    assert res.status_code == 403
@@ -0,0 +1,103 @@
+# verdict_cache.py
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+
+class VerdictCache:
+    """
+    Bounded in-process LRU cache of WAF verdicts with a per-entry TTL.
+
+    Keys are digests of the inspected request data plus the rule-set and
+    model versions, so a rule or model change never serves a stale verdict:
+    the first key built with new versions also drops every existing entry.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 300.0):
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[bytes, Tuple[float, Any]]" = OrderedDict()
+        self._versions: Optional[Tuple[str, str]] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # dropped for size
+        self.expirations = 0  # dropped for age
+        self.invalidations = 0  # full clears on a version change
+
+    def key(
+        self,
+        payload: str,
+        query: Mapping[str, str],
+        rules_version: str,
+        model_version: str,
+    ) -> bytes:
+        versions = (rules_version, model_version)
+        if versions != self._versions:
+            with self._lock:
+                if self._versions is not None and self._entries:
+                    self._entries.clear()
+                    self.invalidations += 1
+                self._versions = versions
+
+        h = hashlib.blake2b(digest_size=16)
+        for part in (
+            rules_version,
+            model_version,
+            payload,
+            json.dumps(query, sort_keys=True, separators=(",", ":")),
+        ):
+            h.update(part.encode("utf-8", "surrogatepass"))
+            h.update(b"\x00")
+        return h.digest()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, verdict = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return verdict
+
+    def put(self, key: bytes, verdict: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, verdict)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
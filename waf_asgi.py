@@ -0,0 +1,136 @@
+# waf_asgi.py
+
+from collections import deque
+from time import perf_counter
+
+from fastapi import Request
+from starlette.responses import JSONResponse
+
+from payload_extraction import ParsedBody
+from waf_middleware import (
+    INSPECTED_METHODS,
+    WAFEngine,
+    _waf_state,
+    blocked_response,
+    client_host,
+)
+
+# ─── Configuration ─────────────────────────────────────────────────────────────
+MAX_BODY_SIZE = 1024 * 1024  # bytes of request body buffered for inspection
+# What to do with bodies above MAX_BODY_SIZE:
+#   reject          answer 413 as soon as the limit is crossed
+#   inspect_prefix  inspect the first MAX_BODY_SIZE bytes, stream the rest
+OVERSIZE_POLICY = "reject"
+_POLICIES = ("reject", "inspect_prefix")
+
+
+class WAFASGIMiddleware:
+    """
+    Pure-ASGI variant of WAFMiddleware running the same WAFEngine.
+
+    The body is read chunk by chunk straight from `receive`; the size limit
+    is checked as each chunk arrives, so an oversized body is refused (or
+    cut off for inspection) without buffering past the limit. The buffered
+    chunk messages are then replayed to the app as they were received, and
+    anything after them is passed through from the client. A fully buffered
+    body is parsed once and left in request.state.parsed_body for the
+    endpoint (payload_extraction.parsed_body).
+
+    No per-request task or response stream wrapping, unlike
+    BaseHTTPMiddleware; the shadow_async scoring runs once the app has
+    sent its response.
+    """
+
+    def __init__(
+        self,
+        app,
+        max_body_size: int = MAX_BODY_SIZE,
+        oversize_policy: str = OVERSIZE_POLICY,
+        **engine_options,
+    ):
+        if oversize_policy not in _POLICIES:
+            raise ValueError(
+                f"oversize_policy must be one of {_POLICIES}, got {oversize_policy!r}"
+            )
+        self.app = app
+        self.max_body_size = max_body_size
+        self.oversize_policy = oversize_policy
+        self.engine = WAFEngine(**engine_options)
+        self.oversized = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in INSPECTED_METHODS:
+            await self.app(scope, receive, send)
+            return
+        metrics = self.engine.metrics
+        start = perf_counter() if metrics else 0.0
+        if self.engine.short_circuit(client_host(scope)):
+            # Banned repeat offender: refused before the body is read
+            await blocked_response()(scope, receive, send)
+            return
+
+        # 1) Buffer the body up to the limit, one chunk at a time
+        messages = []
+        size = 0
+        truncated = False
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Client went away mid-body: hand over what we have
+                messages.append(message)
+                break
+            messages.append(message)
+            size += len(message.get("body", b""))
+            if size > self.max_body_size:
+                self.oversized += 1
+                if self.oversize_policy == "reject":
+                    if metrics:
+                        metrics.decisions.inc("size_limit", "rejected")
+                    response = JSONResponse(
+                        status_code=413, content={"detail": "Request body too large"}
+                    )
+                    await response(scope, receive, send)
+                    return
+                truncated = True
+                break
+            if not message.get("more_body", False):
+                break
+
+        request = Request(scope)
+        try:
+            raw = b"".join(m.get("body", b"") for m in messages)
+            if truncated:
+                parsed = ParsedBody(raw[: self.max_body_size])
+            else:
+                parsed = ParsedBody(raw)
+                request.state.parsed_body = parsed
+            payload = parsed.payload
+        except Exception as err:
+            print("❌ WAF internal error:", err)
+            if metrics:
+                metrics.decisions.inc("error", "benign")
+            waf_state, shadow = _waf_state("error", 0.0), None
+        else:
+            if metrics:
+                metrics.lap("body_parse", start)
+            # 2) Same decision pipeline as WAFMiddleware
+            waf_state, shadow = await self.engine.inspect(request, payload)
+            if metrics:
+                metrics.lap("total", start)
+
+        if waf_state is None:
+            await blocked_response()(scope, receive, send)
+            return
+        request.state.waf = waf_state  # stored in scope["state"]
+
+        # 3) Replay the buffered messages, then continue from the client
+        pending = deque(messages)
+
+        async def replay():
+            if pending:
+                return pending.popleft()
+            return await receive()
+
+        await self.app(scope, replay, send)
+        if shadow is not None:
+            await self.engine.shadow_score(*shadow)
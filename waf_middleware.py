@@ -1,130 +1,572 @@
+import os
+import random
 import re
 import traceback
-import joblib
+import uuid
+from functools import partial
+from time import perf_counter
+from typing import Optional, Tuple
 
 from fastapi import Request
+from starlette.background import BackgroundTasks
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
 
-from detection_engine import detect_attack  # regex engine returning label & pattern
-from explainability import explain_detection  # SHAP / rule explanations
+from detection_engine import RuleSet, detect_attack  # regex engine
+from rule_registry import get_rules  # hot-reloadable rule bundle
+from explainability import (  # SHAP / rule explanations
+    EXPLAIN_QUEUE_SIZE,
+    EXPLAIN_TIME_BUDGET,
+    ExplanationWorker,
+    explain_detection,
+)
 from threat_scoring import score_threat  # refined severity logic
-from alert_logger import log_alert  # structured JSONL logger
+from alert_logger import EXPLANATION_PENDING, log_alert  # structured JSONL logger
+from ml_inference import BatchScheduler, predict_batch  # batched ML inference
+from model_registry import ModelHandle, get_model  # shared, hot-reloadable model
+from verdict_cache import VerdictCache  # LRU + TTL cache of past verdicts
+from client_reputation import ClientReputation  # repeat-offender bans
+from shared_state import SharedClientReputation, SharedVerdictCache  # cross-worker
+from payload_extraction import parsed_body  # one parse per request, shared
+from metrics import REGISTRY  # process-wide metrics (Prometheus text)
 
 # ─── Configuration ─────────────────────────────────────────────────────────────
-MODEL_PATH = "models/attack_classifier_pipeline.pkl"
 ML_CONF_THRESH = 1.0  # raised to 1.0 so ML fallback never blocks (must be >1.0)
 
-# Tighten allow-list: alnum+spaces only if NO SQL keywords present
+# ML evaluation mode, switchable at runtime with set_ml_mode():
+#   off             regex only; the model is never loaded
+#   shadow_sampled  score ML_SHADOW_SAMPLE_RATE of requests inline, never block
+#   shadow_async    score every request after its response is sent, never block
+#   enforce         score inline and block above ML_CONF_THRESH
+# Shadow modes log would-have-blocked decisions with source "ml_shadow".
+ML_MODES = ("off", "shadow_sampled", "shadow_async", "enforce")
+ML_MODE = "enforce"
+ML_SHADOW_SAMPLE_RATE = 0.05  # fraction of requests scored in shadow_sampled
+ML_SHADOW_THRESH = 0.9  # shadow "would have blocked" confidence threshold
+
+# ML micro-batching: concurrent requests are scored together off the event loop
+ML_BATCH_WINDOW_MS = 2.0  # max time a payload waits for batch-mates
+ML_MAX_BATCH = 32  # flush early once this many payloads are pending
+ML_POOL_SIZE = 1  # inference worker threads
+
+# Cascade models: linear stage first, RandomForest only inside the uncertainty
+# band. None = the band calibrated at training time; (low, high) overrides it
+ML_CASCADE_BAND = None
+
+# Verdict cache for repeated payloads (scanners, bots)
+VERDICT_CACHE_SIZE = 10_000  # max cached verdicts (LRU eviction beyond this)
+VERDICT_CACHE_TTL = 300.0  # seconds a verdict stays valid
+
+# Repeat offenders: a client with REPUTATION_THRESHOLD blocked requests within
+# REPUTATION_WINDOW seconds is rejected up front (before its body is read)
+# for REPUTATION_COOLDOWN seconds. A threshold of 0 disables this.
+REPUTATION_THRESHOLD = 20
+REPUTATION_WINDOW = 60.0
+REPUTATION_COOLDOWN = 300.0
+REPUTATION_MAX_CLIENTS = 100_000  # tracked clients (LRU eviction beyond this)
+
+# Cross-worker state: with a directory set (e.g. "/dev/shm/waf-xai"), all
+# workers on the host share recent verdicts and client reputation through
+# memory-mapped tables in it (see shared_state). None keeps both per process.
+SHARED_STATE_DIR: Optional[str] = None
+
+# Per-stage latency histograms and decision counters in metrics.REGISTRY (see
+# PipelineMetrics). False removes the instrumentation: not even a clock read.
+STAGE_METRICS = True
+# Stage latency buckets (s): stages range from microseconds to ML batches
+STAGE_BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    1.0,
+)
+
+# Request methods whose body is inspected
+INSPECTED_METHODS = ("POST", "PUT", "PATCH")
+
+# Tighten allow-list: alnum+spaces only if NO SQL keywords present. DOTALL so
+# the keyword lookahead spans every line, i.e. every JSON leaf of the payload
 ALLOWLIST_RE = re.compile(
     r"^(?!.*\b(?:SELECT|INSERT|UPDATE|DELETE|DROP|UNION|OR)\b)[A-Za-z0-9\s]+$",
-    re.IGNORECASE,
+    re.IGNORECASE | re.DOTALL,
 )
 
-# Load the ML pipeline once at startup
-ml_pipeline = joblib.load(MODEL_PATH)
 
+class MLSettings:
+    """
+    ML stage configuration, read by the middleware on every request so it
+    can be changed while serving.
+    """
 
-class WAFMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.method in ("POST", "PUT", "PATCH"):
-            try:
-                # 1) Extract the raw payload
-                try:
-                    body = await request.json()
-                    payload = body.get("input", "")
-                except Exception:
-                    raw = await request.body()
-                    payload = raw.decode("utf-8", "ignore")
-
-                # 2) Allow-list: pure alnum+spaces, no SQL keywords
-                if ALLOWLIST_RE.fullmatch(payload):
-                    request.state.waf = {
-                        "label": "benign",
-                        "confidence": 1.0,
-                        "is_malicious": False,
-                        "detection_source": "allowlist",
-                        "pattern": None,
-                        "explanation": None,
-                    }
-                    return await call_next(request)
-
-                client_ip = request.client.host
-                user_agent = request.headers.get("user-agent", "unknown")
-
-                # ── Step 1: Regex detection ─────────────────────────
-                regex_res = detect_attack(
-                    {"body": payload, "query": dict(request.query_params)}
-                )
-                regex_res.update({"detection_source": "regex", "confidence": 1.0})
-
-                if regex_res.get("is_malicious"):
-                    explanation = explain_detection(regex_res, payload)
-                    severity = score_threat(regex_res, payload)
-
-                    log_alert(
-                        request=request,
-                        detection_result=regex_res,
-                        explanation=explanation,
-                        severity=severity,
-                        client_ip=client_ip,
-                        user_agent=user_agent,
-                    )
+    def __init__(
+        self,
+        mode: str = ML_MODE,
+        sample_rate: float = ML_SHADOW_SAMPLE_RATE,
+        shadow_threshold: float = ML_SHADOW_THRESH,
+    ):
+        self.mode = ML_MODE
+        self.sample_rate = ML_SHADOW_SAMPLE_RATE
+        self.shadow_threshold = ML_SHADOW_THRESH
+        self.update(mode, sample_rate, shadow_threshold)
 
-                    return JSONResponse(
-                        status_code=403, content={"detail": "Blocked by WAF-XAI"}
-                    )
+    def update(
+        self,
+        mode: Optional[str] = None,
+        sample_rate: Optional[float] = None,
+        shadow_threshold: Optional[float] = None,
+    ) -> None:
+        if mode is not None and mode not in ML_MODES:
+            raise ValueError(f"mode must be one of {ML_MODES}, got {mode!r}")
+        if sample_rate is not None and not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if mode is not None:
+            self.mode = mode
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if shadow_threshold is not None:
+            self.shadow_threshold = shadow_threshold
 
-                # ── Step 2: ML-based fallback (effectively disabled) ───
-                probs = ml_pipeline.predict_proba([payload])[0]
-                confidence = float(round(probs.max(), 3))
-                label = ml_pipeline.predict([payload])[0]
-                is_mal = (label != "benign") and (confidence > ML_CONF_THRESH)
-
-                if is_mal:
-                    ml_res = {
-                        "label": label,
-                        "pattern": None,
-                        "confidence": confidence,
-                        "is_malicious": True,
-                        "detection_source": "ml",
-                    }
-                    explanation = explain_detection(ml_res, payload)
-                    severity = score_threat(ml_res, payload)
-
-                    log_alert(
-                        request=request,
-                        detection_result=ml_res,
-                        explanation=explanation,
-                        severity=severity,
-                        client_ip=client_ip,
-                        user_agent=user_agent,
-                    )
 
-                    return JSONResponse(
-                        status_code=403, content={"detail": "Blocked by WAF-XAI"}
+# Shared by every WAFMiddleware that is not given its own settings
+ml_settings = MLSettings()
+
+
+def set_ml_mode(
+    mode: str,
+    sample_rate: Optional[float] = None,
+    shadow_threshold: Optional[float] = None,
+) -> None:
+    """
+    Switch the ML mode (and optionally the shadow sampling rate/threshold)
+    of the running middleware.
+    """
+    ml_settings.update(mode, sample_rate, shadow_threshold)
+
+
+def _predict_with_current_model(payloads, cascade_band=None):
+    # Runs on the inference pool; each batch uses one consistent model
+    model: ModelHandle = get_model()
+    results = predict_batch(model.pipeline, payloads, cascade_band)
+    for result in results:
+        result["model_version"] = model.version
+    return results
+
+
+def _waf_state(source: str, confidence: float) -> dict:
+    # request.state.waf for requests that are let through
+    return {
+        "label": "benign",
+        "confidence": confidence,
+        "is_malicious": False,
+        "detection_source": source,
+        "pattern": None,
+        "explanation": None,
+    }
+
+
+def client_host(scope) -> str:
+    # Reputation key; scope["client"] is None e.g. on unix sockets
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def regex_result(payload: str, query: dict, rules: RuleSet) -> dict:
+    """The regex stage's detection result for one payload."""
+    result = detect_attack({"body": payload, "query": query}, rules)
+    result.update({"detection_source": "regex", "confidence": 1.0})
+    return result
+
+
+def ml_result(prediction: dict) -> dict:
+    """
+    The ML stage's detection result for one prediction (see predict_batch);
+    malicious only above ML_CONF_THRESH.
+    """
+    confidence = prediction["confidence"]
+    label = prediction["label"]
+    is_mal = (label != "benign") and (confidence > ML_CONF_THRESH)
+    return {
+        "label": label if is_mal else "benign",
+        "pattern": None,
+        "confidence": confidence,
+        "probabilities": prediction["probabilities"],
+        "model_version": prediction["model_version"],
+        "ml_stage": prediction.get("stage"),  # cascade stage, if any
+        "is_malicious": is_mal,
+        "detection_source": "ml",
+    }
+
+
+class PipelineMetrics:
+    """
+    WAF pipeline instrumentation, registered in metrics.REGISTRY:
+      - waf_stage_seconds{stage}: time spent in each stage of a request
+        (STAGES). "verdict_cache" includes building the cache key, and
+        "total" runs from the request's arrival to the decision.
+      - waf_decisions_total{source, label}: requests by the stage that
+        decided and the verdict ("benign" for requests let through)
+
+    lap() observes the time since `start` for a stage and returns the
+    current time, so back-to-back stages cost one clock read each.
+    """
+
+    STAGES = (
+        "body_parse",
+        "allowlist",
+        "verdict_cache",
+        "detect_attack",
+        "ml_inference",
+        "explain_detection",
+        "score_threat",
+        "log_alert",
+        "total",
+    )
+
+    def __init__(self, registry=REGISTRY):
+        self._stages = {
+            stage: registry.histogram(
+                "waf_stage_seconds",
+                "Time spent in each WAF pipeline stage",
+                STAGE_BUCKETS,
+                labels={"stage": stage},
+            )
+            for stage in self.STAGES
+        }
+        self.decisions = registry.counter(
+            "waf_decisions_total",
+            "WAF decisions by deciding stage and verdict",
+            ("source", "label"),
+        )
+
+    def lap(self, stage: str, start: float) -> float:
+        now = perf_counter()
+        self._stages[stage].observe(now - start)
+        return now
+
+
+def blocked_response() -> JSONResponse:
+    return JSONResponse(status_code=403, content={"detail": "Blocked by WAF-XAI"})
+
+
+class WAFEngine:
+    """
+    The allowlist → verdict cache → regex → ML pipeline, independent of how
+    the request body was read. Shared by WAFMiddleware (BaseHTTPMiddleware)
+    and waf_asgi.WAFASGIMiddleware (pure ASGI).
+    """
+
+    def __init__(
+        self,
+        ml_batch_window_ms: float = ML_BATCH_WINDOW_MS,
+        ml_max_batch: int = ML_MAX_BATCH,
+        ml_pool_size: int = ML_POOL_SIZE,
+        ml_cascade_band: Optional[Tuple[float, float]] = ML_CASCADE_BAND,
+        verdict_cache_size: int = VERDICT_CACHE_SIZE,
+        verdict_cache_ttl: float = VERDICT_CACHE_TTL,
+        explain_queue_size: int = EXPLAIN_QUEUE_SIZE,
+        explain_time_budget: float = EXPLAIN_TIME_BUDGET,
+        reputation_threshold: int = REPUTATION_THRESHOLD,
+        reputation_window: float = REPUTATION_WINDOW,
+        reputation_cooldown: float = REPUTATION_COOLDOWN,
+        reputation_max_clients: int = REPUTATION_MAX_CLIENTS,
+        shared_state_dir: Optional[str] = SHARED_STATE_DIR,
+        stage_metrics: bool = STAGE_METRICS,
+        settings: Optional[MLSettings] = None,
+    ):
+        self.ml_settings = settings or ml_settings
+        self.metrics = PipelineMetrics() if stage_metrics else None
+        # ML explanations (SHAP) are built after the 403 is sent
+        self.explainer = ExplanationWorker(
+            max_queue=explain_queue_size, time_budget=explain_time_budget
+        )
+        reputation_options = (
+            reputation_threshold,
+            reputation_window,
+            reputation_cooldown,
+            reputation_max_clients,
+        )
+        if shared_state_dir:
+            os.makedirs(shared_state_dir, exist_ok=True)
+            self.verdict_cache = SharedVerdictCache(
+                os.path.join(shared_state_dir, "verdicts.shm"),
+                verdict_cache_size,
+                verdict_cache_ttl,
+            )
+            reputation = partial(
+                SharedClientReputation,
+                os.path.join(shared_state_dir, "reputation.shm"),
+            )
+        else:
+            self.verdict_cache = VerdictCache(verdict_cache_size, verdict_cache_ttl)
+            reputation = ClientReputation
+        self.ml_scheduler = BatchScheduler(
+            partial(_predict_with_current_model, cascade_band=ml_cascade_band),
+            window_ms=ml_batch_window_ms,
+            max_batch=ml_max_batch,
+            pool_size=ml_pool_size,
+        )
+        self.reputation = (
+            reputation(*reputation_options) if reputation_threshold > 0 else None
+        )
+        self.shadow_scored = 0
+        self.shadow_would_block = 0
+
+    def short_circuit(self, client_ip: str) -> bool:
+        """
+        True if the client is banned for repeated blocks; its request is
+        rejected without reading the body.
+        """
+        banned = self.reputation is not None and self.reputation.is_banned(client_ip)
+        if banned and self.metrics:
+            self.metrics.decisions.inc("reputation", "banned")
+        return banned
+
+    async def inspect(
+        self, request: Request, payload: str
+    ) -> Tuple[Optional[dict], Optional[tuple]]:
+        """
+        Decide on one request. Returns (waf_state, shadow):
+          - waf_state: the request.state.waf dict, or None if it is blocked
+          - shadow:    arguments for shadow_score() to run after the
+                       response was sent (shadow_async mode), else None
+        """
+        metrics = self.metrics
+        t = perf_counter() if metrics else 0.0
+        try:
+            # Allow-list: pure alnum+spaces, no SQL keywords
+            allowed = ALLOWLIST_RE.fullmatch(payload)
+            if metrics:
+                t = metrics.lap("allowlist", t)
+            if allowed:
+                if metrics:
+                    metrics.decisions.inc("allowlist", "benign")
+                return _waf_state("allowlist", 1.0), None
+
+            client_ip = client_host(request.scope)
+            user_agent = request.headers.get("user-agent", "unknown")
+            query = dict(request.query_params)
+
+            # Verdict cache, then the full regex → ML analysis
+            settings = self.ml_settings
+            mode = settings.mode
+            enforce = mode == "enforce"
+            # Outside enforce mode verdicts are regex-only
+            model_version = get_model().version if enforce else "regex-only"
+            # One rule set for the whole request, even if a reload swaps it
+            rules = get_rules()
+            key = self.verdict_cache.key(payload, query, rules.version, model_version)
+            verdict = self.verdict_cache.get(key)
+            if metrics:
+                metrics.lap("verdict_cache", t)
+            if verdict is None:
+                verdict = await self._analyze(payload, query, rules, use_ml=enforce)
+                if verdict["complete"]:
+                    self.verdict_cache.put(key, verdict)
+
+            result = verdict["result"]
+            if result["is_malicious"]:
+                # Logged on every block, cached or not
+                result = dict(result, request_id=uuid.uuid4().hex)
+                explanation = verdict["explanation"]
+                if explanation is None:
+                    # Deferred: written later under the same request_id,
+                    # and kept on the cached verdict for repeat payloads
+                    explanation = EXPLANATION_PENDING
+                    self.explainer.submit(
+                        result["request_id"],
+                        payload,
+                        result,
+                        on_done=lambda text: verdict.update(explanation=text),
                     )
 
-                # ── Step 3: Benign pass-through ────────────────────────
-                request.state.waf = {
-                    "label": "benign",
-                    "confidence": confidence,
-                    "is_malicious": False,
-                    "detection_source": "ml",
-                    "pattern": None,
-                    "explanation": None,
-                }
-
-            except Exception as err:
-                print("❌ WAF internal error:", err)
-                traceback.print_exc()
-                request.state.waf = {
-                    "label": "benign",
-                    "confidence": 0.0,
-                    "is_malicious": False,
-                    "detection_source": "error",
-                    "pattern": None,
-                    "explanation": None,
-                }
-
-        return await call_next(request)
+                if metrics:
+                    t = perf_counter()
+                log_alert(
+                    request=request,
+                    detection_result=result,
+                    explanation=explanation,
+                    severity=verdict["severity"],
+                    client_ip=client_ip,
+                    user_agent=user_agent,
+                )
+                if metrics:
+                    metrics.lap("log_alert", t)
+                    metrics.decisions.inc(result["detection_source"], result["label"])
+                if self.reputation is not None:
+                    self.reputation.record_block(client_ip)
+                return None, None
+
+            # ── Benign pass-through (ML shadow scoring, if enabled) ─────
+            shadow = None
+            if mode == "shadow_async":
+                shadow = (request, payload, client_ip, user_agent)
+            elif mode == "shadow_sampled" and random.random() < settings.sample_rate:
+                await self.shadow_score(request, payload, client_ip, user_agent)
+
+            if metrics:
+                metrics.decisions.inc(result["detection_source"], "benign")
+            return _waf_state(result["detection_source"], result["confidence"]), shadow
+
+        except Exception as err:
+            print("❌ WAF internal error:", err)
+            traceback.print_exc()
+            if metrics:
+                metrics.decisions.inc("error", "benign")
+            return _waf_state("error", 0.0), None
+
+    async def shadow_score(
+        self, request: Request, payload: str, client_ip: str, user_agent: str
+    ) -> None:
+        """
+        Score one regex-negative payload without enforcing the result; a
+        would-have-blocked decision is logged with source "ml_shadow".
+        """
+        try:
+            prediction = await self.ml_scheduler.submit(payload)
+            self.shadow_scored += 1
+            label, confidence = prediction["label"], prediction["confidence"]
+            if label == "benign" or confidence <= self.ml_settings.shadow_threshold:
+                return
+
+            self.shadow_would_block += 1
+            shadow_res = {
+                "request_id": uuid.uuid4().hex,
+                "label": label,
+                "pattern": None,
+                "confidence": confidence,
+                "probabilities": prediction["probabilities"],
+                "model_version": prediction["model_version"],
+                "ml_stage": prediction.get("stage"),
+                "is_malicious": True,
+                "detection_source": "ml_shadow",
+            }
+            log_alert(
+                request=request,
+                detection_result=shadow_res,
+                explanation=(
+                    f"ML shadow mode: would have blocked as {label} "
+                    f"(confidence {confidence}); the request was allowed."
+                ),
+                severity=score_threat(shadow_res, payload),
+                client_ip=client_ip,
+                user_agent=user_agent,
+            )
+        except Exception as err:
+            print("❌ WAF shadow scoring error:", err)
+
+    async def _analyze(
+        self, payload: str, query: dict, rules: RuleSet, use_ml: bool = True
+    ) -> dict:
+        """
+        Run regex detection, then (if use_ml) the ML fallback, for one payload.
+        Returns a verdict: {"result", "explanation", "severity", "complete"}.
+        Regex explanations are a lookup and are filled in here; ML ones are
+        left as None for the ExplanationWorker. "complete" is False when the
+        regex scan was cut short (see detect_attack); such a verdict is not
+        cached.
+        """
+        metrics = self.metrics
+        t = perf_counter() if metrics else 0.0
+        # ── Step 1: Regex detection ─────────────────────────────────
+        regex_res = regex_result(payload, query, rules)
+        complete = regex_res.get("scan_complete", True)
+        if metrics:
+            t = metrics.lap("detect_attack", t)
+
+        if regex_res.get("is_malicious"):
+            explanation = explain_detection(regex_res, payload)
+            if metrics:
+                t = metrics.lap("explain_detection", t)
+            severity = score_threat(regex_res, payload)
+            if metrics:
+                metrics.lap("score_threat", t)
+            return {
+                "result": regex_res,
+                "explanation": explanation,
+                "severity": severity,
+                "complete": complete,
+            }
+
+        if not use_ml:
+            return {
+                "result": regex_res,
+                "explanation": None,
+                "severity": None,
+                "complete": complete,
+            }
+
+        # ── Step 2: ML-based fallback (effectively disabled) ───────
+        ml_res = ml_result(await self.ml_scheduler.submit(payload))
+        if metrics:
+            t = metrics.lap("ml_inference", t)
+        severity = None
+        if ml_res["is_malicious"]:
+            severity = score_threat(ml_res, payload)
+            if metrics:
+                metrics.lap("score_threat", t)
+        return {
+            "result": ml_res,
+            "explanation": None,
+            "severity": severity,
+            "complete": complete,
+        }
+
+
+class WAFMiddleware(BaseHTTPMiddleware):
+    """
+    WAFEngine as a Starlette BaseHTTPMiddleware. The body is read in full
+    and parsed once; the ParsedBody is left in request.state.parsed_body for
+    the endpoint. See waf_asgi for the pure-ASGI variant with a body size
+    limit.
+    """
+
+    def __init__(self, app, **engine_options):
+        super().__init__(app)
+        self.engine = WAFEngine(**engine_options)
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method not in INSPECTED_METHODS:
+            return await call_next(request)
+        metrics = self.engine.metrics
+        start = perf_counter() if metrics else 0.0
+        if self.engine.short_circuit(client_host(request.scope)):
+            return blocked_response()
+
+        try:
+            payload = (await parsed_body(request)).payload
+        except Exception as err:
+            print("❌ WAF internal error:", err)
+            if metrics:
+                metrics.decisions.inc("error", "benign")
+            request.state.waf = _waf_state("error", 0.0)
+            return await call_next(request)
+        if metrics:
+            metrics.lap("body_parse", start)
+
+        waf_state, shadow = await self.engine.inspect(request, payload)
+        if metrics:
+            metrics.lap("total", start)
+        if waf_state is None:
+            return blocked_response()
+        request.state.waf = waf_state
+
+        response = await call_next(request)
+        if shadow is not None:
+            # Runs once the response body has been sent
+            tasks = BackgroundTasks(
+                [response.background] if response.background else []
+            )
+            tasks.add_task(self.engine.shadow_score, *shadow)
+            response.background = tasks
+        return response